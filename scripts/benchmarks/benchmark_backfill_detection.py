@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.detection.backfill import date_range
+
+# --- CONFIGURACIÓN ---
+START_DATE = '2025-08-01'
+END_DATE = '2025-08-30'
+HISTORY_DAYS = 45         # días de historia que trae cada snapshot (rolling)
+FILES_PER_DAY = 10        # archivos por fuente y día
+DETECTION_SCRIPT = os.path.join(project_root, 'scripts', 'pipeline', 'run_incident_detection.py')
+CV_DATA_PATH = os.path.join(project_root, 'outputs', 'cv_data.json')
+
+def day_records(source_id: str, day: datetime) -> list:
+    """Archivos sintéticos de una fuente en un día; siempre los mismos para la misma (fuente, día)."""
+    rng = np.random.default_rng([int(source_id), day.toordinal()])
+    records = []
+    for i in range(FILES_PER_DAY):
+        uploaded_at = day + timedelta(hours=8, minutes=int(rng.integers(0, 14 * 60)), seconds=i)
+        records.append({
+            'filename': f"{source_id}_report_{i}_{(day - timedelta(days=int(rng.integers(1, 6)))):%Y%m%d}.csv",
+            'rows': int(0 if rng.random() < 0.05 else rng.integers(1, 200_000)),
+            'status': 'stopped' if rng.random() < 0.02 else 'processed',
+            'is_duplicated': bool(rng.random() < 0.02),
+            'file_size': float(rng.exponential(1.0)),
+            'uploaded_at': uploaded_at.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00'),
+            'status_message': None,
+        })
+    return records
+
+def build_rolling_snapshots(workdir: str, source_ids: list):
+    """Una snapshot por día a las 20:00 UTC con los últimos HISTORY_DAYS días de archivos."""
+    for date_str in date_range(START_DATE, END_DATE):
+        cutoff = datetime.strptime(date_str, '%Y-%m-%d') + timedelta(hours=20)
+        snapshot = {}
+        for source_id in source_ids:
+            files = []
+            for back in range(HISTORY_DAYS):
+                day = datetime.strptime(date_str, '%Y-%m-%d') - timedelta(days=back)
+                files.extend(record for record in day_records(source_id, day)
+                             if record['uploaded_at'] < cutoff.strftime('%Y-%m-%dT%H:%M:%S'))
+            snapshot[source_id] = sorted(files, key=lambda record: record['uploaded_at'], reverse=True)
+        folder = os.path.join(workdir, 'data', f"{date_str}_20_00_UTC")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, 'files.json'), 'w') as f:
+            json.dump(snapshot, f)
+
+def run(args: list, workdir: str):
+    completed = subprocess.run([sys.executable, DETECTION_SCRIPT, *args], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    assert completed.returncode == 0, completed.stderr
+
+def read_reports(workdir: str) -> dict:
+    reports = {}
+    for date_str in date_range(START_DATE, END_DATE):
+        with open(os.path.join(workdir, 'outputs', f"{date_str}_incidents_report.json"), 'rb') as f:
+            reports[date_str] = f.read()
+    return reports
+
+def main():
+    with open(CV_DATA_PATH, 'r') as f:
+        source_ids = [str(cv['source_id']) for cv in json.load(f)]
+    workdir = tempfile.mkdtemp(prefix='backfill_')
+    try:
+        os.makedirs(os.path.join(workdir, 'outputs'))
+        shutil.copy(CV_DATA_PATH, os.path.join(workdir, 'outputs', 'cv_data.json'))
+        build_rolling_snapshots(workdir, source_ids)
+        n_days = len(date_range(START_DATE, END_DATE))
+        print(f"--- Benchmark: {n_days} días ({len(source_ids)} fuentes, snapshots de {HISTORY_DAYS} días) ---")
+
+        start = time.perf_counter()
+        run(['--date', START_DATE], workdir)
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for date_str in date_range(START_DATE, END_DATE):
+            run(['--date', date_str], workdir)
+        per_day_time = time.perf_counter() - start
+        expected = read_reports(workdir)
+
+        start = time.perf_counter()
+        run(['--date', START_DATE, '--end', END_DATE], workdir)
+        backfill_time = time.perf_counter() - start
+        assert read_reports(workdir) == expected, "El backfill produjo reportes distintos"
+
+        print(f"un día: {single_time:6.2f}s | {n_days} corridas por día: {per_day_time:6.2f}s | "
+              f"backfill: {backfill_time:6.2f}s ({backfill_time / single_time:4.1f} días equivalentes) | paridad ✓")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
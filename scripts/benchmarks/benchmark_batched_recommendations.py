@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.reporting.consolidator import classify_source_severity
+from src.reporting.recommendations import batch_prompt_context, incident_prompt_context, parse_batch_recommendations
+from src.preparation.cv_profiles import load_cv_profiles
+
+# --- CONFIGURACIÓN ---
+OPERATION_DATE = '2025-09-08'
+INCIDENTS_PER_SOURCE = [1, 2, 4, 8]   # escenarios sintéticos: k incidencias por fuente con incidencias
+CHARS_PER_TOKEN = 4                   # aproximación para expresar el contexto en tokens
+
+def context_sizes(items: list, profiles) -> tuple:
+    """(llamadas, caracteres) por incidencia y por fuente para los pares (source_id, incidencia)."""
+    by_source = {}
+    for source_id, incident in items:
+        by_source.setdefault(source_id, []).append(incident)
+    per_incident = sum(len(incident_prompt_context(incident, profiles.raw_cv(source_id)))
+                       for source_id, incident in items)
+    batched = sum(len(batch_prompt_context(incidents, profiles.raw_cv(source_id)))
+                  for source_id, incidents in by_source.items())
+    return (len(items), per_incident), (len(by_source), batched)
+
+def main():
+    with open(os.path.join('outputs', f"{OPERATION_DATE}_incidents_report.json"), 'r') as f:
+        classified_sources = classify_source_severity(json.load(f))
+    profiles = load_cv_profiles(os.path.join('outputs', 'cv_data.json'))
+    real = [(source_id, incident) for source_id, data in classified_sources.items() for incident in data['incidents']]
+    first = {}
+    for source_id, incident in real:
+        first.setdefault(source_id, incident)
+
+    print(f"--- Benchmark: recomendaciones por fuente ({len(real)} incidencias reales de {len(first)} fuentes, "
+          f"{OPERATION_DATE}) ---")
+    scenarios = [('reporte real', real)]
+    scenarios += [(f"{k} por fuente", [(source_id, {**incident, 'total_incidentes': position + 1})
+                                       for source_id, incident in first.items() for position in range(k)])
+                  for k in INCIDENTS_PER_SOURCE]
+    for name, items in scenarios:
+        (single_calls, single_chars), (batch_calls, batch_chars) = context_sizes(items, profiles)
+        print(f"{name:<15} | por incidencia: {single_calls:4d} llamadas, ~{single_chars // CHARS_PER_TOKEN:7,} tokens"
+              f" | por fuente: {batch_calls:4d} llamadas, ~{batch_chars // CHARS_PER_TOKEN:7,} tokens "
+              f"({batch_chars / single_chars - 1:+.0%})")
+
+    # La respuesta por fuente vuelve a cada incidencia por su número, aunque llegue desordenada o incompleta
+    response = '```json\n[{"id": 3, "recomendacion": "c"}, {"id": "1", "recomendacion": "a"}]\n```'
+    assert parse_batch_recommendations(response, 3) == ['a', None, 'c']
+    print("reparto de la respuesta JSON por número de incidencia: ✓")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import glob
+import time
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.reporting.prompt_context import DEFAULT_PROMPT_TOKEN_BUDGET, compact_incident_context, estimate_tokens
+from src.reporting.recommendations import incident_prompt_context
+from src.preparation.cv_profiles import load_cv_profiles
+from src.preparation.data_loader import read_files_json_columnar
+
+# --- CONFIGURACIÓN ---
+OPERATION_DATE = '2025-09-08'
+DAY = 'Mon'
+STRESS_SOURCE = '220504'   # fuente con muchas entidades para el caso de cientos de archivos
+STRESS_FILES = [100, 500]
+
+def main():
+    with open(os.path.join('outputs', f"{OPERATION_DATE}_incidents_report.json"), 'r') as f:
+        incidents = json.load(f)
+    profiles = load_cv_profiles(os.path.join('outputs', 'cv_data.json'))
+
+    print(f"--- Benchmark: contexto compacto del recomendador ({OPERATION_DATE}, {len(incidents)} incidencias, "
+          f"presupuesto {DEFAULT_PROMPT_TOKEN_BUDGET} tokens) ---")
+    total_before = total_after = 0
+    for incident in incidents:
+        source_cv_info = profiles.raw_cv(incident['source_id'])
+        before = estimate_tokens(incident_prompt_context(incident, source_cv_info))
+        after = estimate_tokens(compact_incident_context(incident, source_cv_info, DAY))
+        total_before += before
+        total_after += after
+        print(f"{incident['source_id']:>7} | {incident['incident_type']:<45} | {len(incident['files_to_review']):4d} "
+              f"archivos | ~{before:5,} -> ~{after:5,} tokens ({after / before - 1:+.0%})")
+    print(f"{'total':>7} | {'':<45} | {'':4} {'':8} | ~{total_before:5,} -> ~{total_after:5,} tokens "
+          f"({total_after / total_before - 1:+.0%})")
+
+    # Fuente grande: cientos de archivos en files_to_review (nombres reales de las snapshots)
+    frames = [read_files_json_columnar(path)[0] for path in sorted(glob.glob(os.path.join('data', '*', 'files.json')))]
+    names = pd.concat(frames, ignore_index=True)
+    names = names.loc[names['source_id'].astype(str) == STRESS_SOURCE, 'filename'].astype(str).drop_duplicates()
+    source_cv_info = profiles.raw_cv(STRESS_SOURCE)
+    for n_files in STRESS_FILES:
+        incident = {"source_id": STRESS_SOURCE, "incident_type": "Advertencia: Carga de Archivo Antiguo",
+                    "incident_details": f"Se encontraron {n_files} archivos cuya fecha en el nombre es de hace más "
+                                        f"de 3 días, indicando una posible carga histórica.",
+                    "total_incidentes": n_files, "files_to_review": names.head(n_files).tolist()}
+        before = estimate_tokens(incident_prompt_context(incident, source_cv_info))
+        start = time.perf_counter()
+        compact = compact_incident_context(incident, source_cv_info, DAY)
+        elapsed = time.perf_counter() - start
+        after = estimate_tokens(compact)
+        assert after <= DEFAULT_PROMPT_TOKEN_BUDGET, "El contexto compacto supera el presupuesto"
+        print(f"{STRESS_SOURCE:>7} | {'stress: ' + str(n_files) + ' archivos antiguos':<45} | {n_files:4d} archivos | "
+              f"~{before:5,} -> ~{after:5,} tokens ({after / before - 1:+.0%}) en {elapsed * 1000:.1f}ms")
+
+if __name__ == '__main__':
+    main()
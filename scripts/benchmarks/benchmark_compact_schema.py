@@ -0,0 +1,73 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.json_stream import FILE_RECORD_COLUMNS, read_files_json_columnar
+from src.preparation.snapshot_cache import list_snapshot_files
+from src.preparation.schema import FILENAME_ENCODINGS, build_file_records_frame, concat_file_records
+
+# --- CONFIGURACIÓN ---
+BASE_DATA_PATH = 'data'
+SAMPLE_SNAPSHOT = os.path.join(BASE_DATA_PATH, '2025-09-08_20_00_UTC', 'files.json')
+N_SYNTHETIC_SOURCES = 10_000
+N_DAYS = 30
+FILES_PER_DAY = 2
+SEED = 42
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def load_snapshots(file_paths: list, compact: bool, filename_encoding: str = 'object') -> pd.DataFrame:
+    frames = [read_files_json_columnar(path, compact=compact, filename_encoding=filename_encoding)[0]
+              for path in file_paths]
+    return concat_file_records(frames)
+
+def build_synthetic_columns() -> dict:
+    """Buffers por columna con la forma de files.json: nombres repetidos por fuente y día."""
+    rng = np.random.default_rng(SEED)
+    n_records = N_SYNTHETIC_SOURCES * N_DAYS * FILES_PER_DAY
+    source_ids = np.repeat(np.arange(N_SYNTHETIC_SOURCES), N_DAYS * FILES_PER_DAY)
+    days = np.tile(np.repeat(np.arange(N_DAYS), FILES_PER_DAY), N_SYNTHETIC_SOURCES)
+    file_size = rng.exponential(1.0, n_records)
+    file_size[rng.random(n_records) < 0.05] = np.nan
+    start = pd.Timestamp('2025-08-01', tz='UTC')
+    offsets = pd.to_timedelta(days * 86_400 + rng.integers(0, 86_400, n_records), unit='s')
+    return {
+        'filename': [f"report_{source}_2025-08-{day + 1:02d}.csv" for source, day in zip(source_ids, days)],
+        'rows': rng.integers(0, 100_000, n_records),
+        'status': rng.choice(['processed', 'stopped', 'failure'], n_records, p=[0.9, 0.07, 0.03]).tolist(),
+        'is_duplicated': rng.random(n_records) < 0.05,
+        'file_size': file_size,
+        'uploaded_at': (start + offsets).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00').tolist(),
+        'status_message': [None] * n_records,
+        'source_id': source_ids.astype(str).tolist(),
+    }
+
+def report(label: str, build) -> None:
+    wide = build(compact=False)
+    wide_mb = memory_mb(wide)
+    print(f"\n{label}: {len(wide)} registros, {wide['source_id'].nunique()} fuentes")
+    print(f"   {'tipos amplios':<22} {wide_mb:9.2f} MB")
+    for filename_encoding in FILENAME_ENCODINGS:
+        compact = build(compact=True, filename_encoding=filename_encoding)
+        compact_mb = memory_mb(compact)
+        print(f"   {'compacto/' + filename_encoding:<22} {compact_mb:9.2f} MB "
+              f"({100 * (1 - compact_mb / wide_mb):5.1f}% menos)")
+
+def main():
+    print("--- Benchmark: memoria del esquema compacto de registros (memory_usage(deep=True)) ---")
+    report("Snapshot 2025-09-08 (18 fuentes)",
+           lambda **kwargs: load_snapshots([SAMPLE_SNAPSHOT], **kwargs))
+    report("Histórico completo (todas las snapshots)",
+           lambda **kwargs: load_snapshots(list_snapshot_files(BASE_DATA_PATH), **kwargs))
+
+    columns = build_synthetic_columns()
+    report(f"Sintético ({N_SYNTHETIC_SOURCES} fuentes x {N_DAYS} días)",
+           lambda **kwargs: build_file_records_frame(columns, FILE_RECORD_COLUMNS, **kwargs))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import asyncio
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.reporting.recommendations import run_bounded
+
+# --- CONFIGURACIÓN ---
+N_INCIDENTS = 60
+MEDIAN_LATENCY_S = 0.3      # latencia simulada del LLM (escalada: ~3s reales / 10)
+FAILURE_RATE = 0.05         # errores transitorios (p. ej. 429/503) en el primer intento
+N_HANGS = 2                 # llamadas que nunca responden en el primer intento
+TIMEOUT_S = 2.0
+SCENARIOS = [
+    # (nombre, concurrencia, llamadas por segundo)
+    ('secuencial (antes)', 1, None),
+    ('concurrencia 8, 40/s', 8, 40.0),
+    ('concurrencia 16, 40/s', 16, 40.0),
+    ('concurrencia 16, sin límite', 16, None),
+]
+SEED = 7
+
+def build_calls(latencies: np.ndarray, failures: np.ndarray, hangs: np.ndarray) -> list:
+    """Llamadas simuladas: cada una devuelve el índice de su incidencia para verificar el orden."""
+    def make_call(position: int):
+        async def call(attempt: int):
+            if attempt == 0 and hangs[position]:
+                await asyncio.sleep(3600)
+            await asyncio.sleep(latencies[position])
+            if attempt == 0 and failures[position]:
+                raise RuntimeError("503 Service Unavailable")
+            return f"recomendación {position}"
+        return call
+    return [make_call(position) for position in range(len(latencies))]
+
+def main():
+    rng = np.random.default_rng(SEED)
+    latencies = rng.lognormal(np.log(MEDIAN_LATENCY_S), 0.5, N_INCIDENTS)
+    failures = rng.random(N_INCIDENTS) < FAILURE_RATE
+    hangs = np.zeros(N_INCIDENTS, dtype=bool)
+    hangs[rng.choice(N_INCIDENTS, N_HANGS, replace=False)] = True
+    expected = [f"recomendación {position}" for position in range(N_INCIDENTS)]
+    print(f"--- Benchmark: recomendaciones concurrentes ({N_INCIDENTS} incidencias, latencia mediana "
+          f"{MEDIAN_LATENCY_S}s, máx. {latencies.max():.2f}s, {failures.sum()} errores y {hangs.sum()} cuelgues "
+          f"en el primer intento, timeout {TIMEOUT_S}s) ---")
+    for name, concurrency, rate in SCENARIOS:
+        results, stats = asyncio.run(run_bounded(build_calls(latencies, failures, hangs), concurrency=concurrency,
+                                                 rate=rate, timeout=TIMEOUT_S, retries=3, backoff=0.2, seed=SEED))
+        assert results == expected, "Las recomendaciones no volvieron a su incidencia"
+        print(f"{name:<30} | {stats['elapsed_s']:6.2f}s | {stats['calls']} llamadas, {stats['retries']} reintentos, "
+              f"{stats['timeouts']} timeouts | orden ✓")
+    print(f"suma de latencias: {latencies.sum():.2f}s | latencia de la llamada más lenta: {latencies.max():.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.filename_index import FilenameIndex
+
+# --- CONFIGURACIÓN ---
+N_SOURCES = 500
+FILES_PER_DAY = 40_000
+HISTORY_DAYS = 60
+REUPLOAD_FRACTION = 0.01   # archivos del día que repiten un nombre de un día anterior
+START_DATE = '2025-07-01'
+
+def build_day(day: int, rng: np.random.Generator) -> pd.DataFrame:
+    date = pd.Timestamp(START_DATE) + pd.Timedelta(days=day)
+    source_ids = rng.integers(0, N_SOURCES, FILES_PER_DAY)
+    return pd.DataFrame({
+        'source_id': source_ids.astype(str),
+        'filename': [f"{source_id}_export_{day}_{i}.csv" for i, source_id in enumerate(source_ids)],
+        'uploaded_at': date + pd.to_timedelta(rng.integers(0, 86_400, FILES_PER_DAY), unit='s'),
+    })
+
+def with_reuploads(df: pd.DataFrame, history: list, rng: np.random.Generator) -> tuple:
+    """Reemplaza un porcentaje de los archivos del día por nombres ya recibidos por la misma fuente."""
+    df = df.copy()
+    old = pd.concat(history[-7:], ignore_index=True)
+    chosen = rng.choice(len(df), int(len(df) * REUPLOAD_FRACTION), replace=False)
+    picks = old.sample(len(chosen), random_state=1)
+    df.loc[chosen, 'source_id'] = picks['source_id'].to_numpy()
+    df.loc[chosen, 'filename'] = picks['filename'].to_numpy()
+    expected = np.zeros(len(df), dtype=bool)
+    expected[chosen] = True
+    return df, expected
+
+def main():
+    rng = np.random.default_rng(5)
+    history = [build_day(day, rng) for day in range(HISTORY_DAYS)]
+    today, expected = with_reuploads(build_day(HISTORY_DAYS, rng), history, rng)
+    print(f"--- Benchmark: índice de nombres ({HISTORY_DAYS} días x {FILES_PER_DAY} archivos, "
+          f"{int(expected.sum())} re-subidas hoy) ---")
+
+    # Sin índice: concatenar toda la historia y buscar pares repetidos
+    start = time.perf_counter()
+    combined = pd.concat(history + [today], ignore_index=True)
+    rescanned = combined.duplicated(subset=['source_id', 'filename'], keep='first').to_numpy()[-len(today):]
+    rescan_time = time.perf_counter() - start
+    assert (rescanned == expected).all()
+
+    index_dir = tempfile.mkdtemp(prefix='filename_index_')
+    try:
+        for bloom in (False, True):
+            index = FilenameIndex(index_dir, bloom=bloom)
+            start = time.perf_counter()
+            for df in history:
+                index.absorb(df)
+            build_time = time.perf_counter() - start
+            index.save()
+            start = time.perf_counter()
+            index = FilenameIndex(index_dir, bloom=bloom).load()
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            marked = index.seen_before(today)
+            query_time = time.perf_counter() - start
+            start = time.perf_counter()
+            index.absorb(today)
+            update_time = time.perf_counter() - start
+            # Guardar el día solo reescribe el delta (el principal se fusiona cada tanto)
+            start = time.perf_counter()
+            index.save()
+            save_time = time.perf_counter() - start
+            assert (marked == expected).all(), "El índice no coincide con el re-escaneo"
+            label = 'Bloom + claves' if bloom else 'solo claves  '
+            print(f"{label} | sembrar {HISTORY_DAYS} días: {build_time:5.2f}s | cargar: {load_time:5.3f}s | "
+                  f"consultar hoy: {query_time:5.3f}s | actualizar: {update_time:5.3f}s | guardar: {save_time:5.3f}s | "
+                  f"paridad ✓")
+    finally:
+        shutil.rmtree(index_dir)
+    print(f"re-escaneo de la historia completa: {rescan_time:5.2f}s por día")
+
+if __name__ == '__main__':
+    main()
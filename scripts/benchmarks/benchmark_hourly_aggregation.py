@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.aggregation import summarize_hourly
+
+# --- CONFIGURACIÓN ---
+N_RECORDS = [100_000, 1_000_000]
+N_SOURCES = 2_000
+N_DAYS = 30
+SEED = 42
+
+def build_synthetic_records(n_records: int) -> pd.DataFrame:
+    """Registros sintéticos con la misma forma que los de files.json."""
+    rng = np.random.default_rng(SEED)
+    start = pd.Timestamp('2025-08-01', tz='UTC').value
+    offsets = rng.integers(0, N_DAYS * 24 * 3600, n_records) * 1_000_000_000
+    file_size = rng.exponential(1.0, n_records)
+    file_size[rng.random(n_records) < 0.05] = np.nan
+    return pd.DataFrame({
+        'filename': [f"file_{i}.csv" for i in rng.integers(0, n_records // 2, n_records)],
+        'rows': rng.integers(0, 100_000, n_records),
+        'status': rng.choice(['processed', 'stopped', 'failure'], n_records, p=[0.9, 0.07, 0.03]),
+        'is_duplicated': rng.random(n_records) < 0.05,
+        'file_size': file_size,
+        'uploaded_at': pd.to_datetime(start + offsets, utc=True),
+        'status_message': None,
+        'source_id': rng.integers(0, N_SOURCES, n_records).astype(str),
+    })
+
+def legacy_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Implementación anterior: groupby-agg + tres pivot_table + joins (referencia)."""
+    df = df.copy()
+    df['uploaded_at_date'] = df['uploaded_at'].dt.date
+    df['upload_hour'] = df['uploaded_at'].dt.hour
+    df['is_duplicated_stopped'] = (df['is_duplicated'] == True) & (df['status'] == 'stopped')
+    df['is_processed'] = df['status'] == 'processed'
+    df['is_other_status'] = ~df['status'].isin(['processed', 'stopped'])
+    df['is_filesize_null'] = df['file_size'].isnull()
+    df['is_filesize_zero'] = df['file_size'] == 0
+    df['is_filesize_positive'] = df['file_size'] > 0
+    df['is_filename_duplicated_in_source'] = df.duplicated(subset=['source_id', 'filename'], keep=False)
+    keys = ['uploaded_at_date', 'source_id']
+    summary = df.groupby(keys).agg(
+        total_files=('filename', 'count'), total_files_duplicated_stopped=('is_duplicated_stopped', 'sum'),
+        total_files_duplicated=('is_duplicated', 'sum'), total_files_processed=('is_processed', 'sum'),
+        total_files_other_status=('is_other_status', 'sum'), sum_file_size=('file_size', 'sum'),
+        sum_rows=('rows', 'sum'), total_files_filesize_null=('is_filesize_null', 'sum'),
+        total_files_filesize_zero=('is_filesize_zero', 'sum'), total_files_filesize_positive=('is_filesize_positive', 'sum'),
+        total_filename_duplicated_in_source=('is_filename_duplicated_in_source', 'sum'))
+    pivots = [
+        df.pivot_table(index=keys, columns='upload_hour', values=value, aggfunc=func, fill_value=0).add_prefix(prefix)
+        for value, func, prefix in [('filename', 'count', 'total_files_h'), ('file_size', 'sum', 'sum_filesize_h'),
+                                    ('rows', 'sum', 'sum_rows_h')]
+    ]
+    return summary.join(pivots[0]).join(pivots[1]).join(pivots[2]).reset_index()
+
+def main():
+    print("--- Benchmark: groupby + 3 pivot_table vs. kernel de una pasada ---")
+    for n_records in N_RECORDS:
+        df = build_synthetic_records(n_records)
+
+        start = time.perf_counter()
+        expected = legacy_summary(df)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = summarize_hourly(df, output='wide')
+        kernel_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        long_form = summarize_hourly(df, output='long')
+        long_time = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(result, expected)
+        print(f"{n_records:>9} registros | pivot: {legacy_time:6.2f}s | kernel ancho: {kernel_time:6.2f}s "
+              f"({legacy_time / kernel_time:4.1f}x) | kernel largo: {long_time:6.2f}s, {len(long_form)} celdas | paridad ✓")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import contextlib
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.detection.engine import run_detection
+from src.detection.incremental import run_detection_incremental
+
+# Reutiliza el día sintético del benchmark de detección paralela
+sys.path.append(os.path.dirname(__file__))
+from benchmark_parallel_detection import OPERATION_DATE, build_synthetic_day
+
+# --- CONFIGURACIÓN ---
+N_SOURCES = 10_000
+CHANGED_FRACTION = 0.01   # fuentes corregidas entre una corrida y la siguiente
+ENGINES = ['per_source', 'vectorized']
+
+def timed(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+def main():
+    df, profiles = build_synthetic_day(N_SOURCES)
+    # Corrección tardía: cambian las filas de los archivos de un 1% de las fuentes
+    changed = df.copy()
+    rng = np.random.default_rng(7)
+    changed_sources = rng.choice(profiles.source_order, int(N_SOURCES * CHANGED_FRACTION), replace=False)
+    mask = changed['source_id'].astype(str).isin(set(changed_sources)).to_numpy()
+    changed.loc[mask, 'rows'] = changed.loc[mask, 'rows'] + 1
+
+    print(f"--- Benchmark: detección completa vs. incremental ({N_SOURCES} fuentes, "
+          f"{len(changed_sources)} corregidas) ---")
+    for engine in ENGINES:
+        cache_dir = tempfile.mkdtemp(prefix='detection_cache_')
+        try:
+            expected, full_time = timed(run_detection, changed, profiles, OPERATION_DATE, engine=engine)
+            _, cold_time = timed(run_detection_incremental, df, profiles, OPERATION_DATE, engine=engine, cache_dir=cache_dir)
+            _, warm_time = timed(run_detection_incremental, df, profiles, OPERATION_DATE, engine=engine, cache_dir=cache_dir)
+            result, rerun_time = timed(run_detection_incremental, changed, profiles, OPERATION_DATE, engine=engine,
+                                       cache_dir=cache_dir)
+            assert json.dumps(result) == json.dumps(expected), "El reporte incremental difiere del completo"
+        finally:
+            shutil.rmtree(cache_dir)
+        print(f"{engine:<11} | completa: {full_time:6.2f}s | caché vacía: {cold_time:6.2f}s | "
+              f"sin cambios: {warm_time:6.2f}s | {CHANGED_FRACTION:.0%} corregido: {rerun_time:6.2f}s | paridad ✓")
+
+if __name__ == '__main__':
+    main()
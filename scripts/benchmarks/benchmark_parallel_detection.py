@@ -0,0 +1,66 @@
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.cv_profiles import WEEKDAYS, compile_cv_profiles
+from src.detection.engine import run_detectors_per_source
+from src.detection.parallel import run_detectors_parallel
+
+# --- CONFIGURACIÓN ---
+N_SOURCES = [1_000, 10_000]
+FILES_PER_SOURCE = 10
+WORKERS = [2, 4]
+OPERATION_DATE = '2025-09-08'
+SEED = 42
+
+def build_synthetic_day(n_sources: int) -> tuple:
+    """Un día sintético con `FILES_PER_SOURCE` archivos por fuente y un CV por fuente."""
+    rng = np.random.default_rng(SEED)
+    cv_data = [{
+        'source_id': str(source_id),
+        'day_of_week_row_stats': [{'day': day, 'rows_mean': 5_000.0, 'empty_files_mean': 0.5} for day in WEEKDAYS],
+        'file_processing_daily_stats': [{'day': day, 'mean_files': float(rng.uniform(5, 15))} for day in WEEKDAYS],
+        'upload_schedule_daily_stats': [{'day': day, 'upload_window_expected_utc': '08:00:00–09:00:00 UTC'} for day in WEEKDAYS],
+        'general_volume_stats': {'median_rows': 5_000, 'stdev_rows': 1_500.0},
+    } for source_id in range(n_sources)]
+    n_records = n_sources * FILES_PER_SOURCE
+    df = pd.DataFrame({
+        'filename': [f"report_{i}_20250907.csv" for i in range(n_records)],
+        'rows': np.where(rng.random(n_records) < 0.05, 0, rng.normal(5_000, 2_000, n_records).clip(1).astype(int)),
+        'status': pd.Categorical(rng.choice(['processed', 'stopped'], n_records, p=[0.97, 0.03])),
+        'is_duplicated': pd.array(rng.random(n_records) < 0.02, dtype='boolean'),
+        'file_size': rng.exponential(1.0, n_records),
+        'uploaded_at': pd.Timestamp(OPERATION_DATE, tz='UTC') + pd.to_timedelta(rng.integers(0, 86_400, n_records), unit='s'),
+        'status_message': pd.Categorical([None] * n_records),
+        'source_id': pd.Categorical(rng.permutation(np.repeat(np.arange(n_sources), FILES_PER_SOURCE)).astype(str)),
+    })
+    return df, compile_cv_profiles(cv_data)[0]
+
+def timed(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+def main():
+    print(f"--- Benchmark: detección por fuente en serie vs. ProcessPoolExecutor ({os.cpu_count()} CPUs) ---")
+    for n_sources in N_SOURCES:
+        df, profiles = build_synthetic_day(n_sources)
+        expected, serial_time = timed(run_detectors_per_source, df, profiles, OPERATION_DATE)
+        line = f"{n_sources:>6} fuentes ({len(df)} archivos) | serie: {serial_time:6.2f}s"
+        for workers in WORKERS:
+            result, parallel_time = timed(run_detectors_parallel, df, profiles, OPERATION_DATE, workers)
+            assert json.dumps(result) == json.dumps(expected), "El reporte paralelo difiere del serial"
+            line += f" | {workers} workers: {parallel_time:6.2f}s ({serial_time / parallel_time:4.1f}x)"
+        print(line + " | paridad ✓")
+
+if __name__ == '__main__':
+    main()
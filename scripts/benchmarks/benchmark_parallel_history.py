@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import tempfile
+import contextlib
+import io
+import pandas as pd
+from datetime import date, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.data_loader import create_historical_summary
+
+# --- CONFIGURACIÓN ---
+BASE_DATA_PATH = os.path.join(project_root, "data")
+N_FOLDERS = 90  # ~un trimestre de snapshots diarias
+WORKER_COUNTS = [1, 2, 4, os.cpu_count() or 1]
+
+def build_quarter(target_dir: str):
+    """Crea N_FOLDERS carpetas de fecha que enlazan (symlink) a las snapshots reales."""
+    source_folders = sorted(f for f in os.listdir(BASE_DATA_PATH) if f.endswith('_20_00_UTC'))
+    for i in range(N_FOLDERS):
+        folder = os.path.join(target_dir, f"{date(2025, 6, 1) + timedelta(days=i)}_20_00_UTC")
+        os.makedirs(folder)
+        source = os.path.join(BASE_DATA_PATH, source_folders[i % len(source_folders)])
+        for filename in os.listdir(source):
+            os.symlink(os.path.join(source, filename), os.path.join(folder, filename))
+
+def main():
+    print(f"--- Benchmark: resumen histórico sobre {N_FOLDERS} carpetas, serie vs. pool de procesos ---")
+    print(f"CPUs disponibles: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        build_quarter(tmp_dir)
+        reference = None
+        for workers in sorted(set(WORKER_COUNTS)):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = create_historical_summary(base_data_path=tmp_dir, workers=workers)
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = summary
+            pd.testing.assert_frame_equal(summary, reference, check_exact=True)
+            print(f"workers={workers:<3} {elapsed:6.2f}s  ({len(summary)} filas, idéntico a la serie ✓)")
+
+if __name__ == '__main__':
+    main()
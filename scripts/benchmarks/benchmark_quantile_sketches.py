@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import pickle
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.quantile_sketches import DEFAULT_BAND, KLLSketch, QuantileSketchStore
+
+# --- CONFIGURACIÓN ---
+N_SOURCES = 200
+HISTORY_DAYS = [28, 112, 364]   # largos de historia a comparar
+FILES_PER_DAY = 40
+N_SHARDS = 4
+START_DATE = '2024-09-02'
+
+def build_day(date: pd.Timestamp, rng: np.random.Generator) -> pd.DataFrame:
+    """Archivos sintéticos de un día con filas de cola pesada (como la fuente 207938)."""
+    n = N_SOURCES * FILES_PER_DAY
+    return pd.DataFrame({
+        'source_id': np.repeat(np.arange(N_SOURCES).astype(str), FILES_PER_DAY),
+        'rows': rng.lognormal(12, 1.2, n).astype(np.int64),
+        'file_size': rng.exponential(1.0, n),
+        'uploaded_at': date + pd.to_timedelta(np.clip(rng.normal(9, 2, n), 0, 23.99), unit='h'),
+    })
+
+def rank_error(sketch: KLLSketch, values: np.ndarray) -> float:
+    """Error de rango de la banda estimada respecto de los datos exactos."""
+    values = np.sort(values)
+    estimates = sketch.quantiles(DEFAULT_BAND)
+    return float(np.abs(np.searchsorted(values, estimates) / len(values) - np.array(DEFAULT_BAND)).max())
+
+def main():
+    rng = np.random.default_rng(11)
+    print(f"--- Benchmark: sketches KLL vs. escaneo del histórico ({N_SOURCES} fuentes, "
+          f"{FILES_PER_DAY} archivos por fuente y día) ---")
+    for n_days in HISTORY_DAYS:
+        dates = pd.date_range(START_DATE, periods=n_days, freq='D')
+        days = [(date.strftime('%Y-%m-%d'), build_day(date, rng)) for date in dates]
+        history = pd.concat([df for _, df in days], ignore_index=True)
+        weekday = dates[-1].weekday()
+
+        store = QuantileSketchStore(path=os.devnull)
+        start = time.perf_counter()
+        for date_str, df in days:
+            store.absorb_day(date_str, df)
+        absorb_time = (time.perf_counter() - start) / n_days
+
+        # Consulta p01/p99 de todas las fuentes: escaneando el histórico vs. desde los sketches
+        start = time.perf_counter()
+        same_weekday = history[pd.to_datetime(history['uploaded_at']).dt.weekday == weekday]
+        exact = {source_id: np.quantile(group.to_numpy(dtype=np.float64), DEFAULT_BAND, method='inverted_cdf')
+                 for source_id, group in same_weekday.groupby('source_id')['rows']}
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for source_id in exact:
+            store.quantiles(source_id, weekday, 'rows', DEFAULT_BAND)
+        lookup_time = time.perf_counter() - start
+
+        # Error de rango sobre los datos exactos (incluye el redondeo de 1/n de la inversa de la CDF)
+        errors = [rank_error(store.get(source_id, weekday, 'rows'), group.to_numpy(dtype=np.float64))
+                  for source_id, group in same_weekday.groupby('source_id')['rows']]
+        retained = max(store.get(source_id, weekday, 'rows').retained for source_id in exact)
+        per_source_kb = len(pickle.dumps((store.days, store.sealed))) / N_SOURCES / 1024
+
+        # Mezcla entre shards: cada shard absorbe sus fuentes y los stores se combinan al final
+        shards = [QuantileSketchStore(path=os.devnull) for _ in range(N_SHARDS)]
+        for date_str, df in days:
+            shard_of = df['source_id'].astype(int) % N_SHARDS
+            for index, shard in enumerate(shards):
+                shard.absorb_day(date_str, df[shard_of == index])
+        merged = QuantileSketchStore(path=os.devnull)
+        for shard in shards:
+            merged.merge(shard)
+        assert all(np.array_equal(merged.quantiles(source_id, weekday, 'rows', DEFAULT_BAND),
+                                  store.quantiles(source_id, weekday, 'rows', DEFAULT_BAND)) for source_id in exact)
+
+        # Mezcla entre días: dos stores con mitades distintas de la historia
+        halves = [QuantileSketchStore(path=os.devnull) for _ in range(2)]
+        for position, (date_str, df) in enumerate(days):
+            halves[position * 2 // n_days].absorb_day(date_str, df)
+        halves[0].merge(halves[1])
+        errors += [rank_error(halves[0].get(source_id, weekday, 'rows'), group.to_numpy(dtype=np.float64))
+                   for source_id, group in same_weekday.groupby('source_id')['rows']]
+
+        print(f"{n_days:>4} días | absorber un día: {absorb_time * 1000:6.1f}ms | p01/p99 escaneando: {scan_time:6.3f}s | "
+              f"desde sketches: {lookup_time:6.3f}s | error de rango máx.: {max(errors):.4f} | "
+              f"retenidos: {retained:>4} de {len(same_weekday) // N_SOURCES:>5} | {per_source_kb:5.1f} KB/fuente | "
+              f"merge de {N_SHARDS} shards y por días ✓")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.baselines import BaselineStore, DEFAULT_WINDOW_DAYS
+
+# --- CONFIGURACIÓN ---
+N_SOURCES = 1_000
+N_DAYS = 91               # 13 semanas de historia
+FILES_PER_DAY = 5
+START_DATE = '2025-06-02'
+
+def build_day(date: pd.Timestamp, rng: np.random.Generator) -> pd.DataFrame:
+    """Archivos sintéticos de un día: filas con cola pesada y horas de subida alrededor de las 9 UTC."""
+    n_files = rng.integers(0, 2 * FILES_PER_DAY, N_SOURCES)
+    source_ids = np.repeat(np.arange(N_SOURCES).astype(str), n_files)
+    rows = np.where(rng.random(len(source_ids)) < 0.05, 0, rng.lognormal(8, 1.5, len(source_ids)).astype(np.int64))
+    hours = np.clip(rng.normal(9, 2, len(source_ids)), 0, 23.99)
+    return pd.DataFrame({'source_id': source_ids, 'rows': rows,
+                         'uploaded_at': date + pd.to_timedelta(hours, unit='h')})
+
+def recompute(history: list) -> pd.DataFrame:
+    """Sin líneas base: concatena las últimas semanas de archivos y agrega desde cero por (fuente, día)."""
+    df = pd.concat([df.assign(weekday=date.weekday()) for date, df in history[-7 * DEFAULT_WINDOW_DAYS:]],
+                   ignore_index=True)
+    return df.groupby(['source_id', 'weekday'])['rows'].agg(['count', 'mean', 'std', 'min', 'max'])
+
+def main():
+    rng = np.random.default_rng(3)
+    dates = pd.date_range(START_DATE, periods=N_DAYS, freq='D')
+    history = [(date, build_day(date, rng)) for date in dates]
+    source_ids = [str(source_id) for source_id in range(N_SOURCES)]
+    store_dir = tempfile.mkdtemp(prefix='baselines_')
+    try:
+        store = BaselineStore(store_dir)
+        absorb_times = []
+        for date, df in history:
+            start = time.perf_counter()
+            store.absorb_day(date.strftime('%Y-%m-%d'), df, source_ids)
+            absorb_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        store.save()
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = BaselineStore(store_dir).load()
+        load_time = time.perf_counter() - start
+
+        last_date = dates[-1]
+        start = time.perf_counter()
+        expected = recompute(history).xs(last_date.weekday(), level='weekday')
+        recompute_time = time.perf_counter() - start
+
+        # Paridad con el cálculo directo sobre la ventana (filas por archivo del último día de la semana)
+        for source_id, row in expected.iterrows():
+            stats = store.get(source_id, last_date.weekday()).stats['rows_per_file']
+            assert stats.count == row['count'] and np.isclose(stats.mean, row['mean'], rtol=1e-9)
+            assert stats.min == row['min'] and stats.max == row['max']
+            assert row['count'] < 2 or np.isclose(stats.stdev, row['std'], rtol=1e-6)
+
+        size_mb = os.path.getsize(os.path.join(store_dir, 'baselines.json')) / 1e6
+        print(f"--- Benchmark: líneas base móviles ({N_SOURCES} fuentes, {N_DAYS} días, ventana de "
+              f"{DEFAULT_WINDOW_DAYS} semanas) ---")
+        full = 7 * DEFAULT_WINDOW_DAYS
+        print(f"actualización por día: con la ventana recién llena {np.mean(absorb_times[full:full + 7]) * 1000:6.1f}ms | "
+              f"última semana {np.mean(absorb_times[-7:]) * 1000:6.1f}ms (no crece con la historia)")
+        print(f"recalcular las {DEFAULT_WINDOW_DAYS} semanas desde los archivos (ya en memoria): "
+              f"{recompute_time * 1000:6.1f}ms")
+        print(f"store: {size_mb:5.1f} MB | guardar {save_time:5.2f}s | cargar {load_time:5.2f}s | paridad ✓")
+    finally:
+        shutil.rmtree(store_dir)
+
+if __name__ == '__main__':
+    main()
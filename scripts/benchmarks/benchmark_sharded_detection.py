@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+# --- CONFIGURACIÓN ---
+OPERATION_DATES = ['2025-09-08', '2025-09-09', '2025-09-10', '2025-09-11', '2025-09-12']
+SHARD_COUNTS = [1, 3, 4]
+DETECTION_SCRIPT = os.path.join(project_root, 'scripts', 'pipeline', 'run_incident_detection.py')
+OUTPUT_DIR = os.path.join(project_root, 'outputs')
+
+def run_detection_process(args: list) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, DETECTION_SCRIPT, *args], cwd=project_root,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+def wait_all(processes: list):
+    for process in processes:
+        _, stderr = process.communicate()
+        assert process.returncode == 0, f"Un proceso de detección falló:\n{stderr}"
+
+def read_report(operation_date: str) -> bytes:
+    with open(os.path.join(OUTPUT_DIR, f"{operation_date}_incidents_report.json"), 'rb') as f:
+        return f.read()
+
+def main():
+    """
+    Simula N hosts en una sola máquina: lanza N procesos locales (uno por shard) que solo se
+    coordinan a través de una carpeta compartida, y compara el reporte final armado por el
+    merge con el de una corrida sin shards. Sobrescribe los reportes de 'outputs/'.
+    """
+    print("--- Benchmark: detección sin shards vs. N procesos con shards ---")
+    for operation_date in OPERATION_DATES:
+        start = time.perf_counter()
+        wait_all([run_detection_process(['--date', operation_date])])
+        single_time = time.perf_counter() - start
+        expected = read_report(operation_date)
+        line = f"{operation_date} | sin shards: {single_time:5.2f}s"
+
+        for shard_count in SHARD_COUNTS:
+            shard_dir = tempfile.mkdtemp(prefix='shards_')
+            try:
+                os.remove(os.path.join(OUTPUT_DIR, f"{operation_date}_incidents_report.json"))
+                start = time.perf_counter()
+                wait_all([run_detection_process(['--date', operation_date, '--shard', f"{index}/{shard_count}",
+                                                 '--shard-dir', shard_dir])
+                          for index in range(shard_count)])
+                sharded_time = time.perf_counter() - start
+                assert read_report(operation_date) == expected, f"El reporte con {shard_count} shards difiere"
+            finally:
+                shutil.rmtree(shard_dir)
+            line += f" | {shard_count} shards: {sharded_time:5.2f}s"
+        print(line + " | paridad ✓")
+
+if __name__ == '__main__':
+    main()
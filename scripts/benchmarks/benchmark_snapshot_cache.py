@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import contextlib
+import io
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.data_loader import load_and_filter_daily_files, create_historical_summary
+
+# --- CONFIGURACIÓN ---
+BASE_DATA_PATH = os.path.join(project_root, "data")
+OPERATION_DATE = "2025-09-08"
+REPETITIONS = 5
+
+def timed(func, **kwargs) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(**kwargs)
+    return time.perf_counter() - start
+
+def main():
+    print("--- Benchmark: JSON vs. caché columnar (cold / warm) ---")
+    cache_dir = tempfile.mkdtemp(prefix="snapshot_cache_")
+    try:
+        cases = [
+            ("load_and_filter_daily_files", load_and_filter_daily_files,
+             {"execution_date_str": OPERATION_DATE, "base_data_path": BASE_DATA_PATH}),
+            ("create_historical_summary", create_historical_summary,
+             {"base_data_path": BASE_DATA_PATH}),
+        ]
+        for name, func, kwargs in cases:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            json_time = min(timed(func, **kwargs) for _ in range(REPETITIONS))
+            cold_time = timed(func, use_cache=True, cache_dir=cache_dir, **kwargs)
+            warm_time = min(timed(func, use_cache=True, cache_dir=cache_dir, **kwargs) for _ in range(REPETITIONS))
+            print(f"{name:<30} json: {json_time:.3f}s  cold: {cold_time:.3f}s  warm: {warm_time:.3f}s")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
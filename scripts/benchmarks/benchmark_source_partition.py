@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.detection.partition import SourcePartitionedFrame, index_cv_by_source
+
+# --- CONFIGURACIÓN ---
+N_SOURCES = [18, 1_000, 5_000]
+FILES_PER_SOURCE = 20
+SEED = 42
+
+def build_synthetic_day(n_sources: int) -> tuple:
+    """Archivos de un día (mezclados entre fuentes) y un CV mínimo por fuente."""
+    rng = np.random.default_rng(SEED)
+    n_records = n_sources * FILES_PER_SOURCE
+    source_ids = rng.permutation(np.repeat(np.arange(n_sources), FILES_PER_SOURCE)).astype(str)
+    df = pd.DataFrame({
+        'filename': [f"file_{i}.csv" for i in range(n_records)],
+        'rows': rng.integers(0, 100_000, n_records),
+        'source_id': pd.Categorical(source_ids),
+    })
+    cv_data = [{'source_id': str(source_id)} for source_id in range(n_sources)]
+    return df, cv_data
+
+def legacy_selection(df: pd.DataFrame, cv_data: list) -> int:
+    """Selección anterior: una máscara booleana + copia y un `next` lineal por fuente."""
+    total = 0
+    for source_id in [str(item.get('source_id')) for item in cv_data]:
+        df_source_files = df[df['source_id'] == source_id].copy()
+        source_cv_info = next((item for item in cv_data if str(item.get('source_id')) == source_id), None)
+        total += len(df_source_files) + (source_cv_info is not None)
+    return total
+
+def partitioned_selection(df: pd.DataFrame, cv_data: list) -> int:
+    files_by_source = SourcePartitionedFrame(df)
+    cv_by_source = index_cv_by_source(cv_data)
+    total = 0
+    for source_id in [str(item.get('source_id')) for item in cv_data]:
+        df_source_files = files_by_source.get(source_id)
+        source_cv_info = cv_by_source.get(source_id)
+        total += len(df_source_files) + (source_cv_info is not None)
+    return total
+
+def main():
+    print("--- Benchmark: selección por fuente (máscara + next) vs. partición por offsets ---")
+    for n_sources in N_SOURCES:
+        df, cv_data = build_synthetic_day(n_sources)
+
+        start = time.perf_counter()
+        expected = legacy_selection(df, cv_data)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = partitioned_selection(df, cv_data)
+        partition_time = time.perf_counter() - start
+
+        assert result == expected
+        print(f"{n_sources:>6} fuentes | máscara: {legacy_time:7.3f}s ({1e6 * legacy_time / n_sources:7.1f} µs/fuente) | "
+              f"partición: {partition_time:7.3f}s ({1e6 * partition_time / n_sources:6.1f} µs/fuente) | "
+              f"{legacy_time / partition_time:6.1f}x")
+
+if __name__ == '__main__':
+    main()
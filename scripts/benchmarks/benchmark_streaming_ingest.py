@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import contextlib
+import io
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.data_loader import load_and_filter_daily_files
+
+# --- CONFIGURACIÓN ---
+SOURCE_DATE = "2025-09-08"
+BASE_DATA_PATH = os.path.join(project_root, "data")
+SCALE_FACTORS = [1, 10, 50]
+
+def build_scaled_snapshot(scale: int, target_dir: str) -> str:
+    """Replica el files.json real `scale` veces (con source_ids sintéticos) en una carpeta temporal."""
+    with open(os.path.join(BASE_DATA_PATH, f"{SOURCE_DATE}_20_00_UTC", "files.json"), 'r') as f:
+        data = json.load(f)
+    scaled = {}
+    for i in range(scale):
+        for source_id, files in data.items():
+            scaled[f"{source_id}_{i}" if i else source_id] = files
+    folder = os.path.join(target_dir, f"{SOURCE_DATE}_20_00_UTC")
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, "files.json")
+    with open(file_path, 'w') as f:
+        json.dump(scaled, f, indent=4)
+    return file_path
+
+def measure(base_data_path: str, streaming: bool) -> tuple:
+    """Devuelve (segundos, pico de memoria en MB, filas) para una carga."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = load_and_filter_daily_files(SOURCE_DATE, base_data_path=base_data_path, streaming=streaming)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, len(df)
+
+def main():
+    print("--- Benchmark: json.load vs. ingesta streaming columnar ---")
+    print(f"{'escala':>7} {'tamaño MB':>10} {'modo':>10} {'seg':>8} {'pico MB':>9} {'filas':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in SCALE_FACTORS:
+            file_path = build_scaled_snapshot(scale, tmp_dir)
+            size_mb = os.path.getsize(file_path) / 1024 / 1024
+            for streaming in (False, True):
+                elapsed, peak_mb, n_rows = measure(tmp_dir, streaming)
+                mode = "streaming" if streaming else "json.load"
+                print(f"{scale:>7} {size_mb:>10.1f} {mode:>10} {elapsed:>8.2f} {peak_mb:>9.1f} {n_rows:>7}")
+
+if __name__ == '__main__':
+    main()
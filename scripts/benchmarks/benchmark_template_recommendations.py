@@ -0,0 +1,43 @@
+import os
+import sys
+import json
+import time
+from collections import Counter
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.agents.recommender.templates import TEMPLATE_RULES, template_recommendation
+from src.preparation.cv_profiles import load_cv_profiles
+from src.preparation.filename_patterns import default_patterns
+
+# --- CONFIGURACIÓN ---
+OPERATION_DATE = '2025-09-08'
+DAY = 'Mon'
+REPEATS = 2000
+LLM_LATENCY_S = 3.0   # latencia típica de una llamada al recommender_agent, como referencia
+
+def main():
+    with open(os.path.join('outputs', f"{OPERATION_DATE}_incidents_report.json"), 'r') as f:
+        incidents = json.load(f)
+    profiles = load_cv_profiles(os.path.join('outputs', 'cv_data.json'))
+    default_patterns()  # los templates de nombres se compilan una vez por proceso
+
+    tiers = Counter()
+    print(f"--- Benchmark: recomendaciones por plantilla ({OPERATION_DATE}, {len(incidents)} incidencias, "
+          f"{len(TEMPLATE_RULES)} reglas) ---")
+    for incident in incidents:
+        profile = profiles.get(incident['source_id'])
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            recommendation = template_recommendation(incident, profile, DAY)
+        elapsed_us = (time.perf_counter() - start) / REPEATS * 1e6
+        tier = 'plantilla' if recommendation is not None else 'agente'
+        tiers[tier] += 1
+        print(f"{incident['source_id']:>7} | {incident['incident_type']:<45} | {tier:<9} | {elapsed_us:6.1f}µs")
+    print(f"plantilla: {tiers['plantilla']} | agente: {tiers['agente']} | llamadas al LLM evitadas: "
+          f"{tiers['plantilla']} (~{tiers['plantilla'] * LLM_LATENCY_S:.0f}s de latencia secuencial a "
+          f"{LLM_LATENCY_S:.0f}s por llamada)")
+
+if __name__ == '__main__':
+    main()
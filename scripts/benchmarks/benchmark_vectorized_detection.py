@@ -0,0 +1,115 @@
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.data_loader import load_and_filter_daily_files
+from src.preparation.cv_profiles import compile_cv_profiles, load_cv_profiles
+from src.detection.engine import run_detectors_per_source
+from src.detection.vectorized import run_vectorized_detection
+
+# --- CONFIGURACIÓN ---
+CV_DATA_PATH = os.path.join('outputs', 'cv_data.json')
+SAMPLE_DATES = ['2025-09-08', '2025-09-09', '2025-09-10', '2025-09-11', '2025-09-12']
+OPERATION_DATE = '2025-09-08'
+PARITY_RECORDS = 50_000
+N_RECORDS = [100_000, 1_000_000]
+LEGACY_MAX_RECORDS = 100_000  # el motor por fuente usa iterrows; más arriba solo se mide el vectorizado
+FILES_PER_SOURCE = 50
+SEED = 42
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+def build_synthetic_cv(n_sources: int, rng):
+    """CVs sintéticos que cubren todas las ramas: sin CV, sin media de vacíos, ventanas inválidas, ids repetidos."""
+    cv_data = []
+    for source_id in range(n_sources):
+        kind = source_id % 10
+        if kind == 9:
+            cv_data.append({'source_id': str(source_id)})
+            continue
+        rows_mean = float(rng.choice([50.0, 5_000.0, 20_000.0]))
+        window = rng.choice(['08:00:00–09:00:00 UTC', '14:00:00–15:30:00 UTC', 'ventana inválida'])
+        cv_data.append({
+            'source_id': str(source_id),
+            'day_of_week_row_stats': [
+                {'day': day, 'rows_mean': rows_mean,
+                 'empty_files_mean': None if kind == 3 else float(rng.uniform(0, 3))}
+                for day in WEEKDAYS
+            ],
+            'file_processing_daily_stats': [
+                {'day': day, 'mean_files': None if kind == 4 else float(rng.uniform(FILES_PER_SOURCE * 0.5, FILES_PER_SOURCE * 1.5))}
+                for day in WEEKDAYS
+            ],
+            'upload_schedule_daily_stats': [{'day': day, 'upload_window_expected_utc': window} for day in WEEKDAYS],
+            'general_volume_stats': {'median_rows': int(rng.choice([10, 5_000])), 'stdev_rows': rows_mean / 3},
+        })
+    # Fuentes repetidas en la lista y fuentes con archivos pero sin entrada en el CV
+    return compile_cv_profiles(cv_data + cv_data[:3])[0]
+
+def build_synthetic_day(n_records: int) -> tuple:
+    rng = np.random.default_rng(SEED)
+    n_sources = max(n_records // FILES_PER_SOURCE, 1)
+    cv_data = build_synthetic_cv(n_sources, rng)
+    day = pd.Timestamp(OPERATION_DATE, tz='UTC')
+    coverage = rng.choice(['20250907', '20250901', '20250299', ''], n_records, p=[0.6, 0.1, 0.05, 0.25])
+    df = pd.DataFrame({
+        'filename': [f"report_{i}_{date}.csv" for i, date in enumerate(coverage)],
+        'rows': np.where(rng.random(n_records) < 0.05, 0, rng.integers(0, 40_000, n_records)),
+        'status': pd.Categorical(rng.choice(['processed', 'stopped', 'Stopped', 'failure'], n_records, p=[0.9, 0.04, 0.01, 0.05])),
+        'is_duplicated': pd.array(rng.random(n_records) < 0.03, dtype='boolean'),
+        'file_size': rng.exponential(1.0, n_records),
+        'uploaded_at': day + pd.to_timedelta(rng.integers(0, 86_400, n_records), unit='s'),
+        'status_message': pd.Categorical([None] * n_records),
+        'source_id': pd.Categorical(rng.integers(0, n_sources + 5, n_records).astype(str)),
+    })
+    return df, cv_data
+
+def same_report(expected: list, result: list) -> bool:
+    return json.dumps(expected, ensure_ascii=False) == json.dumps(result, ensure_ascii=False)
+
+def run_quietly(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+def main():
+    print("--- Paridad: motor por fuente vs. motor vectorizado ---")
+    cv_data = load_cv_profiles(CV_DATA_PATH)
+    for date in SAMPLE_DATES:
+        df, _ = run_quietly(load_and_filter_daily_files, date)
+        expected, _ = run_quietly(run_detectors_per_source, df, cv_data, date)
+        result, _ = run_quietly(run_vectorized_detection, df, cv_data, date)
+        assert same_report(expected, result), f"Reporte distinto para {date}"
+        print(f"   {date}: {len(result)} incidencias | paridad ✓")
+
+    df, cv_data = build_synthetic_day(PARITY_RECORDS)
+    expected, _ = run_quietly(run_detectors_per_source, df, cv_data, OPERATION_DATE)
+    result, _ = run_quietly(run_vectorized_detection, df, cv_data, OPERATION_DATE)
+    assert same_report(expected, result), "Reporte distinto en el set sintético"
+    types = pd.Series([incident['incident_type'] for incident in result]).value_counts()
+    print(f"   sintético ({PARITY_RECORDS} archivos): {len(result)} incidencias | paridad ✓")
+    for incident_type, count in types.items():
+        print(f"      {incident_type}: {count}")
+
+    print("\n--- Benchmark: un día completo ---")
+    for n_records in N_RECORDS:
+        df, cv_data = build_synthetic_day(n_records)
+        result, vectorized_time = run_quietly(run_vectorized_detection, df, cv_data, OPERATION_DATE)
+        line = f"{n_records:>9} archivos, {len(cv_data.source_order)} CVs | vectorizado: {vectorized_time:6.2f}s"
+        if n_records <= LEGACY_MAX_RECORDS:
+            expected, legacy_time = run_quietly(run_detectors_per_source, df, cv_data, OPERATION_DATE)
+            assert same_report(expected, result)
+            line += f" | por fuente: {legacy_time:7.2f}s ({legacy_time / vectorized_time:5.1f}x) | paridad ✓"
+        print(line)
+
+if __name__ == '__main__':
+    main()
@@ -13,13 +13,23 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 from src.agents.recommender.agent import recommender_agent
+from src.agents.recommender.templates import TIER_LLM, TIER_TEMPLATE, template_recommendation
 from src.agents.recommender_evaluator_agent.agent import recommender_evaluator_agent
+from src.preparation.cv_profiles import load_cv_profiles
+from src.reporting.prompt_context import compact_incident_context, estimate_tokens, incident_day
 
 # --- CONFIGURACIÓN ---
 GROUND_TRUTH_PATH = "evaluation/recommender/ground_truth/ground_truth_recommender_01.json"
 EVALUATION_LOG_PATH = "evaluation/recommender/evaluation_results/evaluation_log.json"
 CV_DATA_PATH = "outputs/cv_data.json"
 
+# Nivel a evaluar: None = el que usaría el reporte (plantilla si la hay, si no el agente);
+# TIER_TEMPLATE o TIER_LLM fuerzan uno para comparar la calidad entre niveles
+EVALUATED_TIER = None
+
+# Qué se evaluó según el nivel que produjo la recomendación
+EVALUATED_COMPONENT = {TIER_TEMPLATE: "template_recommendation", TIER_LLM: "RecommenderAgent"}
+
 APP_NAME = "recommender_eval_app"
 USER_ID = "eval_user"
 
@@ -34,32 +44,52 @@ async def main():
             test_case = json.load(f)
         incident_data = test_case['incident_data']
         golden_recommendation = test_case['golden_recommendation']
+        # Día de la operación del caso: las incidencias de duplicados, archivos viejos o subidas
+        # tardías no lo citan en sus detalles
+        operation_date = test_case.get('operation_date')
+        day = (datetime.strptime(operation_date, '%Y-%m-%d').strftime('%a') if operation_date
+               else incident_day(incident_data))
         
-        with open(CV_DATA_PATH, 'r') as f:
-            cv_data = json.load(f)
+        profiles = load_cv_profiles(CV_DATA_PATH)
             
         source_id = incident_data['source_id']
-        source_cv_info = next((item for item in cv_data if str(item.get('source_id')) == source_id), {})
+        source_cv_info = profiles.raw_cv(source_id)
         print("✓ Caso de prueba y contexto cargados.")
     except FileNotFoundError as e:
         print(f"!! ERROR: Archivo no encontrado: {e.filename}")
         return
 
-    # --- 2. OBTENER RECOMENDACIÓN DEL AGENTE ---
-    print("\n[2/5] Ejecutando el RecommenderAgent...")
-    rec_session_service = InMemorySessionService()
-    rec_runner = Runner(agent=recommender_agent, app_name=APP_NAME, session_service=rec_session_service)
-    rec_session_id = f"session_rec_{source_id}"
-    await rec_session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=rec_session_id)
-    
-    prompt_context = f"**INCIDENCIA DETECTADA:**\n```json\n{json.dumps(incident_data, indent=2)}\n```\n\n**CONTEXTO DEL CV DE LA FUENTE:**\n```json\n{json.dumps(source_cv_info, indent=2)}\n```"
-    user_message = types.Content(role='user', parts=[types.Part(text=prompt_context)])
-    
-    agent_recommendation = "No se pudo generar una recomendación."
-    async for event in rec_runner.run_async(user_id=USER_ID, session_id=rec_session_id, new_message=user_message):
-        if event.is_final_response() and event.content:
-            agent_recommendation = event.content.parts[0].text.strip()
-    print("✓ Recomendación del agente obtenida.")
+    # --- 2. OBTENER LA RECOMENDACIÓN (PLANTILLA O AGENTE) ---
+    template_text = None
+    if EVALUATED_TIER != TIER_LLM:
+        template_text = template_recommendation(incident_data, profiles.get(source_id), day)
+        if template_text is None and EVALUATED_TIER == TIER_TEMPLATE:
+            print("!! ERROR: Ninguna plantilla cubre este caso de prueba.")
+            return
+    recommendation_tier = TIER_TEMPLATE if template_text is not None else TIER_LLM
+    agent_evaluated = EVALUATED_COMPONENT[recommendation_tier]
+    prompt_context = None
+
+    if template_text is not None:
+        print("\n[2/5] Aplicando la plantilla determinística...")
+        agent_recommendation = template_text
+        print("✓ Recomendación de la plantilla obtenida.")
+    else:
+        print("\n[2/5] Ejecutando el RecommenderAgent...")
+        rec_session_service = InMemorySessionService()
+        rec_runner = Runner(agent=recommender_agent, app_name=APP_NAME, session_service=rec_session_service)
+        rec_session_id = f"session_rec_{source_id}"
+        await rec_session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=rec_session_id)
+
+        # Mismo contexto compacto que el reporte final (CV proyectado al tipo de incidencia y archivos resumidos)
+        prompt_context = compact_incident_context(incident_data, source_cv_info, day)
+        user_message = types.Content(role='user', parts=[types.Part(text=prompt_context)])
+
+        agent_recommendation = "No se pudo generar una recomendación."
+        async for event in rec_runner.run_async(user_id=USER_ID, session_id=rec_session_id, new_message=user_message):
+            if event.is_final_response() and event.content:
+                agent_recommendation = event.content.parts[0].text.strip()
+        print("✓ Recomendación del agente obtenida.")
 
     # --- 3. EJECUTAR EL AGENTE EVALUADOR ---
     print("\n[3/5] Ejecutando el RecommenderEvaluatorAgent...")
@@ -90,19 +120,22 @@ async def main():
         print("   !! El evaluador no devolvió un JSON válido.")
         verdict = {"score": 0.0, "justification": f"Respuesta no válida del Evaluador: {evaluator_verdict_str}"}
 
-    print("\n--- REPORTE DE EVALUACIÓN CUALITATIVA: RecommenderAgent ---")
+    print(f"\n--- REPORTE DE EVALUACIÓN CUALITATIVA: {agent_evaluated} ---")
     print("==========================================================")
     print(f"   - Puntuación (Score): {verdict.get('score', 'N/A')} / 5.0")
     print(f"   - Justificación: {verdict.get('justification', 'No disponible.')}")
+    print(f"   - Nivel evaluado: {recommendation_tier}")
     print("==========================================================")
     
     # --- 5. GUARDAR EL LOG JSON ---
     print("\n[5/5] Guardando resultados en el log de evaluación...")
     log_entry = {
         "timestamp_utc": datetime.now(timezone.utc).isoformat(),
-        "agent_evaluated": "RecommenderAgent",
+        "agent_evaluated": agent_evaluated,
         "test_case_id": test_case['test_case_id'],
         "prompt_version": "v1.0",
+        "recommendation_tier": recommendation_tier,
+        "prompt_context_tokens": estimate_tokens(prompt_context) if prompt_context is not None else None,
         "score": verdict.get('score'),
         "justification": verdict.get('justification'),
         "golden_recommendation": golden_recommendation,
@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.snapshot_cache import DEFAULT_CACHE_DIR, list_snapshot_files
+from src.preparation.data_loader import load_snapshot_frames
+from src.preparation.filename_index import DEFAULT_INDEX_DIR, FilenameIndex
+
+def main(base_data_path: str = 'data', index_dir: str = DEFAULT_INDEX_DIR, use_cache: bool = False,
+         cache_dir: str = DEFAULT_CACHE_DIR, workers: int = 1):
+    """
+    Siembra el índice persistente de nombres con las snapshots que aún no absorbió. Se corre
+    una vez para cargar la historia; después cada detección con `--reuploads` lo mantiene
+    al día con los archivos de su fecha.
+    """
+    print(f"--- [ÍNDICE] Sembrando el índice de nombres en '{index_dir}' desde '{base_data_path}' ---")
+    try:
+        snapshot_files = list_snapshot_files(base_data_path)
+    except FileNotFoundError:
+        print(f"!! ERROR: El directorio base '{base_data_path}' no fue encontrado.")
+        return
+
+    index = FilenameIndex(index_dir).load()
+    pending = [file_path for file_path in snapshot_files if os.path.abspath(file_path) not in index.absorbed]
+    print(f"Se encontraron {len(pending)} snapshots nuevas para absorber.")
+    added = 0
+    for file_path, df in load_snapshot_frames(pending, workers=workers, use_cache=use_cache, cache_dir=cache_dir):
+        if df is None:
+            print(f"!! ADVERTENCIA: No se pudo procesar el archivo {file_path}. Saltando.")
+            continue
+        added += index.absorb(df, label=os.path.abspath(file_path))
+    index.save()
+    print(f"✓ {added} nombres nuevos; el índice tiene {len(index)} pares (fuente, nombre).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Siembra el índice persistente de nombres de archivo por fuente.")
+    parser.add_argument('--base-data-path', default='data')
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--use-cache', action='store_true', help="Lee las snapshots desde la caché columnar.")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para parsear las snapshots.")
+    args = parser.parse_args()
+    main(base_data_path=args.base_data_path, index_dir=args.index_dir, use_cache=args.use_cache, workers=args.workers)
@@ -2,6 +2,8 @@ import os
 import sys
 import json
 import asyncio
+import inspect
+import argparse
 from datetime import datetime
 
 # Añadimos la ruta raíz del proyecto al sys.path
@@ -12,8 +14,16 @@ sys.path.append(project_root)
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
-from src.agents.recommender.agent import recommender_agent
+from src.agents.recommender.agent import batch_recommender_agent, recommender_agent
+from src.agents.recommender.templates import TIER_LLM, TIER_TEMPLATE, template_recommendation
 from src.reporting.consolidator import classify_source_severity
+from src.reporting.recommendations import (
+    DEFAULT_CONCURRENCY, DEFAULT_RATE, DEFAULT_RETRIES, DEFAULT_TIMEOUT, FALLBACK_RECOMMENDATION,
+    batch_prompt_context, incident_prompt_context, parse_batch_recommendations, run_bounded
+)
+from src.reporting.prompt_context import compact_batch_context, compact_incident_context, estimate_tokens
+from src.reporting.recommendation_cache import RecommendationCache, incident_fingerprint, recommender_prompt_digest
+from src.preparation.cv_profiles import load_cv_profiles
 
 # --- CONFIGURACIÓN ---
 OUTPUT_DIR = "outputs"
@@ -46,7 +56,8 @@ def generate_markdown_report(classified_data: dict, date_str: str, output_path:
             for incident in data['incidents']:
                 report_lines.append(f"- **Tipo:** {incident['incident_type']}")
                 report_lines.append(f"  - **Detalle:** {incident['incident_details']}")
-                report_lines.append(f"  - **Recomendación IA:** {incident.get('recommendation', 'No generada.')}")
+                label = recommendation_label(incident)
+                report_lines.append(f"  - **{label}:** {incident.get('recommendation', 'No generada.')}")
                 if incident.get('files_to_review'):
                     report_lines.append(f"  - **Archivos Afectados ({incident['total_incidentes']}):**")
                     for filename in incident['files_to_review']:
@@ -60,7 +71,8 @@ def generate_markdown_report(classified_data: dict, date_str: str, output_path:
             for incident in data['incidents']:
                 report_lines.append(f"- **Tipo:** {incident['incident_type']}")
                 report_lines.append(f"  - **Detalle:** {incident['incident_details']}")
-                report_lines.append(f"  - **Recomendación IA:** {incident.get('recommendation', 'No generada.')}")
+                label = recommendation_label(incident)
+                report_lines.append(f"  - **{label}:** {incident.get('recommendation', 'No generada.')}")
                 if incident.get('files_to_review'):
                     report_lines.append(f"  - **Archivos Afectados ({incident['total_incidentes']}):**")
                     for filename in incident['files_to_review']:
@@ -76,9 +88,29 @@ def generate_markdown_report(classified_data: dict, date_str: str, output_path:
         f.write("\n".join(report_lines))
     print(f"✓ Reporte Markdown guardado en: {output_path}")
 
-async def main(operation_date_str: str):
+def recommendation_label(incident: dict) -> str:
+    """Etiqueta de la recomendación en el Markdown; las tomadas de la caché lo indican con su fecha."""
+    if incident.get('recommendation_tier') == TIER_TEMPLATE:
+        return "Recomendación (plantilla)"
+    if incident.get('recommendation_cached'):
+        return f"Recomendación IA (caché del {incident['recommendation_cached_at']})"
+    return "Recomendación IA"
+
+async def main(operation_date_str: str, concurrency: int = DEFAULT_CONCURRENCY, rate: float | None = DEFAULT_RATE,
+               timeout: float | None = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES, use_cache: bool = True,
+               batch_by_source: bool = False, compact_context: bool = True, use_templates: bool = True):
     """
     Orquesta la generación del reporte ejecutivo para una fecha específica.
+    Las recomendaciones se piden en paralelo: como máximo `concurrency` llamadas en vuelo,
+    `rate` llamadas por segundo, `timeout` segundos por llamada y `retries` reintentos.
+    Con `use_cache` las incidencias con la misma huella (tipo, fuente, magnitudes, CV y prompt)
+    que una ya recomendada reutilizan esa recomendación sin llamar al agente.
+    Con `batch_by_source` se hace una sola llamada por fuente con todas sus incidencias.
+    Con `compact_context` cada mensaje lleva solo la parte del CV que importa para la incidencia
+    y un resumen de sus archivos (ver `src/reporting/prompt_context.py`).
+    Con `use_templates` los patrones conocidos se resuelven con las plantillas determinísticas de
+    `src/agents/recommender/templates.py` y solo el resto va al agente; cada incidencia registra
+    en 'recommendation_tier' qué nivel la resolvió.
     """
     INCIDENTS_REPORT_PATH = os.path.join(OUTPUT_DIR, f"{operation_date_str}_incidents_report.json")
     CV_DATA_PATH = os.path.join(OUTPUT_DIR, "cv_data.json")
@@ -90,7 +122,7 @@ async def main(operation_date_str: str):
     print("\n[1/4] Cargando datos de incidencias y CVs...")
     try:
         with open(INCIDENTS_REPORT_PATH, 'r') as f: incidents_data = json.load(f)
-        with open(CV_DATA_PATH, 'r') as f: cv_data = json.load(f)
+        profiles = load_cv_profiles(CV_DATA_PATH)
     except FileNotFoundError as e:
         print(f"!! ERROR: Archivo no encontrado: {e.filename}. Asegúrate de que el paso de detección se ejecutó.")
         return
@@ -107,25 +139,60 @@ async def main(operation_date_str: str):
 
     print("\n[3/4] Generando recomendaciones con el Agente de IA...")
     session_service = InMemorySessionService()
-    runner = Runner(agent=recommender_agent, app_name=APP_NAME, session_service=session_service)
-    
+
+    # Una recomendación por incidencia, en el orden del reporte: primero las plantillas; de lo que
+    # queda, las que están en caché no llaman al agente
+    day = datetime.strptime(operation_date_str, '%Y-%m-%d').strftime('%a')
+    cache = RecommendationCache().load() if use_cache else None
+    prompt_digest = recommender_prompt_digest(
+        'compact' if compact_context else 'full',
+        *(inspect.getsource(code) for code in (generate_recommendations, incident_prompt_context, batch_prompt_context,
+                                               inspect.getmodule(compact_incident_context))))
+    pending = []
+    templated = 0
     for source_id, data in classified_sources.items():
-        print(f"   -> Obteniendo recomendaciones para la fuente: {source_id}...")
-        source_cv_info = next((item for item in cv_data if str(item.get('source_id')) == source_id), {})
-        
         for incident in data['incidents']:
-            session_id = f"session_rec_{source_id}_{incident['incident_type']}"
-            await session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
-            
-            prompt_context = f"**INCIDENCIA DETECTADA:**\n```json\n{json.dumps(incident, indent=2)}\n```\n\n**CONTEXTO DEL CV DE LA FUENTE:**\n```json\n{json.dumps(source_cv_info, indent=2)}\n```"
-            user_message = types.Content(role='user', parts=[types.Part(text=prompt_context)])
-            
-            recommendation_text = "No se pudo generar una recomendación."
-            async for event in runner.run_async(user_id=USER_ID, session_id=session_id, new_message=user_message):
-                if event.is_final_response() and event.content:
-                    recommendation_text = event.content.parts[0].text.strip()
-            
-            incident['recommendation'] = recommendation_text
+            profile = profiles.get(source_id)
+            template_text = template_recommendation(incident, profile, day) if use_templates else None
+            if template_text is not None:
+                incident['recommendation'] = template_text
+                incident['recommendation_tier'] = TIER_TEMPLATE
+                templated += 1
+                continue
+            incident['recommendation_tier'] = TIER_LLM
+            fingerprint = incident_fingerprint(incident, profile.digest if profile is not None else '', prompt_digest)
+            entry = cache.get(fingerprint) if cache is not None else None
+            if entry is not None:
+                incident['recommendation'] = entry['recommendation']
+                incident['recommendation_cached'] = True
+                incident['recommendation_cached_at'] = datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d')
+            else:
+                pending.append((source_id, incident, fingerprint))
+    if use_templates:
+        print(f"   -> [PLANTILLAS] {templated} incidencias resueltas con plantillas; "
+              f"{sum(len(data['incidents']) for data in classified_sources.values()) - templated} van al agente.")
+    if cache is not None:
+        print(f"   -> [CACHÉ] {cache.stats['hits']} recomendaciones reutilizadas, {cache.stats['misses']} a generar "
+              f"({cache.stats['expired']} vencidas; {len(cache)} entradas).")
+
+    # Incidencias con la misma huella en el mismo día (p. ej. una fuente repetida) comparten llamada
+    unique = {}
+    for source_id, incident, fingerprint in pending:
+        unique.setdefault(fingerprint, (source_id, incident))
+    recommendations = await generate_recommendations(
+        list(unique.values()), session_service, profiles, batch_by_source, compact_context, day,
+        concurrency=concurrency, rate=rate, timeout=timeout, retries=retries)
+    # Cada resultado vuelve a su incidencia por posición, sin importar el orden en que terminó
+    results = dict(zip(unique, recommendations))
+    for source_id, incident, fingerprint in pending:
+        recommendation_text = results[fingerprint]
+        incident['recommendation'] = recommendation_text or FALLBACK_RECOMMENDATION
+        if cache is not None and recommendation_text:
+            cache.put(fingerprint, recommendation_text)
+    if cache is not None:
+        cache.save()
+        print(f"-> [CACHÉ] {cache.stats['stored']} recomendaciones nuevas guardadas; "
+              f"{cache.stats['evicted']} desalojadas por LRU ({len(cache)} entradas).")
 
     print("\n[4/4] Creando los archivos de reporte finales...")
     with open(FINAL_REPORT_JSON_PATH, 'w', encoding='utf-8') as f:
@@ -134,6 +201,138 @@ async def main(operation_date_str: str):
     
     generate_markdown_report(classified_sources, operation_date_str, FINAL_REPORT_MD_PATH)
 
-if __name__ == '__main__':
+async def generate_recommendations(items: list, session_service, profiles, batch_by_source: bool = False,
+                                   compact_context: bool = True, day: str | None = None, **limits) -> list:
+    """
+    Pide al agente una recomendación por incidencia, con la concurrencia y los límites de `run_bounded`.
+
+    Con `batch_by_source`, las fuentes con más de una incidencia se piden en una sola llamada
+    (incidencias numeradas y el CV una vez) y la respuesta JSON se reparte entre ellas; las
+    entradas que falten o no se puedan interpretar se piden después de a una.
+
+    Args:
+        items (list): Pares (source_id, incidencia), sin repetidos.
+        session_service: Servicio de sesiones de ADK compartido por todas las llamadas.
+        profiles (CVProfileStore): CVs compilados (el contexto de cada fuente).
+        batch_by_source (bool): Si es True, una llamada por fuente.
+        compact_context (bool): Si es True, mensajes compactos (CV proyectado, archivos resumidos).
+        day (str): Día de la operación ('Mon', ...), para proyectar las secciones por día del CV.
+
+    Returns:
+        list: Recomendación de cada elemento de `items` (None si no se pudo generar).
+    """
+    def incident_context(position: int) -> str:
+        source_id, incident = items[position]
+        if compact_context:
+            return compact_incident_context(incident, profiles.raw_cv(source_id), day)
+        return incident_prompt_context(incident, profiles.raw_cv(source_id))
+
+    def source_context(source_id: str, positions: list) -> str:
+        incidents = [items[position][1] for position in positions]
+        if compact_context:
+            return compact_batch_context(incidents, profiles.raw_cv(source_id), day)
+        return batch_prompt_context(incidents, profiles.raw_cv(source_id))
+
+    runner = Runner(agent=recommender_agent, app_name=APP_NAME, session_service=session_service)
+    results = [None] * len(items)
+    by_source = {}
+    for position, (source_id, _) in enumerate(items):
+        by_source.setdefault(source_id, []).append(position)
+    batches = {source_id: positions for source_id, positions in by_source.items()
+               if batch_by_source and len(positions) > 1}
+    singles = [position for position, (source_id, _) in enumerate(items) if source_id not in batches]
+
+    contexts = [source_context(source_id, positions) for source_id, positions in batches.items()]
+    contexts += [incident_context(position) for position in singles]
+    calls = []
+    if batches:
+        batch_runner = Runner(agent=batch_recommender_agent, app_name=APP_NAME, session_service=session_service)
+        calls += [batch_recommendation_call(batch_runner, session_service, source_id, prompt_context, len(positions))
+                  for (source_id, positions), prompt_context in zip(batches.items(), contexts)]
+    calls += [recommendation_call(runner, session_service, position, items[position][0], prompt_context)
+              for position, prompt_context in zip(singles, contexts[len(batches):])]
+    print(f"   -> {len(calls)} llamadas al agente para {len(items)} incidencias "
+          f"(hasta {limits.get('concurrency')} en paralelo, {limits.get('rate') or 'sin límite de'} llamadas/s)...")
+    outputs, stats = await run_bounded(calls, **limits)
+    for positions, parsed in zip(batches.values(), outputs[:len(batches)]):
+        for position, recommendation_text in zip(positions, parsed or [None] * len(positions)):
+            results[position] = recommendation_text
+    for position, recommendation_text in zip(singles, outputs[len(batches):]):
+        results[position] = recommendation_text
+
+    # Respaldo: las incidencias que la respuesta por fuente no cubrió se piden de a una
+    missing = [position for positions in batches.values() for position in positions if results[position] is None]
+    if missing:
+        print(f"   -> [LOTES] {len(missing)} incidencias sin recomendación en la respuesta por fuente; "
+              f"se piden de a una.")
+        fallback_contexts = [incident_context(position) for position in missing]
+        contexts += fallback_contexts
+        fallback_calls = [recommendation_call(runner, session_service, position, items[position][0], prompt_context)
+                          for position, prompt_context in zip(missing, fallback_contexts)]
+        outputs, fallback_stats = await run_bounded(fallback_calls, **limits)
+        for position, recommendation_text in zip(missing, outputs):
+            results[position] = recommendation_text
+        stats = {key: stats[key] + fallback_stats[key] for key in stats}
+
+    generated = sum(result is not None for result in results)
+    print(f"✓ {generated} de {len(items)} recomendaciones en {stats['elapsed_s']:.1f}s "
+          f"({stats['calls']} llamadas, {stats['retries']} reintentos, {stats['timeouts']} timeouts).")
+    if items:
+        # Contexto enviado vs. una llamada por incidencia con el CV completo (tokens de entrada estimados)
+        sent = sum(estimate_tokens(prompt_context) for prompt_context in contexts)
+        baseline = sum(estimate_tokens(incident_prompt_context(incident, profiles.raw_cv(source_id)))
+                       for source_id, incident in items)
+        print(f"-> [CONTEXTO] ~{sent:,} tokens de entrada en lugar de ~{baseline:,} "
+              f"({sent / baseline - 1:+.0%}; {len(batches)} fuentes en una sola llamada).")
+    return results
+
+def recommendation_call(runner, session_service, position: int, source_id: str, prompt_context: str):
+    """
+    Arma la llamada al agente para una incidencia. Cada intento abre su propia sesión, así un
+    reintento no hereda la conversación del intento fallido.
+    """
+    async def call(attempt: int):
+        session_id = f"session_rec_{position}_{source_id}_{attempt}"
+        return await ask_agent(runner, session_service, session_id, prompt_context)
 
-    asyncio.run(main(operation_date_str="2025-09-08"))
\ No newline at end of file
+    return call
+
+def batch_recommendation_call(runner, session_service, source_id: str, prompt_context: str, n_incidents: int):
+    """Arma la llamada al agente por fuente; devuelve una recomendación (o None) por incidencia."""
+    async def call(attempt: int):
+        session_id = f"session_rec_batch_{source_id}_{attempt}"
+        response_text = await ask_agent(runner, session_service, session_id, prompt_context)
+        return parse_batch_recommendations(response_text, n_incidents)
+
+    return call
+
+async def ask_agent(runner, session_service, session_id: str, prompt_context: str) -> str | None:
+    """Abre una sesión, envía el mensaje y devuelve el texto de la respuesta final (None si no hubo)."""
+    await session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+    user_message = types.Content(role='user', parts=[types.Part(text=prompt_context)])
+
+    response_text = None
+    async for event in runner.run_async(user_id=USER_ID, session_id=session_id, new_message=user_message):
+        if event.is_final_response() and event.content:
+            response_text = event.content.parts[0].text.strip()
+    return response_text
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera el reporte ejecutivo con recomendaciones para una fecha.")
+    parser.add_argument('--date', default="2025-09-08", help="Fecha de operación (YYYY-MM-DD).")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Llamadas al LLM en paralelo.")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Llamadas por segundo (0 = sin límite).")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Segundos por llamada.")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="Reintentos ante timeout o error.")
+    parser.add_argument('--no-cache', action='store_true', help="Pide todas las recomendaciones al agente.")
+    parser.add_argument('--batch-per-source', action='store_true',
+                        help="Una llamada por fuente con todas sus incidencias (el CV se envía una vez).")
+    parser.add_argument('--no-templates', action='store_true',
+                        help="Pide todas las recomendaciones al agente, también las de patrones conocidos.")
+    parser.add_argument('--full-context', action='store_true',
+                        help="Envía la incidencia y el CV completos (sin proyectar ni resumir archivos).")
+    args = parser.parse_args()
+    asyncio.run(main(operation_date_str=args.date, concurrency=args.concurrency, rate=args.rate,
+                     timeout=args.timeout, retries=args.retries, use_cache=not args.no_cache,
+                     batch_by_source=args.batch_per_source, compact_context=not args.full_context,
+                     use_templates=not args.no_templates))
\ No newline at end of file
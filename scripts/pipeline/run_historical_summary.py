@@ -0,0 +1,32 @@
+import os
+import sys
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.snapshot_cache import DEFAULT_CACHE_DIR
+from src.preparation.historical_store import DEFAULT_STORE_DIR, update_historical_summary
+
+def main(base_data_path: str = 'data', store_dir: str = DEFAULT_STORE_DIR, use_cache: bool = False,
+         cache_dir: str = DEFAULT_CACHE_DIR, workers: int = 1):
+    """
+    Pone al día el resumen histórico persistido: absorbe solo las snapshots nuevas (o lo
+    reconstruye si alguna ya absorbida cambió). La detección lo reutiliza cuando algún
+    detector registrado requiere el histórico.
+    """
+    print(f"--- [HISTÓRICO] Actualizando '{store_dir}' desde '{base_data_path}' ---")
+    df_summary = update_historical_summary(base_data_path, store_dir=store_dir, use_cache=use_cache,
+                                           cache_dir=cache_dir, workers=workers)
+    if not df_summary.empty:
+        print(f"✓ Resumen histórico de {len(df_summary)} filas (día, fuente) y "
+              f"{df_summary['source_id'].nunique()} fuentes.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Actualiza de forma incremental el resumen histórico persistido.")
+    parser.add_argument('--base-data-path', default='data')
+    parser.add_argument('--store-dir', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--use-cache', action='store_true', help="Lee las snapshots desde la caché columnar.")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para parsear las snapshots nuevas.")
+    args = parser.parse_args()
+    main(base_data_path=args.base_data_path, store_dir=args.store_dir, use_cache=args.use_cache, workers=args.workers)
@@ -2,57 +2,187 @@ import os
 import sys
 import pandas as pd
 import json
+import argparse
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root)
 
-from src.preparation.data_loader import load_and_filter_daily_files
-from src.detection.detectors import (
-    detect_duplicated_and_failed_files, detect_unexpected_empty_files,
-    detect_missing_files, detect_unexpected_volume_variation,
-    detect_file_upload_after_schedule, detect_upload_of_previous_file
-)
+from src.preparation.data_loader import load_and_filter_daily_files, load_snapshot_frames
+from src.preparation.schema import concat_file_records
+from src.preparation.cv_profiles import load_cv_profiles
+from src.preparation.snapshot_cache import list_snapshot_files, snapshot_fingerprint
+from src.preparation.baselines import BASELINE_MODES, BaselineStore, apply_baselines
+from src.preparation.quantile_sketches import QuantileSketchStore, apply_quantile_bands
+from src.preparation.filename_index import SEEN_BEFORE_COLUMN, FilenameIndex
+from src.preparation.filename_patterns import FILENAME_DATE_COLUMN, annotate_filename_fields
+from src.preparation.historical_store import update_historical_summary
+from src.detection.incremental import run_detection_incremental
+from src.detection.registry import INPUT_HISTORY, CallPlan, registered_detectors
+from src.detection.backfill import date_range, load_backfill_dataset
+from src.detection.sharding import DEFAULT_SHARD_DIR, ShardSpec, shard_inputs, write_shard_report, merge_shard_reports
 
 OUTPUT_DIR = "outputs"
 
-def main(operation_date_str: str):
+def main(operation_date_str: str, use_cache: bool = False, engine: str = 'per_source', workers: int = 1,
+         shard: ShardSpec | None = None, shard_dir: str = DEFAULT_SHARD_DIR, force: bool = False,
+         baselines: str | None = None, quantile_bands: bool = False, reuploads: bool = False):
     """
     Orquesta la detección de incidencias para una fecha de operación específica.
+    Con `use_cache=True` la snapshot del día se lee desde la caché columnar.
+    `engine='vectorized'` evalúa todas las fuentes de una vez (mismo reporte que 'per_source').
+    Con `workers` > 1 el motor por fuente reparte las fuentes en un pool de procesos.
+    Con `shard` solo se analizan las fuentes del shard: se escribe un reporte parcial y su
+    manifiesto en `shard_dir`, y el reporte final se arma cuando están todos los shards.
+    Solo se recalculan las fuentes cuyas entradas cambiaron desde la última corrida del día;
+    `force=True` ignora la caché de detección.
+    Con `baselines` ('fallback' u 'override') los umbrales salen de las líneas base observadas
+    en los días anteriores (aunque el store ya tenga el día o días posteriores), y al terminar
+    se les incorpora el día (salvo en modo shard).
+    Con `quantile_bands` la regla de volumen usa la banda p01-p99 de los sketches de cuantiles
+    de los días anteriores (sembrados desde las snapshots si están vacíos), que también
+    absorben el día al terminar.
+    Con `reuploads` los archivos cuyo nombre la fuente ya recibió en un día anterior (según el
+    índice persistente de nombres) cuentan como duplicados; el índice absorbe el día al terminar.
     """
     CV_DATA_PATH = os.path.join(OUTPUT_DIR, "cv_data.json")
     print(f"--- [DETECCIÓN] Iniciando para el día: {operation_date_str} ---")
 
     print("[1/3] Cargando datos...")
-    df_files_operation_date = load_and_filter_daily_files(operation_date_str)
+    df_files_operation_date = load_and_filter_daily_files(operation_date_str, use_cache=use_cache)
+    annotate_filenames(df_files_operation_date)
     try:
-        with open(CV_DATA_PATH, 'r') as f: cv_data = json.load(f)
+        # Los CVs se leen compilados; solo se recompilan si 'cv_data.json' cambió
+        profiles = load_cv_profiles(CV_DATA_PATH)
     except FileNotFoundError:
         print(f"!! ERROR: No se encontró '{CV_DATA_PATH}'. Ejecuta el data miner primero.")
         return
 
+    baseline_store = None
+    if baselines:
+        baseline_store = BaselineStore().load()
+        seed_baselines(baseline_store, profiles, operation_date_str, use_cache=use_cache)
+        detection_profiles = apply_baselines(profiles, baseline_store, mode=baselines, before=operation_date_str)
+    else:
+        detection_profiles = profiles
+    sketch_store = None
+    if quantile_bands:
+        sketch_store = QuantileSketchStore().load()
+        seed_quantile_sketches(sketch_store, operation_date_str, use_cache=use_cache)
+        detection_profiles = apply_quantile_bands(detection_profiles, sketch_store, before=operation_date_str)
+    filename_index = None
+    if reuploads:
+        filename_index = FilenameIndex().load()
+        mark_reuploads(df_files_operation_date, filename_index)
+
+    if shard is not None:
+        df_files_operation_date, shard_profiles = shard_inputs(df_files_operation_date, detection_profiles, shard)
+        print(f"-> [SHARDS] Shard {shard}: {len(shard_profiles)} de {len(profiles)} fuentes, "
+              f"{len(df_files_operation_date)} archivos.")
+        detection_profiles, all_profiles = shard_profiles, profiles
+
     print("[2/3] Ejecutando detectores para cada fuente...")
-    all_source_ids = [str(item.get('source_id')) for item in cv_data]
-    all_incidents = []
-
-    for source_id in all_source_ids:
-        print(f"--- Analizando Fuente: {source_id} ---")
-        df_source_files = df_files_operation_date[df_files_operation_date['source_id'] == source_id].copy()
-        source_cv_info = next((item for item in cv_data if str(item.get('source_id')) == source_id), None)
-        
-        detectors = [
-            detect_duplicated_and_failed_files, detect_unexpected_empty_files,
-            detect_missing_files, detect_unexpected_volume_variation,
-            detect_file_upload_after_schedule, detect_upload_of_previous_file,
-        ]
-        for detector_func in detectors:
-            args = [df_source_files]
-            if "source_cv_info" in detector_func.__code__.co_varnames: args.append(source_cv_info)
-            if "operation_date_str" in detector_func.__code__.co_varnames: args.append(operation_date_str)
-            incidents = detector_func(*args, verbose=False)
-            if incidents:
-                all_incidents.extend(incidents)
+    # El plan (qué corre por lotes y qué por fuente) se resuelve una vez para toda la corrida
+    plan = detection_plan(use_cache)
+    all_incidents = run_detection_incremental(df_files_operation_date, detection_profiles, operation_date_str,
+                                              engine=engine, plan=plan, workers=workers, force=force)
+    if engine == 'per_source':
+        plan.print_stats()
 
     print("[3/3] Consolidando y guardando reporte de incidencias...")
+    if shard is not None:
+        manifest_path = write_shard_report(all_incidents, all_profiles, detection_profiles, operation_date_str, shard,
+                                           snapshot_fingerprint(CV_DATA_PATH)['sha256'], shard_dir=shard_dir)
+        print(f"✓ Reporte parcial del shard {shard} ({len(all_incidents)} incidencias) confirmado en: {manifest_path}")
+        # El último shard en terminar arma el reporte final; los demás dejan el merge pendiente
+        output_path = os.path.join(OUTPUT_DIR, f"{operation_date_str}_incidents_report.json")
+        merge_shard_reports(operation_date_str, shard.count, output_path, shard_dir=shard_dir)
+        return
+
+    save_incidents_report(operation_date_str, all_incidents)
+    # Un día sin snapshot no es un día sin archivos: no se incorpora a las estadísticas
+    if os.path.exists(os.path.join('data', f"{operation_date_str}_20_00_UTC", 'files.json')):
+        absorb_day_statistics(operation_date_str, df_files_operation_date, profiles, baseline_store, sketch_store,
+                              filename_index)
+        for store in (baseline_store, sketch_store, filename_index):
+            if store is not None:
+                store.save()
+
+def detection_plan(use_cache: bool = False) -> CallPlan:
+    """
+    Plan de los detectores registrados. Si alguno requiere el histórico, el resumen se toma
+    del store incremental (solo se leen las snapshots que aún no absorbió).
+    """
+    specs = registered_detectors()
+    history = None
+    if any(INPUT_HISTORY in spec.inputs for spec in specs):
+        history = update_historical_summary(use_cache=use_cache)
+    return CallPlan(specs, history=history)
+
+def load_snapshot_history(use_cache: bool = False):
+    """Registros de archivos de todas las snapshots disponibles, sin duplicados exactos (None si no hay)."""
+    try:
+        snapshot_files = list_snapshot_files()
+    except FileNotFoundError:
+        return None
+    frames = [df for _, df in load_snapshot_frames(snapshot_files, use_cache=use_cache) if df is not None]
+    if not any(len(df) for df in frames):
+        return None
+    return concat_file_records(frames).drop_duplicates()
+
+def seed_baselines(baseline_store: BaselineStore, profiles, before: str, use_cache: bool = False):
+    """
+    Con líneas base vacías (p. ej. en un checkout nuevo), las siembra con los días anteriores
+    a `before` que traen las snapshots disponibles; después cada corrida agrega su día.
+    """
+    if baseline_store.absorbed:
+        return
+    df_history = load_snapshot_history(use_cache)
+    if df_history is None:
+        return
+    seeded = baseline_store.seed_from_history(df_history, profiles.source_order, before=before)
+    print(f"-> [BASELINES] Líneas base sembradas con {seeded} días de las snapshots anteriores a {before}.")
+
+def seed_quantile_sketches(sketch_store: QuantileSketchStore, before: str, use_cache: bool = False):
+    """Como `seed_baselines`, pero para los sketches de cuantiles vacíos."""
+    if sketch_store.absorbed:
+        return
+    df_history = load_snapshot_history(use_cache)
+    if df_history is None:
+        return
+    seeded = sketch_store.seed_from_history(df_history, before=before)
+    print(f"-> [CUANTILES] Sketches sembrados con {seeded} días de las snapshots anteriores a {before}.")
+
+def annotate_filenames(df_files):
+    """Extrae una vez fecha, entidad y lote del nombre de los archivos del día (los reutilizan los detectores)."""
+    if df_files.empty:
+        return
+    annotate_filename_fields(df_files)
+    print(f"-> [NOMBRES] Campos del nombre extraídos para {len(df_files)} archivos "
+          f"({int(df_files[FILENAME_DATE_COLUMN].notna().sum())} con fecha de cobertura).")
+
+def mark_reuploads(df_files, filename_index: FilenameIndex):
+    """Agrega a los archivos del día la marca de nombre ya recibido en un día anterior."""
+    if df_files.empty:
+        return
+    df_files[SEEN_BEFORE_COLUMN] = filename_index.seen_before(df_files)
+    print(f"-> [ÍNDICE] {int(df_files[SEEN_BEFORE_COLUMN].sum())} de {len(df_files)} archivos ya se habían recibido "
+          f"en un día anterior (índice de {len(filename_index)} nombres).")
+
+def absorb_day_statistics(operation_date_str: str, df_files, profiles, baseline_store: BaselineStore | None,
+                          sketch_store: QuantileSketchStore | None, filename_index: FilenameIndex | None = None):
+    """Incorpora los archivos del día a las líneas base, los sketches y el índice de nombres (después de usarlos)."""
+    if baseline_store is not None:
+        updated = baseline_store.absorb_day(operation_date_str, df_files, profiles.source_order)
+        print(f"-> [BASELINES] Día {operation_date_str} incorporado a las líneas base de {updated} fuentes.")
+    if sketch_store is not None:
+        absorbed = sketch_store.absorb_day(operation_date_str, df_files)
+        print(f"-> [CUANTILES] Día {operation_date_str}: {absorbed} archivos incorporados a los sketches.")
+    if filename_index is not None:
+        added = filename_index.absorb(df_files, label=operation_date_str)
+        print(f"-> [ÍNDICE] Día {operation_date_str}: {added} nombres nuevos en el índice.")
+
+def save_incidents_report(operation_date_str: str, all_incidents: list):
+    """Guarda el reporte del día en 'outputs/<fecha>_incidents_report.json'."""
     if not all_incidents:
         print("¡Excelente! No se encontraron incidencias.")
 
@@ -65,6 +195,85 @@ def main(operation_date_str: str):
         json.dump(all_incidents, f, indent=2, ensure_ascii=False)
     print(f"✓ Reporte de {len(all_incidents)} incidencias guardado en: {output_path}")
 
+def backfill(start_date_str: str, end_date_str: str, use_cache: bool = False, engine: str = 'vectorized',
+             workers: int = 1, force: bool = False, baselines: str | None = None, quantile_bands: bool = False,
+             reuploads: bool = False):
+    """
+    Re-ejecuta la detección para un rango de fechas en una sola pasada: los CVs se cargan una
+    vez, cada snapshot se lee una sola vez y los registros repetidos entre snapshots se
+    guardan una sola vez en memoria. Cada día escribe su reporte habitual, idéntico al de
+    `main(fecha)`. Por defecto usa el motor vectorizado (mismo reporte que 'per_source').
+    Con `baselines`, `quantile_bands` y/o `reuploads`, cada día se detecta con las estadísticas
+    (o el índice de nombres) de los días anteriores y luego se incorpora a ellas, como en
+    corridas diarias sucesivas.
+    """
+    CV_DATA_PATH = os.path.join(OUTPUT_DIR, "cv_data.json")
+    dates = date_range(start_date_str, end_date_str)
+    print(f"--- [BACKFILL] Detección para {len(dates)} días: {start_date_str} -> {end_date_str} ---")
+    try:
+        profiles = load_cv_profiles(CV_DATA_PATH)
+    except FileNotFoundError:
+        print(f"!! ERROR: No se encontró '{CV_DATA_PATH}'. Ejecuta el data miner primero.")
+        return
+
+    dataset = load_backfill_dataset(dates, use_cache=use_cache)
+    plan = detection_plan(use_cache)
+    baseline_store = BaselineStore().load() if baselines else None
+    if baseline_store is not None:
+        seed_baselines(baseline_store, profiles, dataset.dates[0] if dataset.dates else start_date_str,
+                       use_cache=use_cache)
+    sketch_store = QuantileSketchStore().load() if quantile_bands else None
+    if sketch_store is not None:
+        seed_quantile_sketches(sketch_store, dataset.dates[0] if dataset.dates else start_date_str,
+                               use_cache=use_cache)
+    filename_index = FilenameIndex().load() if reuploads else None
+    for operation_date_str in dataset.dates:
+        print(f"--- [BACKFILL] {operation_date_str} ---")
+        df_files = dataset.day_files(operation_date_str)
+        annotate_filenames(df_files)
+        detection_profiles = (apply_baselines(profiles, baseline_store, mode=baselines, before=operation_date_str)
+                              if baselines else profiles)
+        if sketch_store is not None:
+            detection_profiles = apply_quantile_bands(detection_profiles, sketch_store, before=operation_date_str)
+        if filename_index is not None:
+            mark_reuploads(df_files, filename_index)
+        all_incidents = run_detection_incremental(df_files, detection_profiles, operation_date_str,
+                                                  engine=engine, plan=plan, workers=workers, force=force)
+        save_incidents_report(operation_date_str, all_incidents)
+        absorb_day_statistics(operation_date_str, df_files, profiles, baseline_store, sketch_store, filename_index)
+    for store in (baseline_store, sketch_store, filename_index):
+        if store is not None:
+            store.save()
+    if engine == 'per_source':
+        plan.print_stats()
+
 if __name__ == '__main__':
-    # Esto solo se ejecuta si corres este script directamente para probarlo
-    main(operation_date_str="2025-09-08")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Detecta incidencias para una fecha de operación.")
+    parser.add_argument('--date', default="2025-09-08", help="Fecha de operación (YYYY-MM-DD).")
+    parser.add_argument('--end', help="Con --date como inicio, re-ejecuta todo el rango en una pasada (backfill).")
+    parser.add_argument('--engine', choices=['per_source', 'vectorized'],
+                        help="Motor de detección (por defecto 'per_source'; 'vectorized' en backfill).")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para la detección por fuente.")
+    parser.add_argument('--use-cache', action='store_true', help="Lee la snapshot desde la caché columnar.")
+    parser.add_argument('--force', action='store_true', help="Ignora la caché de detección y recalcula todas las fuentes.")
+    parser.add_argument('--baselines', choices=BASELINE_MODES,
+                        help="Umbrales desde líneas base observadas: 'fallback' completa el CV, 'override' lo reemplaza.")
+    parser.add_argument('--quantile-bands', action='store_true',
+                        help="Regla de volumen con la banda p01-p99 de los sketches de cuantiles por fuente.")
+    parser.add_argument('--reuploads', action='store_true',
+                        help="Marca como duplicados los nombres que la fuente ya recibió en un día anterior (índice persistente).")
+    parser.add_argument('--shard', type=ShardSpec.parse, help="Analiza solo un shard de fuentes, ej. '0/4'.")
+    parser.add_argument('--shard-dir', default=DEFAULT_SHARD_DIR, help="Carpeta compartida de reportes parciales.")
+    parser.add_argument('--merge', type=int, metavar='N_SHARDS',
+                        help="Solo arma el reporte final desde los N shards ya escritos.")
+    args = parser.parse_args()
+    if args.end:
+        backfill(args.date, args.end, use_cache=args.use_cache, engine=args.engine or 'vectorized', workers=args.workers,
+                 force=args.force, baselines=args.baselines, quantile_bands=args.quantile_bands, reuploads=args.reuploads)
+    elif args.merge:
+        output_path = os.path.join(OUTPUT_DIR, f"{args.date}_incidents_report.json")
+        merge_shard_reports(args.date, args.merge, output_path, shard_dir=args.shard_dir)
+    else:
+        main(operation_date_str=args.date, use_cache=args.use_cache, engine=args.engine or 'per_source',
+             workers=args.workers, shard=args.shard, shard_dir=args.shard_dir, force=args.force,
+             baselines=args.baselines, quantile_bands=args.quantile_bands, reuploads=args.reuploads)
@@ -0,0 +1,32 @@
+import os
+import sys
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.snapshot_cache import DEFAULT_CACHE_DIR, warm_cache, prune_cache
+
+def main(command: str, base_data_path: str = 'data', cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    Mantenimiento de la caché columnar de snapshots.
+
+    'warm' convierte a Feather las snapshots nuevas u obsoletas; 'prune' elimina las
+    entradas cuyo JSON desapareció o cambió y los archivos huérfanos.
+    """
+    if command == 'warm':
+        print(f"--- [CACHÉ] Precalentando snapshots de '{base_data_path}' en '{cache_dir}' ---")
+        warmed = warm_cache(base_data_path, cache_dir)
+        print(f"✓ {warmed} snapshots disponibles en la caché.")
+    elif command == 'prune':
+        print(f"--- [CACHÉ] Depurando '{cache_dir}' ---")
+        removed = prune_cache(cache_dir)
+        print(f"✓ Se eliminaron {removed} archivos de caché obsoletos.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precalienta o depura la caché columnar de snapshots.")
+    parser.add_argument('command', choices=['warm', 'prune'])
+    parser.add_argument('--base-data-path', default='data')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+    main(args.command, base_data_path=args.base_data_path, cache_dir=args.cache_dir)
@@ -0,0 +1,118 @@
+import os
+import sys
+import io
+import json
+import argparse
+import contextlib
+from datetime import datetime, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+from src.preparation.data_loader import load_and_filter_daily_files
+from src.preparation.cv_profiles import load_cv_profiles
+from src.detection.engine import run_detection
+from src.detection.streaming import StreamingDetector, snapshot_events, tail_jsonl, watch_directory, utc_now
+
+OUTPUT_DIR = "outputs"
+CV_DATA_PATH = os.path.join(OUTPUT_DIR, "cv_data.json")
+# Hora de la snapshot batch (data/<fecha>_20_00_UTC): referencia para medir cuánto antes se alerta
+BATCH_SNAPSHOT_HOUR = 20
+
+def print_alert(incident: dict, at: datetime):
+    print(f"-> [STREAM] {at:%Y-%m-%d %H:%M:%S} | {incident['source_id']} | {incident['incident_type']} "
+          f"({incident['total_incidentes']})")
+
+def save_report(operation_date_str: str, incidents: list):
+    output_path = os.path.join(OUTPUT_DIR, f"{operation_date_str}_incidents_report.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(incidents, f, indent=2, ensure_ascii=False)
+    print(f"✓ Día {operation_date_str} cerrado: reporte de {len(incidents)} incidencias guardado en: {output_path}")
+
+def replay(start_date: str, end_date: str, verbose: bool = False):
+    """
+    Reproduce las snapshots históricas, en orden de 'uploaded_at', a través del detector en
+    streaming. Por cada día compara el reporte del cierre con el de la detección batch y mide
+    cuántas horas antes de la snapshot de las 20:00 UTC habría salido cada alerta.
+    """
+    profiles = load_cv_profiles(CV_DATA_PATH)
+    alerts = []
+    closed = {}
+
+    def on_incident(incident: dict, at: datetime):
+        alerts.append((incident, at))
+        if verbose:
+            print_alert(incident, at)
+
+    def on_day_closed(operation_date_str: str, incidents: list):
+        closed[operation_date_str] = incidents
+
+    detector = StreamingDetector(profiles, on_incident=on_incident, on_day_closed=on_day_closed)
+
+    current = datetime.strptime(start_date, '%Y-%m-%d')
+    last = datetime.strptime(end_date, '%Y-%m-%d')
+    batch_reports = {}
+    while current <= last:
+        operation_date_str = current.strftime('%Y-%m-%d')
+        with contextlib.redirect_stdout(io.StringIO()):
+            df_files = load_and_filter_daily_files(operation_date_str)
+            batch_reports[operation_date_str] = run_detection(df_files, profiles, operation_date_str, engine='vectorized')
+        for event in snapshot_events(df_files):
+            detector.process(event)
+        current += timedelta(days=1)
+    detector.close_day()
+
+    print(f"--- [STREAMING] Replay {start_date} -> {end_date}: {detector.stats['events']} eventos, "
+          f"{detector.stats['alerts']} alertas tempranas ---")
+    all_match = True
+    for operation_date_str, expected in batch_reports.items():
+        streamed = closed.get(operation_date_str, [])
+        match = json.dumps(streamed) == json.dumps(expected)
+        all_match &= match
+        snapshot_time = datetime.strptime(operation_date_str, '%Y-%m-%d') + timedelta(hours=BATCH_SNAPSHOT_HOUR)
+        leads = sorted((snapshot_time - at).total_seconds() / 3600 for _, at in alerts
+                       if at.strftime('%Y-%m-%d') == operation_date_str)
+        lead_text = f"mediana {leads[len(leads) // 2]:.1f}h antes del batch" if leads else "sin alertas"
+        status = "✓ igual al batch" if match else "!! ERROR: difiere del batch"
+        print(f"{operation_date_str} | {len(streamed)} incidencias | {len(leads)} alertas ({lead_text}) | {status}")
+    return all_match
+
+def live(events, profiles):
+    """Consume eventos en vivo; cada día cerrado se guarda como '<fecha>_incidents_report.json'."""
+    detector = StreamingDetector(profiles, on_incident=print_alert, on_day_closed=save_report)
+    try:
+        for event in events(lambda: detector.advance_to(utc_now())):
+            detector.process(event)
+    except KeyboardInterrupt:
+        print("-> [STREAMING] Interrumpido. Cerrando el día abierto...")
+        detector.close_day()
+
+def main():
+    parser = argparse.ArgumentParser(description="Detección de incidencias en streaming sobre eventos de subida.")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--replay', nargs=2, metavar=('INICIO', 'FIN'),
+                      help="Reproduce las snapshots de INICIO a FIN (YYYY-MM-DD) y las compara con el batch.")
+    mode.add_argument('--tail', metavar='ARCHIVO_JSONL', help="Sigue un archivo JSONL de eventos (uno por línea).")
+    mode.add_argument('--watch', metavar='CARPETA', help="Vigila una carpeta donde llegan archivos de eventos.")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="Segundos entre lecturas en vivo.")
+    parser.add_argument('--verbose', action='store_true', help="En replay, imprime cada alerta temprana.")
+    args = parser.parse_args()
+
+    if args.replay:
+        if not replay(*args.replay, verbose=args.verbose):
+            sys.exit(1)
+        return
+    try:
+        profiles = load_cv_profiles(CV_DATA_PATH)
+    except FileNotFoundError:
+        print(f"!! ERROR: No se encontró '{CV_DATA_PATH}'. Ejecuta el data miner primero.")
+        return
+    if args.tail:
+        print(f"--- [STREAMING] Siguiendo '{args.tail}' ---")
+        live(lambda on_idle: tail_jsonl(args.tail, args.poll_interval, on_idle=on_idle), profiles)
+    else:
+        print(f"--- [STREAMING] Vigilando la carpeta '{args.watch}' ---")
+        live(lambda on_idle: watch_directory(args.watch, args.poll_interval, on_idle=on_idle), profiles)
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import os
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from .prompt import SYSTEM_PROMPT
+from .prompt import BATCH_SYSTEM_PROMPT, SYSTEM_PROMPT
 
 
 load_dotenv()
@@ -12,4 +12,12 @@ recommender_agent = Agent(
     model="gemini-2.5-flash",
     description="Analiza una incidencia y el contexto de su fuente para generar una recomendación accionable.",
     instruction=SYSTEM_PROMPT
-)
\ No newline at end of file
+)
+
+# Variante por fuente: recibe todas las incidencias de una fuente y responde un arreglo JSON.
+batch_recommender_agent = Agent(
+    name="batch_recommender_agent",
+    model="gemini-2.5-flash",
+    description="Analiza todas las incidencias de una fuente con su contexto y genera una recomendación por incidencia.",
+    instruction=BATCH_SYSTEM_PROMPT
+)
@@ -0,0 +1,223 @@
+# src/agents/recommender/templates.py
+
+import re
+import statistics
+
+from ...preparation.cv_profiles import WEEKDAY_INDEX, SourceProfile
+from ...preparation.filename_patterns import default_patterns
+
+# Nivel que produjo cada recomendación (queda en la incidencia como 'recommendation_tier')
+TIER_TEMPLATE = 'template'   # regla determinística de este módulo
+TIER_LLM = 'llm'             # recommender_agent (directo o desde la caché)
+
+DAY_NAMES_ES = {'Mon': 'lunes', 'Tue': 'martes', 'Wed': 'miércoles', 'Thu': 'jueves', 'Fri': 'viernes',
+                'Sat': 'sábado', 'Sun': 'domingo'}
+
+# Un día es de volumen "habitual" si su media de filas está dentro de ±20% de la mediana semanal
+VOLUME_BAND = 0.2
+# Conteo de archivos "regular": la media del día no se aleja de su mediana más de esto (o de 1 archivo)
+REGULAR_FILES_TOLERANCE = 0.25
+
+_RECEIVED = re.compile(r'Se recibieron (\d+) archivos, pero se esperaban aproximadamente (\d+)')
+_REUPLOADED = re.compile(r'\((\d+) re-subidos\)')
+_WINDOW = re.compile(r'(\d{1,2}:\d{2})(?::\d{2})?\s*[-–]\s*(\d{1,2}:\d{2})(?::\d{2})? UTC')
+_INSIGHT_LAG = re.compile(r'T\+(\d+)|(?<![>\d.])(\d+(?:\.\d+)?) days?\b')
+_ENTITY_TOKEN = re.compile(r'[A-Za-z]{4,}')
+
+
+def _insights(profile: SourceProfile, *keywords: str) -> list:
+    """Insights del CV que mencionan alguna de las palabras clave (en minúsculas)."""
+    insights = profile.raw.get('insights_for_incidences') or []
+    return [insight for insight in insights if isinstance(insight, str)
+            and any(keyword in insight.lower() for keyword in keywords)]
+
+
+def _window_label(text: str | None) -> str | None:
+    match = _WINDOW.search(text or '')
+    if match is None:
+        return None
+    start, end = match.groups()
+    return f"~{start} UTC" if start == end else f"{start}–{end} UTC"
+
+
+def insight_upload_window(profile: SourceProfile, weekday: int) -> str | None:
+    """Ventana de subida habitual: la que citan los insights (más precisa) o la del CV para el día."""
+    for insight in _insights(profile, 'upload'):
+        label = _window_label(insight)
+        if label:
+            return label
+    return _window_label(profile.upload_window[weekday])
+
+
+def insight_lag_days(profile: SourceProfile) -> float | None:
+    """Desfase habitual (días) entre la fecha del nombre y la subida, según los insights."""
+    for insight in _insights(profile, 'lag'):
+        match = _INSIGHT_LAG.search(insight)
+        if match:
+            return float(match.group(1) or match.group(2))
+    return None
+
+
+def insight_empty_entities(profile: SourceProfile, entities: list) -> list | None:
+    """
+    Nombres (de `entities`) que los insights describen como habitualmente vacíos, o None si
+    alguna entidad no aparece en ellos.
+    """
+    empty_insights = " ".join(_insights(profile, 'empty')).lower()
+    known = []
+    for entity in entities:
+        names = [token for token in _ENTITY_TOKEN.findall(entity) if token.lower() in empty_insights]
+        if not names:
+            return None
+        known.append(names[-1])
+    return known
+
+
+def _filename_entity(source_id: str, filename: str) -> str | None:
+    # Solo la entidad: el template se prueba sin parsear la fecha (que es lo caro de `parse`)
+    for template in default_patterns().templates_for(source_id):
+        fields = template.match(filename)
+        if fields is not None:
+            return fields.get('entity') or None
+    return None
+
+
+def _median_files(profile: SourceProfile, weekday: int):
+    for entry in profile.raw.get('file_processing_daily_stats') or []:
+        if isinstance(entry, dict) and WEEKDAY_INDEX.get(entry.get('day')) == weekday:
+            return entry.get('median_files')
+    return None
+
+
+def _volume_phrase(profile: SourceProfile, weekday: int) -> str:
+    weekly = [value for value in profile.rows_mean if value]
+    day_rows = profile.rows_mean[weekday]
+    if not weekly or not day_rows:
+        return "un día sin volumen de referencia en el CV"
+    ratio = day_rows / statistics.median(weekly)
+    if ratio >= 1 + VOLUME_BAND:
+        return "un día de alto volumen"
+    if ratio <= 1 - VOLUME_BAND:
+        return "un día de bajo volumen"
+    return "un día de volumen habitual"
+
+
+def _plural(count: int, singular: str, plural: str) -> str:
+    return singular if count == 1 else plural
+
+
+def _expected_files(profile: SourceProfile, weekday: int) -> int:
+    mean_files = profile.mean_files[weekday]
+    return max(round(mean_files), 1) if mean_files is not None else 1
+
+
+def missing_files_rule(incident: dict, profile: SourceProfile, weekday: int) -> str | None:
+    """
+    Faltan archivos en una fuente de conteo diario regular. Las cifras son las de la incidencia;
+    si el conteo del día en el CV es irregular (media lejos de la mediana), escala.
+    """
+    mean_files, median_files = profile.mean_files[weekday], _median_files(profile, weekday)
+    match = _RECEIVED.search(incident.get('incident_details') or '')
+    if mean_files is None or median_files is None or match is None:
+        return None
+    if abs(mean_files - median_files) > max(1, REGULAR_FILES_TOLERANCE * mean_files):
+        return None
+    received, expected = int(match.group(1)), int(match.group(2))
+    missing = expected - received
+    if not 0 < missing <= expected:
+        return None
+    day_name = DAY_NAMES_ES[list(WEEKDAY_INDEX)[weekday]]
+    if received == 0:
+        expected_files = _plural(expected, 'del archivo esperado', f'de los {expected} archivos esperados')
+        problem = f"la ausencia total {expected_files} para el {day_name}"
+    else:
+        problem = (f"por qué {_plural(missing, 'falta 1 archivo', f'faltan {missing} archivos')} de los {expected} "
+                   f"esperados para el {day_name}")
+    window = insight_upload_window(profile, weekday)
+    window_hint = f" (ventana habitual: {window})" if window else ""
+    return (f"Contactar al proveedor de la fuente {profile.source_id} para investigar {problem}, "
+            f"{_volume_phrase(profile, weekday)}. Verificar si hay retrasos conocidos en la entrega{window_hint}.")
+
+
+def duplicated_or_failed_rule(incident: dict, profile: SourceProfile, weekday: int) -> str | None:
+    """Duplicados o fallidos hasta el volumen normal de un día; más que eso escala."""
+    count = incident.get('total_incidentes') or 0
+    if not 0 < count <= _expected_files(profile, weekday):
+        return None
+    match = _REUPLOADED.search(incident.get('incident_details') or '')
+    reuploaded = f" ({match.group(1)} ya se habían recibido en un día anterior)" if match else ""
+    return (f"Revisar {_plural(count, 'el archivo duplicado o', f'los {count} archivos duplicados o')} con estado "
+            f"'stopped' de la fuente {profile.source_id} y confirmar con el proveedor si son re-envíos{reuploaded}; "
+            f"reprocesar solo los que hayan fallado.")
+
+
+def old_file_rule(incident: dict, profile: SourceProfile, weekday: int) -> str | None:
+    """Archivos antiguos hasta el volumen normal de un día; una recarga mayor escala."""
+    count = incident.get('total_incidentes') or 0
+    if not 0 < count <= _expected_files(profile, weekday):
+        return None
+    lag = insight_lag_days(profile)
+    lag_hint = (f" (el desfase habitual entre la fecha del nombre y la subida es de {lag:g} "
+                f"{_plural(lag, 'día', 'días')})" if lag else "")
+    return (f"Confirmar con el proveedor de la fuente {profile.source_id} si "
+            f"{_plural(count, 'el archivo', f'los {count} archivos')} con fecha de hace más de 3 días "
+            f"{_plural(count, 'es una recarga histórica intencional', 'son una recarga histórica intencional')}"
+            f"{lag_hint}; si no, pedir la corrección y evitar {_plural(count, 'procesarlo', 'procesarlos')} "
+            f"en duplicado.")
+
+
+def late_upload_rule(incident: dict, profile: SourceProfile, weekday: int) -> str | None:
+    """Archivos fuera de horario hasta el volumen normal de un día y con ventana conocida."""
+    count = incident.get('total_incidentes') or 0
+    window = insight_upload_window(profile, weekday)
+    if window is None or not 0 < count <= _expected_files(profile, weekday):
+        return None
+    return (f"Confirmar con el proveedor de la fuente {profile.source_id} el motivo del retraso de "
+            f"{_plural(count, 'el archivo recibido', f'los {count} archivos recibidos')} fuera de la ventana "
+            f"habitual ({window}) y verificar que la carga del día esté completa.")
+
+
+def empty_files_rule(incident: dict, profile: SourceProfile, weekday: int) -> str | None:
+    """Archivos vacíos de entidades que el CV registra como habitualmente vacías; cualquier otra escala."""
+    entities = [_filename_entity(profile.source_id, filename) for filename in incident.get('files_to_review') or []]
+    if not entities or any(entity is None for entity in entities):
+        return None
+    known = insight_empty_entities(profile, entities)
+    if not known:
+        return None
+    names = ", ".join(f"`{name}`" for name in dict.fromkeys(known))
+    count = len(entities)
+    return (f"Sin acción urgente: {_plural(count, 'el archivo vacío es', f'los {count} archivos vacíos son')} de "
+            f"entidades que el CV registra como habitualmente vacías ({names}). Escalar al proveedor solo si "
+            f"aparecen vacíos de otras entidades o el patrón persiste.")
+
+
+# Reglas por tipo de incidencia; un tipo sin regla (p. ej. variación de volumen) siempre va al agente
+TEMPLATE_RULES = {
+    'Archivos Faltantes': missing_files_rule,
+    'Archivo Duplicado o Fallido': duplicated_or_failed_rule,
+    'Advertencia: Carga de Archivo Antiguo': old_file_rule,
+    'Advertencia: Archivo Cargado Fuera de Horario': late_upload_rule,
+    'Archivo Vacío Inesperado': empty_files_rule,
+}
+
+
+def template_recommendation(incident: dict, profile: SourceProfile | None, day: str | None) -> str | None:
+    """
+    Recomendación determinística para un patrón conocido de incidencia, armada con el CV de la
+    fuente (estadísticas del día e `insights_for_incidences`).
+
+    Args:
+        incident (dict): La incidencia tal como sale del reporte.
+        profile (SourceProfile): CV compilado de la fuente (None si no hay CV).
+        day (str): Día de la operación ('Mon', ...).
+
+    Returns:
+        str | None: La recomendación, o None si ninguna regla cubre la incidencia o sus
+                    magnitudes salen de los rangos del CV (la incidencia va al agente).
+    """
+    rule = TEMPLATE_RULES.get(incident.get('incident_type'))
+    weekday = WEEKDAY_INDEX.get(day)
+    if rule is None or profile is None or weekday is None:
+        return None
+    return rule(incident, profile, weekday)
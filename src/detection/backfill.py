@@ -0,0 +1,110 @@
+# src/detection/backfill.py
+
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from ..preparation.snapshot_cache import DEFAULT_CACHE_DIR
+from ..preparation.data_loader import load_and_filter_daily_files
+from ..preparation.historical_store import record_hashes
+from ..preparation.schema import concat_file_records
+
+
+def date_range(start_date_str: str, end_date_str: str) -> list:
+    """Fechas 'YYYY-MM-DD' de `start` a `end`, ambos inclusive."""
+    current = datetime.strptime(start_date_str, '%Y-%m-%d')
+    last = datetime.strptime(end_date_str, '%Y-%m-%d')
+    dates = []
+    while current <= last:
+        dates.append(current.strftime('%Y-%m-%d'))
+        current += timedelta(days=1)
+    return dates
+
+
+class BackfillDataset:
+    """
+    Registros únicos de varias snapshots diarias, compartidos en memoria.
+
+    Las snapshots consecutivas se solapan casi por completo (cada una trae meses de
+    historia), así que cada registro idéntico se guarda una sola vez. `counts[i, k]` dice
+    cuántas veces aparece el registro único `i` en la snapshot de `dates[k]`: el día de
+    operación `k` son los registros presentes en su snapshot y subidos ese día, es decir,
+    exactamente lo que `load_and_filter_daily_files` leería de esa snapshot (una subida
+    posterior a las 20:00 o una versión corregida en una snapshot posterior no se cuelan).
+    """
+
+    def __init__(self, records: pd.DataFrame, counts: np.ndarray, dates: list):
+        self.records = records
+        self.counts = counts
+        self.dates = dates
+        self.date_index = {date_str: index for index, date_str in enumerate(dates)}
+        if len(records):
+            self.upload_day = records['uploaded_at'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        else:
+            self.upload_day = np.array([], dtype='datetime64[D]')
+
+    def __contains__(self, operation_date_str: str) -> bool:
+        return operation_date_str in self.date_index
+
+    def day_files(self, operation_date_str: str) -> pd.DataFrame:
+        """Archivos del día de operación, en el orden de su snapshot."""
+        counts = self.counts[:, self.date_index[operation_date_str]]
+        mask = (counts > 0) & (self.upload_day == np.datetime64(operation_date_str, 'D'))
+        positions = np.repeat(np.flatnonzero(mask), counts[mask])
+        df = self.records.iloc[positions].reset_index(drop=True)
+        for column in df.select_dtypes('category').columns:
+            df[column] = df[column].cat.remove_unused_categories()
+        return df
+
+
+def load_backfill_dataset(dates: list, base_data_path: str = 'data', use_cache: bool = False,
+                          cache_dir: str = DEFAULT_CACHE_DIR) -> BackfillDataset:
+    """
+    Carga una sola vez la snapshot de cada fecha y deduplica los registros entre snapshots.
+
+    De cada snapshot solo se conservan (filtrando durante el parseo) los registros subidos
+    dentro del rango del backfill: la historia de meses que trae cada snapshot no se
+    materializa.
+
+    Args:
+        dates (list): Fechas de operación 'YYYY-MM-DD', en orden.
+        base_data_path (str): La ruta a la carpeta principal de datos.
+        use_cache (bool): Si es True, las snapshots se leen desde la caché columnar.
+        cache_dir (str): Carpeta de la caché columnar.
+
+    Returns:
+        BackfillDataset: Registros únicos y su presencia por snapshot. Las fechas sin
+                         snapshot quedan fuera de `dates` del resultado.
+    """
+    if not dates:
+        return BackfillDataset(pd.DataFrame(), np.zeros((0, 0), dtype=np.uint16), [])
+    next_day = datetime.strptime(dates[-1], '%Y-%m-%d') + timedelta(days=1)
+    upload_range = (dates[0], next_day.strftime('%Y-%m-%d'))
+
+    frames = []
+    loaded_dates = []
+    for date_str in dates:
+        file_path = os.path.join(base_data_path, f"{date_str}_20_00_UTC", 'files.json')
+        if not os.path.exists(file_path):
+            print(f"!! ADVERTENCIA: No existe la snapshot {file_path}. Se omite el día {date_str}.")
+            continue
+        frames.append(load_and_filter_daily_files(date_str, base_data_path=base_data_path, upload_range=upload_range,
+                                                  use_cache=use_cache, cache_dir=cache_dir))
+        loaded_dates.append(date_str)
+
+    sizes = [len(df) for df in frames]
+    df_all = concat_file_records([df for df in frames if len(df)])
+    if df_all.empty:
+        return BackfillDataset(pd.DataFrame(), np.zeros((0, len(loaded_dates)), dtype=np.uint16), loaded_dates)
+    snapshot_index = np.repeat(np.arange(len(frames)), sizes)
+    # Las snapshots se cargan en orden de fecha: la primera aparición de un registro del día D
+    # está en la snapshot D, así que los registros únicos conservan el orden de esa snapshot
+    codes, uniques = pd.factorize(record_hashes(df_all))
+    counts = np.zeros((len(uniques), len(frames)), dtype=np.uint16)
+    np.add.at(counts, (codes, snapshot_index), 1)
+    first_rows = np.unique(codes, return_index=True)[1]
+
+    records = df_all.iloc[first_rows].reset_index(drop=True)
+    print(f"✓ Backfill: {len(df_all)} registros de {len(frames)} snapshots -> {len(records)} registros únicos en memoria.")
+    return BackfillDataset(records, counts, loaded_dates)
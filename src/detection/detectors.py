@@ -1,13 +1,42 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import re
+from datetime import datetime
+
+from ..preparation.cv_profiles import SourceProfile, compile_source_profile
+from ..preparation.filename_index import SEEN_BEFORE_COLUMN
+from ..preparation.filename_patterns import FILENAME_DATE_COLUMN, filename_fields
+
+
+def _as_profile(source_profile) -> SourceProfile | None:
+    """Acepta un SourceProfile compilado o, por compatibilidad, el dict crudo del CV."""
+    if not source_profile:
+        return None
+    if isinstance(source_profile, SourceProfile):
+        return source_profile
+    return compile_source_profile(source_profile)
+
+def duplicated_or_failed_mask(df_files: pd.DataFrame) -> np.ndarray:
+    """
+    Archivos duplicados o fallidos: 'is_duplicated', estado 'stopped' o, si el día trae la
+    marca del índice de nombres, ya recibidos por la fuente en un día anterior.
+    """
+    incident_mask = (df_files['is_duplicated'] == True) | (df_files['status'].str.lower() == 'stopped')
+    incident_mask = incident_mask.to_numpy(dtype=bool, na_value=False)
+    if SEEN_BEFORE_COLUMN in df_files.columns:
+        incident_mask = incident_mask | df_files[SEEN_BEFORE_COLUMN].to_numpy(dtype=bool)
+    return incident_mask
+
+def duplicated_or_failed_details(count: int, reuploaded: int) -> str:
+    if not reuploaded:
+        return f"Se encontraron {count} archivos marcados como duplicados o con estado 'stopped'."
+    return (f"Se encontraron {count} archivos marcados como duplicados, con estado 'stopped' o ya recibidos "
+            f"en un día anterior ({reuploaded} re-subidos).")
 
 def detect_duplicated_and_failed_files(df_source_files: pd.DataFrame, verbose: bool = True) -> list:
     """Detects duplicated or failed files."""
     if df_source_files is None or df_source_files.empty:
         return []
-    incident_mask = (df_source_files['is_duplicated'] == True) | (df_source_files['status'].str.lower() == 'stopped')
-    df_incidents = df_source_files[incident_mask]
+    df_incidents = df_source_files[duplicated_or_failed_mask(df_source_files)]
     if verbose and df_incidents.empty:
         print("     -> [LOG] No se encontraron archivos marcados como 'is_duplicated' o con estado 'stopped'.")
         return []
@@ -15,14 +44,16 @@ def detect_duplicated_and_failed_files(df_source_files: pd.DataFrame, verbose: b
         incident_object = {
             "source_id": str(df_incidents.iloc[0]['source_id']),
             "incident_type": "Archivo Duplicado o Fallido",
-            "incident_details": f"Se encontraron {len(df_incidents)} archivos marcados como duplicados o con estado 'stopped'.",
+            "incident_details": duplicated_or_failed_details(
+                len(df_incidents),
+                int(df_incidents[SEEN_BEFORE_COLUMN].sum()) if SEEN_BEFORE_COLUMN in df_incidents.columns else 0),
             "total_incidentes": len(df_incidents),
             "files_to_review": df_incidents['filename'].tolist()
         }
         return [incident_object]
     return []
 
-def detect_unexpected_empty_files(df_source_files: pd.DataFrame, source_cv_info: dict, operation_date_str: str, verbose: bool = True) -> list:
+def detect_unexpected_empty_files(df_source_files: pd.DataFrame, source_profile: SourceProfile, operation_date_str: str, verbose: bool = True) -> list:
     """Detects unexpected empty files based on day-of-week patterns."""
     if df_source_files is None or df_source_files.empty:
         if verbose: print("     -> [LOG] No se recibieron archivos para esta fuente hoy, no se puede verificar por archivos vacíos.")
@@ -31,7 +62,8 @@ def detect_unexpected_empty_files(df_source_files: pd.DataFrame, source_cv_info:
     if df_empty_files.empty:
         if verbose: print("     -> [LOG] No se encontraron archivos con 0 filas para esta fuente hoy.")
         return []
-    if not source_cv_info:
+    source_profile = _as_profile(source_profile)
+    if not source_profile:
         if verbose: print("     -> [LOG] No hay datos de CV para esta fuente. Marcando archivos vacíos como incidencia por precaución.")
         incident_object = {
             "source_id": str(df_empty_files.iloc[0]['source_id']), "incident_type": "Archivo Vacío Inesperado",
@@ -44,18 +76,15 @@ def detect_unexpected_empty_files(df_source_files: pd.DataFrame, source_cv_info:
     details = ""
     operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d')
     day_abbr = operation_date.strftime('%a')
-    day_stats_list = source_cv_info.get("day_of_week_row_stats", [])
-    day_stats = next((d for d in day_stats_list if d.get('day') == day_abbr), None)
-    if day_stats and day_stats.get('empty_files_mean') is not None:
-        mean_empty = day_stats['empty_files_mean']
+    mean_empty = source_profile.empty_files_mean[operation_date.weekday()]
+    if mean_empty is not None:
         if today_empty_count > round(mean_empty) + 1:
             is_incident = True
             details = f"Se recibieron {today_empty_count} archivos vacíos, superando la media histórica de ~{mean_empty:.2f} para los {day_abbr}."
         elif verbose: print(f"     -> [LOG] Se encontraron {today_empty_count} archivos vacíos, lo cual es consistente con la media de {mean_empty:.2f} para los {day_abbr}.")
     else:
         if verbose: print("     -> [LOG] No se encontró 'empty_files_mean' para el día. Usando lógica de fallback (median_rows).")
-        general_stats = source_cv_info.get("general_volume_stats", {})
-        median_rows = general_stats.get("median_rows")
+        median_rows = source_profile.median_rows
         if median_rows is not None and median_rows > 50:
             is_incident = True
             details = f"Se recibieron {today_empty_count} archivos vacíos. La mediana de filas para esta fuente es {median_rows}, por lo que no se esperan archivos vacíos."
@@ -71,19 +100,18 @@ def detect_unexpected_empty_files(df_source_files: pd.DataFrame, source_cv_info:
         return [incident_object]
     return []
 
-def detect_missing_files(df_source_files: pd.DataFrame, source_cv_info: dict, operation_date_str: str, verbose: bool = True) -> list:
+def detect_missing_files(df_source_files: pd.DataFrame, source_profile: SourceProfile, operation_date_str: str, verbose: bool = True) -> list:
     """Detects if a source sent fewer files than expected."""
-    if not source_cv_info:
+    source_profile = _as_profile(source_profile)
+    if not source_profile:
         if verbose: print("     -> [LOG] No hay datos de CV. No se puede verificar si faltan archivos.")
         return []
     operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d')
     day_abbr = operation_date.strftime('%a')
-    file_stats_list = source_cv_info.get("file_processing_daily_stats", [])
-    day_stats = next((d for d in file_stats_list if d.get('day') == day_abbr), None)
-    if not day_stats or day_stats.get('mean_files') is None:
+    expected_files_mean = source_profile.mean_files[operation_date.weekday()]
+    if expected_files_mean is None:
         if verbose: print(f"     -> [LOG] No se encontró 'mean_files' en el CV para los {day_abbr}. No se puede verificar si faltan archivos.")
         return []
-    expected_files_mean = day_stats['mean_files']
     expected_files_count = round(expected_files_mean)
     received_files_count = len(df_source_files) if df_source_files is not None else 0
     is_incident = received_files_count < expected_files_count
@@ -91,7 +119,7 @@ def detect_missing_files(df_source_files: pd.DataFrame, source_cv_info: dict, op
         details = (f"Se recibieron {received_files_count} archivos, pero se esperaban aproximadamente {expected_files_count} "
                    f"(la media histórica para los {day_abbr} es {expected_files_mean:.2f}).")
         incident_object = {
-            "source_id": str(source_cv_info.get('source_id')), "incident_type": "Archivos Faltantes", "incident_details": details,
+            "source_id": source_profile.source_id, "incident_type": "Archivos Faltantes", "incident_details": details,
             "total_incidentes": expected_files_count - received_files_count,
             "files_to_review": df_source_files['filename'].tolist() if df_source_files is not None else []
         }
@@ -99,50 +127,60 @@ def detect_missing_files(df_source_files: pd.DataFrame, source_cv_info: dict, op
     if verbose: print(f"     -> [LOG] Se recibieron {received_files_count} de ~{expected_files_count} archivos esperados, lo cual es aceptable.")
     return []
 
-def detect_unexpected_volume_variation(df_source_files: pd.DataFrame, source_cv_info: dict, operation_date_str: str, verbose: bool = True) -> list:
+def detect_unexpected_volume_variation(df_source_files: pd.DataFrame, source_profile: SourceProfile, operation_date_str: str, verbose: bool = True) -> list:
     """Detects files with anomalous row counts compared to the daily average."""
     if df_source_files is None or df_source_files.empty: return []
-    if not source_cv_info:
+    source_profile = _as_profile(source_profile)
+    if not source_profile:
         if verbose: print("     -> [LOG] No hay datos de CV. No se puede verificar la variación de volumen.")
         return []
     
     operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d')
     day_abbr = operation_date.strftime('%a')
+
+    # Con banda de percentiles (sketches de cuantiles) se usa en lugar de media ± 2·stdev
+    band = source_profile.rows_band(operation_date.weekday())
+    if band is not None:
+        low, high = band
+        rows = pd.to_numeric(df_source_files['rows'], errors='coerce')
+        df_anomalous = df_source_files[((rows < low) | (rows > high)).to_numpy(dtype=bool, na_value=False)]
+        if df_anomalous.empty:
+            if verbose: print(f"     -> [LOG] Todos los archivos están dentro de la banda de filas esperada para los {day_abbr} ({low:.0f}–{high:.0f}).")
+            return []
+        details = (f"Se encontraron {len(df_anomalous)} archivos con un número de filas fuera de la banda de "
+                   f"percentiles histórica para los {day_abbr} ({low:.0f}–{high:.0f} filas).")
+        incident_object = {
+            "source_id": source_profile.source_id, "incident_type": "Variación de Volumen Inesperada",
+            "incident_details": details, "total_incidentes": len(df_anomalous),
+            "files_to_review": df_anomalous['filename'].tolist()
+        }
+        return [incident_object]
     
-    day_stats_list = source_cv_info.get("day_of_week_row_stats", [])
-    day_stats = next((d for d in day_stats_list if d.get('day') == day_abbr), None)
-    general_stats = source_cv_info.get("general_volume_stats", {})
-    stdev_rows = general_stats.get("stdev_rows")
+    rows_mean = source_profile.rows_mean[operation_date.weekday()]
+    stdev_rows = source_profile.stdev_rows
 
-    if not day_stats or day_stats.get('rows_mean') is None or stdev_rows is None:
+    if rows_mean is None or stdev_rows is None:
         if verbose: print(f"     -> [LOG] No se encontraron 'rows_mean' o 'stdev_rows' en el CV. No se puede verificar variación de volumen.")
         return []
-
-    rows_mean = day_stats['rows_mean']
     
     # Solo aplicamos la lógica si el volumen promedio es significativo
     if rows_mean < 100:
         if verbose: print(f"     -> [LOG] La media de filas para los {day_abbr} es muy baja ({rows_mean:.2f}). Se omite la detección de variación de volumen.")
         return []
 
-    anomalous_files = []
-    for index, row in df_source_files.iterrows():
-        file_rows = row['rows']
-        deviation = abs(file_rows - rows_mean)
-        # Regla: anómalo si se desvía en más de 2 desviaciones estándar
-        is_anomalous = deviation > (2 * stdev_rows)
-        
-        if is_anomalous:
-            anomalous_files.append(row)
-        elif verbose:
-            print(f"     -> [LOG] Archivo '{row['filename']}' ({file_rows} filas) está dentro del rango esperado (media: {rows_mean:.0f}, stdev: {stdev_rows:.0f}).")
-            
-    if anomalous_files:
-        df_anomalous = pd.DataFrame(anomalous_files)
+    # Regla: anómalo si se desvía en más de 2 desviaciones estándar (una máscara sobre la columna)
+    rows = pd.to_numeric(df_source_files['rows'], errors='coerce')
+    anomalous = ((rows - rows_mean).abs() > 2 * stdev_rows).to_numpy(dtype=bool, na_value=False)
+    if verbose:
+        for filename, file_rows in zip(df_source_files['filename'][~anomalous], df_source_files['rows'][~anomalous]):
+            print(f"     -> [LOG] Archivo '{filename}' ({file_rows} filas) está dentro del rango esperado (media: {rows_mean:.0f}, stdev: {stdev_rows:.0f}).")
+
+    df_anomalous = df_source_files[anomalous]
+    if not df_anomalous.empty:
         details = (f"Se encontraron {len(df_anomalous)} archivos con un número de filas anómalo. "
                    f"La media esperada para los {day_abbr} es ~{rows_mean:.0f} (stdev: {stdev_rows:.0f}).")
         incident_object = {
-            "source_id": str(source_cv_info.get('source_id')), "incident_type": "Variación de Volumen Inesperada",
+            "source_id": source_profile.source_id, "incident_type": "Variación de Volumen Inesperada",
             "incident_details": details, "total_incidentes": len(df_anomalous),
             "files_to_review": df_anomalous['filename'].tolist()
         }
@@ -150,44 +188,34 @@ def detect_unexpected_volume_variation(df_source_files: pd.DataFrame, source_cv_
     
     return []
 
-def detect_file_upload_after_schedule(df_source_files: pd.DataFrame, source_cv_info: dict, operation_date_str: str, verbose: bool = True) -> list:
+def detect_file_upload_after_schedule(df_source_files: pd.DataFrame, source_profile: SourceProfile, operation_date_str: str, verbose: bool = True) -> list:
     """Detects files uploaded significantly after the expected time window."""
     if df_source_files is None or df_source_files.empty: return []
-    if not source_cv_info: return []
+    source_profile = _as_profile(source_profile)
+    if not source_profile: return []
     
     operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d').date()
     day_abbr = operation_date.strftime('%a')
+    weekday = operation_date.weekday()
     
-    schedule_stats_list = source_cv_info.get("upload_schedule_daily_stats", [])
-    day_schedule = next((d for d in schedule_stats_list if d.get('day') == day_abbr), None)
-    
-    if not day_schedule or not day_schedule.get('upload_window_expected_utc'):
+    if source_profile.upload_window[weekday] is None:
         if verbose: print(f"     -> [LOG] No se encontró ventana de subida en el CV para los {day_abbr}.")
         return []
-        
-    try:
-        # Extraer la hora de fin de la ventana, ej: "11:00:00–11:30:00 UTC" -> "11:30:00"
-        time_window_str = day_schedule['upload_window_expected_utc']
-        end_time_str = time_window_str.split('–')[1].replace(' UTC', '')
-        expected_time = datetime.strptime(end_time_str, '%H:%M:%S').time()
-        deadline = datetime.combine(operation_date, expected_time) + timedelta(hours=4)
-    except (IndexError, ValueError):
-        if verbose: print(f"     -> [LOG] Formato de ventana de subida ('{time_window_str}') no reconocido.")
+
+    # La ventana llega pre-parseada en el perfil; el deadline es su cierre + 4h
+    deadline = source_profile.deadline(weekday, operation_date)
+    if deadline is None:
+        if verbose: print(f"     -> [LOG] Formato de ventana de subida ('{source_profile.upload_window[weekday]}') no reconocido.")
         return []
 
-    late_files = []
-    # Asegurarse de que uploaded_at es timezone-aware para la comparación
-    df_source_files['uploaded_at'] = pd.to_datetime(df_source_files['uploaded_at']).dt.tz_localize(None)
+    # Se compara en UTC sin zona horaria, sin modificar el DataFrame recibido (puede ser un slice compartido)
+    uploaded_at = pd.to_datetime(df_source_files['uploaded_at']).dt.tz_localize(None)
+    df_late = df_source_files[uploaded_at > deadline]
 
-    for index, row in df_source_files.iterrows():
-        if row['uploaded_at'] > deadline:
-            late_files.append(row)
-        
-    if late_files:
-        df_late = pd.DataFrame(late_files)
-        details = f"Se recibieron {len(df_late)} archivos más de 4 horas después del cierre de la ventana esperada (~{expected_time.strftime('%H:%M')} UTC)."
+    if not df_late.empty:
+        details = f"Se recibieron {len(df_late)} archivos más de 4 horas después del cierre de la ventana esperada (~{source_profile.window_end_label(weekday)} UTC)."
         incident_object = {
-            "source_id": str(source_cv_info.get('source_id')), "incident_type": "Advertencia: Archivo Cargado Fuera de Horario",
+            "source_id": source_profile.source_id, "incident_type": "Advertencia: Archivo Cargado Fuera de Horario",
             "incident_details": details, "total_incidentes": len(df_late),
             "files_to_review": df_late['filename'].tolist()
         }
@@ -200,23 +228,11 @@ def detect_upload_of_previous_file(df_source_files: pd.DataFrame, operation_date
     """Detects files whose coverage date (from filename) is older than a few days."""
     if df_source_files is None or df_source_files.empty: return []
 
-    old_files = []
     operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d').date()
-    
-    for index, row in df_source_files.iterrows():
-        # Buscar una fecha en formato YYYYMMDD en el nombre del archivo
-        match = re.search(r'(\d{8})', row['filename'])
-        if match:
-            try:
-                coverage_date = datetime.strptime(match.group(1), '%Y%m%d').date()
-                # Regla: Incidencia si la fecha es de hace más de 3 días
-                if (operation_date - coverage_date).days > 3:
-                    old_files.append(row)
-            except ValueError:
-                continue # No es una fecha válida, lo ignoramos
-
-    if old_files:
-        df_old = pd.DataFrame(old_files)
+    # Regla: Incidencia si la fecha del nombre (según el template de la fuente) es de hace más de 3 días
+    df_old = df_source_files[coverage_age_days(df_source_files, operation_date) > 3]
+
+    if not df_old.empty:
         details = f"Se encontraron {len(df_old)} archivos cuya fecha en el nombre es de hace más de 3 días, indicando una posible carga histórica."
         incident_object = {
             "source_id": str(df_old.iloc[0]['source_id']), "incident_type": "Advertencia: Carga de Archivo Antiguo",
@@ -226,4 +242,45 @@ def detect_upload_of_previous_file(df_source_files: pd.DataFrame, operation_date
         return [incident_object]
         
     if verbose: print("     -> [LOG] Todos los archivos tienen fechas de cobertura recientes en sus nombres.")
-    return []
\ No newline at end of file
+    return []
+
+def coverage_age_days(df_files: pd.DataFrame, operation_date) -> np.ndarray:
+    """
+    Días entre la operación y la fecha de cobertura del nombre de cada archivo (NaN si no hay
+    o no es válida). Reutiliza la columna 'filename_date' si el día ya viene anotado.
+    """
+    coverage = filename_fields(df_files)[FILENAME_DATE_COLUMN]
+    return (pd.Timestamp(operation_date) - coverage).dt.days.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def detect_duplicated_and_failed_files_batch(df_files: pd.DataFrame) -> dict:
+    """
+    Versión por lotes de `detect_duplicated_and_failed_files`: aplica la máscara una vez sobre
+    los archivos del día completo y solo arma incidencias para las fuentes con coincidencias.
+
+    Returns:
+        dict: {source_id: [incidencia]} (mismo objeto que la versión por fuente).
+    """
+    if df_files is None or df_files.empty:
+        return {}
+    df_incidents = df_files[duplicated_or_failed_mask(df_files)]
+    return {
+        str(source_id): detect_duplicated_and_failed_files(df_group, verbose=False)
+        for source_id, df_group in df_incidents.groupby('source_id', observed=True, sort=False)
+    }
+
+def detect_upload_of_previous_file_batch(df_files: pd.DataFrame, operation_date_str: str) -> dict:
+    """
+    Versión por lotes de `detect_upload_of_previous_file`: toma la fecha del nombre de todos
+    los archivos del día de una vez y solo revisa las fuentes con archivos antiguos.
+
+    Returns:
+        dict: {source_id: [incidencia]} (mismo objeto que la versión por fuente).
+    """
+    if df_files is None or df_files.empty:
+        return {}
+    operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d').date()
+    old_mask = coverage_age_days(df_files, operation_date) > 3
+    return {
+        str(source_id): detect_upload_of_previous_file(df_group, operation_date_str, verbose=False)
+        for source_id, df_group in df_files[old_mask].groupby('source_id', observed=True, sort=False)
+    }
@@ -0,0 +1,58 @@
+# src/detection/engine.py
+
+import pandas as pd
+
+from ..preparation.cv_profiles import CVProfileStore
+
+from .parallel import run_detectors_parallel
+from .partition import SourcePartitionedFrame
+from .registry import CallPlan, registered_detectors
+from .vectorized import run_vectorized_detection
+
+ENGINES = ('per_source', 'vectorized')
+
+
+def run_detectors_per_source(df_files: pd.DataFrame, profiles: CVProfileStore, operation_date_str: str,
+                             verbose: bool = False, plan: CallPlan | None = None) -> list:
+    """
+    Motor original: ejecuta los detectores registrados fuente por fuente, en el orden de
+    'cv_data.json'. Los detectores que pueden correr por lotes se ejecutan una sola vez
+    sobre el día completo y su resultado se reparte por fuente.
+
+    Args:
+        df_files (pd.DataFrame): Archivos del día de operación (todas las fuentes).
+        profiles (CVProfileStore): CVs compilados (ver `load_cv_profiles`).
+        operation_date_str (str): Fecha de operación en formato 'YYYY-MM-DD'.
+        verbose (bool): Si es True, los detectores imprimen sus logs.
+        plan (CallPlan): Plan a usar (y donde quedan las métricas); por defecto, todos los registrados.
+
+    Returns:
+        list: Incidencias en el formato del reporte.
+    """
+    plan = plan or CallPlan(registered_detectors())
+    plan.run_batched(df_files, operation_date_str)
+
+    all_incidents = []
+    # Particionamos una sola vez; cada fuente recibe un slice por offsets y su perfil por índice
+    files_by_source = SourcePartitionedFrame(df_files)
+
+    for source_id in profiles.source_order:
+        print(f"--- Analizando Fuente: {source_id} ---")
+        all_incidents.extend(plan.run_source(source_id, files_by_source.get(source_id), profiles.get(source_id),
+                                             operation_date_str, verbose=verbose))
+    return all_incidents
+
+
+def run_detection(df_files: pd.DataFrame, profiles: CVProfileStore, operation_date_str: str,
+                  engine: str = 'per_source', plan: CallPlan | None = None, workers: int = 1) -> list:
+    """
+    Ejecuta la detección con el motor indicado ('per_source' o 'vectorized'). El plan
+    (y sus métricas por detector) y `workers` > 1 solo aplican al motor por fuente.
+    """
+    if engine == 'per_source':
+        if workers > 1:
+            return run_detectors_parallel(df_files, profiles, operation_date_str, workers, plan=plan)
+        return run_detectors_per_source(df_files, profiles, operation_date_str, plan=plan)
+    if engine == 'vectorized':
+        return run_vectorized_detection(df_files, profiles, operation_date_str)
+    raise ValueError(f"Motor de detección no soportado: '{engine}'. Usa uno de {ENGINES}.")
@@ -0,0 +1,217 @@
+# src/detection/incremental.py
+
+import os
+import sys
+import json
+import time
+import hashlib
+import inspect
+import pandas as pd
+
+from ..preparation.cv_profiles import CVProfileStore
+from ..preparation.json_stream import FILE_RECORD_COLUMNS
+from ..preparation.filename_index import SEEN_BEFORE_COLUMN
+from ..preparation.filename_patterns import default_patterns
+from .engine import run_detection
+from .partition import SourcePartitionedFrame
+from .registry import CallPlan, registered_detectors
+
+# Carpeta por defecto de la caché de detección (un archivo por fecha de operación)
+DEFAULT_DETECTION_CACHE_DIR = os.path.join('outputs', 'cache', 'detection')
+
+# Versión del formato en disco; cambiarla invalida todas las entradas existentes
+DETECTION_CACHE_FORMAT_VERSION = 1
+
+# Lock de escritura de la caché: espera máxima, intervalo de reintento y antigüedad a partir
+# de la cual se considera abandonado (guardar toma milisegundos)
+CACHE_LOCK_TIMEOUT_S = 30.0
+CACHE_LOCK_POLL_S = 0.05
+CACHE_LOCK_STALE_S = 120.0
+
+# Módulos cuyo código decide las incidencias además de las funciones registradas
+_LOGIC_MODULES = ('src.detection.detectors', 'src.detection.vectorized', 'src.preparation.cv_profiles',
+                  'src.preparation.filename_patterns')
+
+
+def detector_set_version(plan: CallPlan) -> str:
+    """
+    Versión del conjunto de detectores: nombres, entradas y código fuente de cada detector
+    del plan, más el de los módulos con la lógica compartida (umbrales, perfiles, parseo de
+    nombres) y la huella del archivo de templates de nombres. Cualquier cambio en ese código o
+    en los templates invalida la caché sin tener que subir una versión a mano.
+    """
+    digest = hashlib.sha256()
+    modules = set()
+    for spec in plan.specs:
+        digest.update(f"{spec.name}|{','.join(spec.inputs)}|{spec.cost_class}|{spec.batched}".encode('utf-8'))
+        for func in (spec.func, spec.batch_func):
+            if func is not None:
+                digest.update(inspect.getsource(func).encode('utf-8'))
+                modules.add(func.__module__)
+    modules.update(_LOGIC_MODULES)
+    for name in sorted(modules):
+        if name in sys.modules:
+            digest.update(inspect.getsource(sys.modules[name]).encode('utf-8'))
+    # Los templates de nombres viven en un archivo de datos, fuera del código
+    digest.update(default_patterns().digest.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def source_fingerprints(files_by_source: SourcePartitionedFrame, profiles: CVProfileStore,
+                        operation_date_str: str, detectors_version: str) -> dict:
+    """
+    Huella de las entradas de cada fuente: sus archivos del día, su perfil compilado, la
+    fecha de operación y la versión de los detectores. Los archivos se hashean con una sola
+    llamada vectorizada sobre el día completo; cada fuente solo digiere su tramo.
+
+    Returns:
+        dict: {source_id: huella hexadecimal}.
+    """
+    frame = files_by_source.frame
+    # La marca del índice de nombres (si está) también decide incidencias
+    columns = [column for column in FILE_RECORD_COLUMNS + [SEEN_BEFORE_COLUMN] if column in frame.columns]
+    row_hashes = pd.util.hash_pandas_object(frame[columns], index=False).to_numpy() if len(frame) else None
+
+    fingerprints = {}
+    for source_id in dict.fromkeys(profiles.source_order):
+        # El perfil compilado depende solo del CV crudo (su digest) y del código de cv_profiles,
+        # que ya forma parte de la versión de los detectores
+        digest = hashlib.sha256(f"{operation_date_str}|{detectors_version}|{source_id}|"
+                                f"{profiles.get(source_id).digest}".encode('utf-8'))
+        start, stop = files_by_source.offsets.get(source_id, (0, 0))
+        if row_hashes is not None:
+            digest.update(row_hashes[start:stop].tobytes())
+        fingerprints[source_id] = digest.hexdigest()
+    return fingerprints
+
+
+def _cache_path(cache_dir: str, operation_date_str: str) -> str:
+    return os.path.join(cache_dir, f"{operation_date_str}.json")
+
+
+def _load_entries(cache_path: str) -> dict:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if cached.get('version') != DETECTION_CACHE_FORMAT_VERSION:
+        return {}
+    return cached.get('entries', {})
+
+
+def _save_entries(cache_path: str, entries: dict):
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # json.dumps usa el encoder en C; json.dump a un archivo recorre el objeto en Python
+        f.write(json.dumps({'version': DETECTION_CACHE_FORMAT_VERSION, 'entries': entries}, ensure_ascii=False))
+    os.replace(tmp_path, cache_path)
+
+
+def _acquire_lock(lock_path: str) -> bool:
+    """
+    Toma el lock creando `lock_path` con O_EXCL (portable, como el merge de shards). Espera a
+    que otro proceso lo suelte; un lock más viejo que `CACHE_LOCK_STALE_S` quedó de un proceso
+    que murió y se descarta.
+    """
+    deadline = time.monotonic() + CACHE_LOCK_TIMEOUT_S
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > CACHE_LOCK_STALE_S:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(CACHE_LOCK_POLL_S)
+
+
+def _merge_entries(cache_path: str, updates: dict) -> bool:
+    """
+    Agrega `updates` a las entradas guardadas: relee el archivo y lo reemplaza bajo un lock
+    exclusivo, así las entradas que otro proceso (p. ej. otro shard) guardó mientras este
+    detectaba no se pierden. El lock se borra al terminar.
+
+    Returns:
+        bool: False si no se pudo tomar el lock (la caché queda como estaba).
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    lock_path = f"{cache_path}.lock"
+    if not _acquire_lock(lock_path):
+        return False
+    try:
+        entries = _load_entries(cache_path)
+        entries.update(updates)
+        _save_entries(cache_path, entries)
+    finally:
+        os.remove(lock_path)
+    return True
+
+
+def run_detection_incremental(df_files: pd.DataFrame, profiles: CVProfileStore, operation_date_str: str,
+                              engine: str = 'per_source', plan: CallPlan | None = None, workers: int = 1,
+                              cache_dir: str = DEFAULT_DETECTION_CACHE_DIR, force: bool = False) -> list:
+    """
+    Detección incremental: solo se recalculan las fuentes cuya huella de entradas cambió.
+
+    Las incidencias de cada fuente se guardan en la caché por huella ('<fecha>.json' en
+    `cache_dir`). Las fuentes sin cambios se toman de la caché y las demás se recalculan
+    con `run_detection` sobre el subconjunto; el reporte se arma en el orden de
+    'cv_data.json', idéntico al de una detección completa.
+
+    Args:
+        df_files (pd.DataFrame): Archivos del día de operación (todas las fuentes).
+        profiles (CVProfileStore): CVs compilados.
+        operation_date_str (str): Fecha de operación en formato 'YYYY-MM-DD'.
+        engine (str): Motor para las fuentes que se recalculan.
+        plan (CallPlan): Plan a usar; su versión forma parte de la huella.
+        workers (int): Procesos para el motor por fuente.
+        cache_dir (str): Carpeta de la caché de detección.
+        force (bool): Si es True, ignora la caché y recalcula todas las fuentes.
+
+    Returns:
+        list: Incidencias en el formato del reporte.
+    """
+    plan = plan or CallPlan(registered_detectors())
+    files_by_source = SourcePartitionedFrame(df_files)
+    fingerprints = source_fingerprints(files_by_source, profiles, operation_date_str, detector_set_version(plan))
+
+    cache_path = _cache_path(cache_dir, operation_date_str)
+    cached = {} if force else _load_entries(cache_path)
+    results = {}
+    for source_id, fingerprint in fingerprints.items():
+        entry = cached.get(source_id)
+        if entry is not None and entry['fingerprint'] == fingerprint:
+            results[source_id] = entry['incidents']
+    misses = [source_id for source_id in fingerprints if source_id not in results]
+
+    if misses:
+        miss_profiles = profiles.subset(misses)
+        miss_profiles.source_order = list(dict.fromkeys(miss_profiles.source_order))
+        frame = files_by_source.frame
+        miss_files = frame[frame['source_id'].astype(str).isin(set(misses)).to_numpy()]
+        for source_id in misses:
+            results[source_id] = []
+        for incident in run_detection(miss_files, miss_profiles, operation_date_str, engine=engine, plan=plan,
+                                      workers=workers):
+            results[incident['source_id']].append(incident)
+        # Se conserva lo ya guardado (releído al guardar): otro shard puede tener fuentes distintas
+        updates = {source_id: {'fingerprint': fingerprints[source_id], 'incidents': results[source_id]}
+                   for source_id in misses}
+        if not _merge_entries(cache_path, updates):
+            print(f"!! ADVERTENCIA: Otro proceso tiene tomada la caché de detección. Estas fuentes no se guardan "
+                  f"(si no hay otro proceso activo, borra '{cache_path}.lock').")
+
+    mode = "forzada (sin caché)" if force else "incremental"
+    print(f"-> [CACHE] Detección {mode}: {len(fingerprints) - len(misses)} fuentes desde caché (hits), "
+          f"{len(misses)} recalculadas (misses).")
+
+    all_incidents = []
+    for source_id in profiles.source_order:
+        all_incidents.extend(results[source_id])
+    return all_incidents
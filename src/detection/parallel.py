@@ -0,0 +1,106 @@
+# src/detection/parallel.py
+
+import os
+import math
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from ..preparation.cv_profiles import CVProfileStore
+from .partition import SourcePartitionedFrame
+from .registry import CallPlan, registered_detectors
+
+# En Linux /dev/shm es memoria compartida: el archivo columnar del día nunca toca disco
+SHARED_MEMORY_DIR = '/dev/shm'
+
+# Estado de cada worker: el día completo (tabla Arrow sobre el memory-map del Feather) y el plan por fuente
+_WORKER_TABLE = None
+_WORKER_PLAN = None
+
+
+def _init_worker(frame_path: str, detector_names: list):
+    global _WORKER_TABLE, _WORKER_PLAN
+    # La tabla queda mapeada (sin copiar a pandas); cada fuente se convierte al procesarla
+    _WORKER_TABLE = feather.read_table(frame_path, memory_map=True)
+    _WORKER_PLAN = CallPlan(registered_detectors(detector_names))
+
+
+def _run_chunk(task: tuple) -> tuple:
+    """
+    Tarea de un worker: corre los detectores por fuente de un bloque de fuentes.
+    Cada fuente llega como (source_id, inicio, fin, perfil); los archivos se toman del
+    día compartido por offsets, sin recibir DataFrames serializados: `slice` no copia y solo
+    las filas de la fuente pasan a pandas.
+    """
+    operation_date_str, sources = task
+    for stats in _WORKER_PLAN.stats.values():
+        stats.calls = stats.rows_scanned = stats.incidents = 0
+        stats.wall_time = 0.0
+    results = []
+    for source_id, start, stop, source_profile in sources:
+        df_source_files = _WORKER_TABLE.slice(start, stop - start).to_pandas()
+        # Mismo índice que las filas en el día completo, como en la ejecución en serie
+        df_source_files.index = pd.RangeIndex(start, stop)
+        results.append(_WORKER_PLAN.run_source_detectors(source_id, df_source_files, source_profile, operation_date_str))
+    return results, _WORKER_PLAN.stats
+
+
+def _write_shared_frame(frame: pd.DataFrame, directory: str) -> str:
+    frame_path = os.path.join(directory, 'day_files.feather')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    feather.write_feather(table, frame_path, compression='uncompressed')
+    return frame_path
+
+
+def run_detectors_parallel(df_files: pd.DataFrame, profiles: CVProfileStore, operation_date_str: str,
+                           workers: int, chunk_size: int | None = None, plan: CallPlan | None = None) -> list:
+    """
+    Ejecuta la detección por fuente en un ProcessPoolExecutor.
+
+    Los detectores por lotes corren una vez en el proceso padre. Para los demás, los archivos
+    del día (ya particionados por fuente) se escriben una sola vez como Feather sin compresión
+    en memoria compartida y cada worker lo abre con memory-map al iniciar; las tareas solo
+    llevan los offsets de cada fuente y su perfil. Los resultados se unen en el orden de
+    'cv_data.json', así que el reporte es idéntico al de la ejecución en serie.
+
+    Args:
+        df_files (pd.DataFrame): Archivos del día de operación (todas las fuentes).
+        profiles (CVProfileStore): CVs compilados.
+        operation_date_str (str): Fecha de operación en formato 'YYYY-MM-DD'.
+        workers (int): Número de procesos del pool.
+        chunk_size (int): Fuentes por tarea; por defecto, ~4 tareas por worker.
+        plan (CallPlan): Plan a usar (y donde quedan las métricas); por defecto, todos los registrados.
+
+    Returns:
+        list: Incidencias en el formato del reporte.
+    """
+    plan = plan or CallPlan(registered_detectors())
+    plan.run_batched(df_files, operation_date_str)
+
+    files_by_source = SourcePartitionedFrame(df_files)
+    source_ids = list(dict.fromkeys(profiles.source_order))
+    sources = [(source_id, *files_by_source.offsets.get(source_id, (0, 0)), profiles.get(source_id))
+               for source_id in source_ids]
+    chunk_size = chunk_size or max(math.ceil(len(sources) / (workers * 4)), 1)
+    tasks = [(operation_date_str, sources[i:i + chunk_size]) for i in range(0, len(sources), chunk_size)]
+    detector_names = [spec.name for spec in plan.specs if not spec.batched]
+
+    source_results = {}
+    shared_dir = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+    with tempfile.TemporaryDirectory(prefix='detection_', dir=shared_dir) as directory:
+        frame_path = _write_shared_frame(files_by_source.frame, directory)
+        print(f"-> [PARALELO] {len(sources)} fuentes en {len(tasks)} bloques, {workers} workers.")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(frame_path, detector_names)) as executor:
+            # executor.map conserva el orden de las tareas, sin importar qué worker terminó antes
+            for task, (results, stats) in zip(tasks, executor.map(_run_chunk, tasks)):
+                for (source_id, *_), result in zip(task[1], results):
+                    source_results[source_id] = result
+                plan.absorb_stats(stats)
+
+    all_incidents = []
+    for source_id in profiles.source_order:
+        all_incidents.extend(plan.merge_source(source_id, source_results[source_id]))
+    return all_incidents
@@ -0,0 +1,47 @@
+# src/detection/partition.py
+
+import numpy as np
+import pandas as pd
+
+from ..preparation.json_stream import FILE_RECORD_COLUMNS
+
+
+class SourcePartitionedFrame:
+    """
+    Vista de los archivos del día particionada por 'source_id'.
+
+    Los registros se ordenan una sola vez por fuente (orden estable, así cada fuente
+    conserva el orden original de sus archivos) y se guardan los offsets [inicio, fin)
+    de cada una. `get` devuelve un slice posicional del DataFrame ordenado, sin
+    recorrer ni copiar el resto de los registros.
+    """
+
+    def __init__(self, df_files: pd.DataFrame):
+        if df_files is None or 'source_id' not in df_files.columns:
+            df_files = pd.DataFrame(columns=FILE_RECORD_COLUMNS)
+
+        source_codes, source_uniques = pd.factorize(df_files['source_id'].astype(str).to_numpy())
+        order = np.argsort(source_codes, kind='stable')
+        counts = np.bincount(source_codes, minlength=len(source_uniques))
+        ends = np.cumsum(counts)
+
+        self.frame = df_files.take(order).reset_index(drop=True)
+        self.offsets = {
+            source_id: (int(end - count), int(end))
+            for source_id, count, end in zip(source_uniques, counts, ends)
+        }
+
+    def __contains__(self, source_id) -> bool:
+        return str(source_id) in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def source_ids(self) -> list:
+        return list(self.offsets)
+
+    def get(self, source_id) -> pd.DataFrame:
+        """Archivos de la fuente (vacío, con las mismas columnas, si no envió ninguno)."""
+        start, stop = self.offsets.get(str(source_id), (0, 0))
+        return self.frame.iloc[start:stop]
+
@@ -0,0 +1,207 @@
+# src/detection/registry.py
+
+import time
+import pandas as pd
+
+from .detectors import (
+    detect_duplicated_and_failed_files, detect_unexpected_empty_files,
+    detect_missing_files, detect_unexpected_volume_variation,
+    detect_file_upload_after_schedule, detect_upload_of_previous_file,
+    detect_duplicated_and_failed_files_batch, detect_upload_of_previous_file_batch
+)
+
+# Entradas que un detector puede declarar. El runner las resuelve una vez por corrida y las
+# pasa como argumentos posicionales, en el orden en que el detector las declaró.
+INPUT_DAY_FILES = 'day_files'            # archivos de la fuente (o del día completo si corre por lotes)
+INPUT_CV_PROFILE = 'cv_profile'          # SourceProfile de la fuente
+INPUT_OPERATION_DATE = 'operation_date'  # 'YYYY-MM-DD'
+INPUT_HISTORY = 'history'                # resumen histórico de la fuente (update_historical_summary)
+
+INPUTS = (INPUT_DAY_FILES, INPUT_CV_PROFILE, INPUT_OPERATION_DATE, INPUT_HISTORY)
+
+# Clases de costo: 'vectorized' opera sobre columnas; 'row_scan' recorre filas en Python
+COST_CLASSES = ('vectorized', 'row_scan')
+
+
+class DetectorSpec:
+    """
+    Declaración de un detector: qué entradas necesita, cuánto cuesta y si tiene una versión
+    por lotes que corre una sola vez sobre el día completo.
+
+    La función por lotes recibe las mismas entradas, pero con todos los archivos del día,
+    y devuelve {source_id: [incidencias]}. Solo puede existir si el detector no depende
+    de nada propio de cada fuente (perfil de CV o historia).
+    """
+
+    __slots__ = ('name', 'func', 'inputs', 'cost_class', 'batch_func')
+
+    def __init__(self, name: str, func, inputs: tuple, cost_class: str, batch_func=None):
+        unknown = [item for item in inputs if item not in INPUTS]
+        if unknown:
+            raise ValueError(f"El detector '{name}' declara entradas desconocidas: {unknown}.")
+        if cost_class not in COST_CLASSES:
+            raise ValueError(f"Clase de costo no soportada para '{name}': '{cost_class}'.")
+        if batch_func is not None and (INPUT_CV_PROFILE in inputs or INPUT_HISTORY in inputs):
+            raise ValueError(f"El detector '{name}' depende de datos por fuente y no puede correr por lotes.")
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.cost_class = cost_class
+        self.batch_func = batch_func
+
+    @property
+    def batched(self) -> bool:
+        return self.batch_func is not None
+
+
+# Registro ordenado: el orden es el de evaluación para cada fuente (y el del reporte)
+DETECTOR_REGISTRY = {}
+
+
+def register_detector(spec: DetectorSpec) -> DetectorSpec:
+    if spec.name in DETECTOR_REGISTRY:
+        raise ValueError(f"Ya existe un detector registrado con el nombre '{spec.name}'.")
+    DETECTOR_REGISTRY[spec.name] = spec
+    return spec
+
+
+def registered_detectors(names: list | None = None) -> list:
+    """Specs registrados, en orden de registro (o en el orden de `names` si se indica)."""
+    if names is None:
+        return list(DETECTOR_REGISTRY.values())
+    missing = [name for name in names if name not in DETECTOR_REGISTRY]
+    if missing:
+        raise ValueError(f"Detectores no registrados: {missing}.")
+    return [DETECTOR_REGISTRY[name] for name in names]
+
+
+class DetectorStats:
+    """Métricas acumuladas de un detector durante una corrida."""
+
+    __slots__ = ('name', 'cost_class', 'batched', 'calls', 'wall_time', 'rows_scanned', 'incidents')
+
+    def __init__(self, spec: DetectorSpec):
+        self.name = spec.name
+        self.cost_class = spec.cost_class
+        self.batched = spec.batched
+        self.calls = 0
+        self.wall_time = 0.0
+        self.rows_scanned = 0
+        self.incidents = 0
+
+    def record(self, elapsed: float, rows: int, incidents: int):
+        self.calls += 1
+        self.wall_time += elapsed
+        self.rows_scanned += rows
+        self.incidents += incidents
+
+
+class CallPlan:
+    """
+    Plan de ejecución resuelto una vez por corrida: qué detectores corren una sola vez sobre
+    el día y cuáles por fuente, con sus entradas ya ubicadas.
+    """
+
+    def __init__(self, specs: list, history: pd.DataFrame | None = None):
+        self.specs = specs
+        self.history_by_source = None
+        if any(INPUT_HISTORY in spec.inputs for spec in specs):
+            if history is None:
+                raise ValueError("Hay detectores que requieren el histórico, pero no se entregó.")
+            self.history_by_source = {str(source_id): group for source_id, group
+                                      in history.groupby('source_id', observed=True, sort=False)}
+        self.stats = {spec.name: DetectorStats(spec) for spec in specs}
+        self.batch_results = {}
+
+    def _args(self, spec: DetectorSpec, day_files: pd.DataFrame, source_profile, operation_date_str: str,
+              source_id: str | None) -> list:
+        values = {
+            INPUT_DAY_FILES: day_files,
+            INPUT_CV_PROFILE: source_profile,
+            INPUT_OPERATION_DATE: operation_date_str,
+        }
+        if INPUT_HISTORY in spec.inputs:
+            values[INPUT_HISTORY] = self.history_by_source.get(source_id)
+        return [values[item] for item in spec.inputs]
+
+    def run_batched(self, df_files: pd.DataFrame, operation_date_str: str):
+        """Corre una sola vez, sobre el día completo, los detectores que lo permiten."""
+        for spec in self.specs:
+            if not spec.batched:
+                continue
+            start = time.perf_counter()
+            results = spec.batch_func(*self._args(spec, df_files, None, operation_date_str, None))
+            incidents = sum(len(items) for items in results.values())
+            self.stats[spec.name].record(time.perf_counter() - start, len(df_files), incidents)
+            self.batch_results[spec.name] = results
+
+    def run_source_detectors(self, source_id: str, df_source_files: pd.DataFrame, source_profile,
+                             operation_date_str: str, verbose: bool = False) -> dict:
+        """Corre los detectores por fuente del plan. Retorna {nombre del detector: incidencias}."""
+        results = {}
+        for spec in self.specs:
+            if spec.batched:
+                continue
+            start = time.perf_counter()
+            result = spec.func(*self._args(spec, df_source_files, source_profile, operation_date_str, source_id),
+                               verbose=verbose)
+            rows = len(df_source_files) if df_source_files is not None and INPUT_DAY_FILES in spec.inputs else 0
+            self.stats[spec.name].record(time.perf_counter() - start, rows, len(result or []))
+            results[spec.name] = result or []
+        return results
+
+    def merge_source(self, source_id: str, source_results: dict) -> list:
+        """Une, en el orden del plan, los resultados por lotes y los por fuente de una fuente."""
+        incidents = []
+        for spec in self.specs:
+            if spec.batched:
+                incidents.extend(self.batch_results[spec.name].get(source_id, []))
+            else:
+                incidents.extend(source_results.get(spec.name, []))
+        return incidents
+
+    def run_source(self, source_id: str, df_source_files: pd.DataFrame, source_profile,
+                   operation_date_str: str, verbose: bool = False) -> list:
+        """Incidencias de una fuente, en el orden del plan (las de lotes salen del resultado ya calculado)."""
+        source_results = self.run_source_detectors(source_id, df_source_files, source_profile,
+                                                   operation_date_str, verbose=verbose)
+        return self.merge_source(source_id, source_results)
+
+    def absorb_stats(self, stats: dict):
+        """Suma métricas calculadas en otro proceso ({nombre: DetectorStats})."""
+        for name, other in stats.items():
+            own = self.stats[name]
+            own.calls += other.calls
+            own.wall_time += other.wall_time
+            own.rows_scanned += other.rows_scanned
+            own.incidents += other.incidents
+
+    def print_stats(self):
+        print("-> [DETECTORES] Métricas por detector:")
+        for stats in self.stats.values():
+            mode = 'lote' if stats.batched else 'por fuente'
+            print(f"   {stats.name:<32} {mode:<10} {stats.cost_class:<10} llamadas: {stats.calls:>6} | "
+                  f"filas: {stats.rows_scanned:>9} | incidencias: {stats.incidents:>5} | {stats.wall_time:7.3f}s")
+
+
+# --- Detectores del sistema ---
+register_detector(DetectorSpec(
+    'duplicated_and_failed_files', detect_duplicated_and_failed_files,
+    inputs=(INPUT_DAY_FILES,), cost_class='vectorized',
+    batch_func=detect_duplicated_and_failed_files_batch))
+register_detector(DetectorSpec(
+    'unexpected_empty_files', detect_unexpected_empty_files,
+    inputs=(INPUT_DAY_FILES, INPUT_CV_PROFILE, INPUT_OPERATION_DATE), cost_class='vectorized'))
+register_detector(DetectorSpec(
+    'missing_files', detect_missing_files,
+    inputs=(INPUT_DAY_FILES, INPUT_CV_PROFILE, INPUT_OPERATION_DATE), cost_class='vectorized'))
+register_detector(DetectorSpec(
+    'unexpected_volume_variation', detect_unexpected_volume_variation,
+    inputs=(INPUT_DAY_FILES, INPUT_CV_PROFILE, INPUT_OPERATION_DATE), cost_class='vectorized'))
+register_detector(DetectorSpec(
+    'file_upload_after_schedule', detect_file_upload_after_schedule,
+    inputs=(INPUT_DAY_FILES, INPUT_CV_PROFILE, INPUT_OPERATION_DATE), cost_class='vectorized'))
+register_detector(DetectorSpec(
+    'upload_of_previous_file', detect_upload_of_previous_file,
+    inputs=(INPUT_DAY_FILES, INPUT_OPERATION_DATE), cost_class='vectorized',
+    batch_func=detect_upload_of_previous_file_batch))
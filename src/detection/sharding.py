@@ -0,0 +1,217 @@
+# src/detection/sharding.py
+
+import os
+import json
+import glob
+import socket
+import hashlib
+from datetime import datetime, timezone
+import pandas as pd
+
+from ..preparation.cv_profiles import CVProfileStore
+
+# Carpeta compartida entre hosts: único canal de coordinación (reportes parciales + manifiestos)
+DEFAULT_SHARD_DIR = os.path.join('outputs', 'shards')
+
+# Versión del formato de manifiesto; el merge rechaza manifiestos de otra versión
+MANIFEST_FORMAT_VERSION = 1
+
+
+class ShardSpec:
+    """
+    Shard de fuentes: una fuente pertenece al shard `index` si el hash estable (SHA-1) de su
+    source_id, módulo `count`, es igual a `index`. No usa `hash()` de Python, que cambia
+    entre procesos.
+    """
+
+    __slots__ = ('index', 'count')
+
+    def __init__(self, index: int, count: int):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Shard inválido: {index}/{count}. Debe cumplirse 0 <= índice < total.")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, value: str) -> 'ShardSpec':
+        """Interpreta 'INDICE/TOTAL' (ej. '0/4')."""
+        try:
+            index, count = (int(part) for part in value.split('/'))
+        except ValueError:
+            raise ValueError(f"Shard '{value}' no reconocido. Usa el formato INDICE/TOTAL, ej. '0/4'.")
+        return cls(index, count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def owns(self, source_id) -> bool:
+        return shard_of(source_id, self.count) == self.index
+
+
+def shard_of(source_id, shard_count: int) -> int:
+    digest = hashlib.sha1(str(source_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def shard_inputs(df_files: pd.DataFrame, profiles: CVProfileStore, shard: ShardSpec) -> tuple:
+    """Restringe los archivos del día y los perfiles a las fuentes del shard."""
+    shard_profiles = profiles.subset([source_id for source_id in profiles.source_order if shard.owns(source_id)])
+    if df_files is None or 'source_id' not in df_files.columns:
+        return df_files, shard_profiles
+    mask = df_files['source_id'].astype(str).isin(set(shard_profiles.source_order))
+    return df_files[mask.to_numpy()].reset_index(drop=True), shard_profiles
+
+
+def _partial_paths(shard_dir: str, operation_date_str: str, shard: ShardSpec) -> tuple:
+    base = os.path.join(shard_dir, f"{operation_date_str}_incidents_report.{shard.index}")
+    return f"{base}.json", f"{base}.manifest.json"
+
+
+def _write_atomic(path: str, payload: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _read_text(path: str) -> str | None:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_shard_report(incidents: list, profiles: CVProfileStore, shard_profiles: CVProfileStore,
+                       operation_date_str: str, shard: ShardSpec, cv_sha256: str,
+                       shard_dir: str = DEFAULT_SHARD_DIR) -> str:
+    """
+    Escribe el reporte parcial del shard y, al final, su manifiesto (el manifiesto es el commit).
+
+    El manifiesto guarda, por cada aparición de una fuente del shard, su posición en el orden
+    global de 'cv_data.json' y cuántas incidencias aportó, para que el merge pueda intercalar
+    los parciales sin volver a leer los CVs.
+
+    Returns:
+        str: Ruta del manifiesto escrito.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    report_path, manifest_path = _partial_paths(shard_dir, operation_date_str, shard)
+
+    counts = {}
+    for incident in incidents:
+        counts[incident['source_id']] = counts.get(incident['source_id'], 0) + 1
+    # Una fuente repetida en cv_data.json aporta el mismo bloque en cada aparición
+    occurrences = {}
+    for source_id in shard_profiles.source_order:
+        occurrences[source_id] = occurrences.get(source_id, 0) + 1
+    blocks = [
+        {'source_id': source_id, 'position': position, 'n_incidents': counts.get(source_id, 0) // occurrences[source_id]}
+        for position, source_id in enumerate(profiles.source_order) if shard.owns(source_id)
+    ]
+
+    report_payload = json.dumps(incidents, indent=2, ensure_ascii=False)
+    _write_atomic(report_path, report_payload)
+    manifest = {
+        'version': MANIFEST_FORMAT_VERSION,
+        'operation_date': operation_date_str,
+        'shard_index': shard.index,
+        'shard_count': shard.count,
+        'total_positions': len(profiles.source_order),
+        'cv_sha256': cv_sha256,
+        'report_file': os.path.basename(report_path),
+        'report_sha256': hashlib.sha256(report_payload.encode('utf-8')).hexdigest(),
+        'n_incidents': len(incidents),
+        'blocks': blocks,
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2))
+    return manifest_path
+
+
+def _load_manifests(shard_dir: str, operation_date_str: str, shard_count: int) -> tuple:
+    """Retorna ({índice: manifiesto}, índices faltantes) para la fecha y el total de shards dados."""
+    manifests = {}
+    pattern = os.path.join(shard_dir, f"{operation_date_str}_incidents_report.*.manifest.json")
+    for manifest_path in glob.glob(pattern):
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            continue
+        if manifest.get('version') == MANIFEST_FORMAT_VERSION and manifest.get('shard_count') == shard_count:
+            manifests[manifest['shard_index']] = manifest
+    missing = [index for index in range(shard_count) if index not in manifests]
+    return manifests, missing
+
+
+def merge_shard_reports(operation_date_str: str, shard_count: int, output_path: str,
+                        shard_dir: str = DEFAULT_SHARD_DIR) -> bool:
+    """
+    Arma el reporte final a partir de los parciales, solo si están los manifiestos de todos
+    los shards y son consistentes entre sí (mismos CVs, posiciones completas, hashes válidos).
+
+    Varios shards pueden intentar el merge a la vez: un archivo de lock creado con O_EXCL,
+    propio del conjunto exacto de parciales, garantiza que solo uno lo escriba; se borra al
+    terminar, así un merge posterior de los mismos parciales vuelve a escribir el reporte.
+
+    Returns:
+        bool: True si el reporte final quedó escrito con estos parciales (por este proceso o por otro).
+    """
+    manifests, missing = _load_manifests(shard_dir, operation_date_str, shard_count)
+    if missing:
+        print(f"-> [SHARDS] Faltan manifiestos de los shards {missing} de {shard_count}. El merge queda pendiente.")
+        return False
+
+    cv_hashes = {manifest['cv_sha256'] for manifest in manifests.values()}
+    totals = {manifest['total_positions'] for manifest in manifests.values()}
+    if len(cv_hashes) > 1 or len(totals) > 1:
+        print("!! ERROR: Los shards se ejecutaron con 'cv_data.json' distintos. Vuelve a correrlos con los mismos CVs.")
+        return False
+
+    blocks = []
+    for index in range(shard_count):
+        manifest = manifests[index]
+        with open(os.path.join(shard_dir, manifest['report_file']), 'r', encoding='utf-8') as f:
+            payload = f.read()
+        if hashlib.sha256(payload.encode('utf-8')).hexdigest() != manifest['report_sha256']:
+            print(f"!! ERROR: El reporte parcial del shard {index} no coincide con su manifiesto.")
+            return False
+        incidents = json.loads(payload)
+        by_source = {}
+        for incident in incidents:
+            by_source.setdefault(incident['source_id'], []).append(incident)
+        for block in manifest['blocks']:
+            source_incidents = by_source.get(block['source_id'], [])
+            blocks.append((block['position'], source_incidents[:block['n_incidents']]))
+
+    positions = sorted(position for position, _ in blocks)
+    if positions != list(range(totals.pop())):
+        print("!! ERROR: Las posiciones de los shards no cubren exactamente todas las fuentes.")
+        return False
+
+    all_incidents = [incident for _, source_incidents in sorted(blocks, key=lambda block: block[0])
+                     for incident in source_incidents]
+    content = json.dumps(all_incidents, indent=2, ensure_ascii=False) if all_incidents else json.dumps([])
+
+    run_key = hashlib.sha256(''.join(manifests[i]['report_sha256'] for i in range(shard_count)).encode()).hexdigest()[:16]
+    lock_path = os.path.join(shard_dir, f"{operation_date_str}_incidents_report.merge.{run_key}.lock")
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        # Otro proceso tiene el lock: solo cuenta como hecho si el reporte ya está escrito con este contenido
+        if _read_text(output_path) == content:
+            print("-> [SHARDS] Otro proceso ya armó el reporte final de estos parciales.")
+            return True
+        print(f"-> [SHARDS] Otro proceso está armando el reporte final de estos parciales. El merge queda pendiente "
+              f"(si no hay otro proceso activo, borra '{lock_path}').")
+        return False
+
+    try:
+        _write_atomic(output_path, content)
+    finally:
+        os.remove(lock_path)
+    print(f"✓ Reporte final de {len(all_incidents)} incidencias armado desde {shard_count} shards: {output_path}")
+    return True
@@ -0,0 +1,427 @@
+# src/detection/streaming.py
+
+import os
+import json
+import time
+import heapq
+import queue
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+from ..preparation.cv_profiles import CVProfileStore
+from ..preparation.filename_index import SEEN_BEFORE_COLUMN
+from ..preparation.filename_patterns import default_patterns
+from .detectors import duplicated_or_failed_details
+
+# Orden de los tipos de incidencia dentro de cada fuente (el mismo del reporte batch)
+INCIDENT_TYPES = [
+    "Archivo Duplicado o Fallido",
+    "Archivo Vacío Inesperado",
+    "Archivos Faltantes",
+    "Variación de Volumen Inesperada",
+    "Advertencia: Archivo Cargado Fuera de Horario",
+    "Advertencia: Carga de Archivo Antiguo",
+]
+FAILED, EMPTY, MISSING, VOLUME, LATE, OLD = INCIDENT_TYPES
+
+
+def event_time(uploaded_at) -> datetime | None:
+    """'uploaded_at' de un evento (texto ISO, datetime o Timestamp) -> datetime UTC sin zona."""
+    if uploaded_at is None or (not isinstance(uploaded_at, str) and pd.isna(uploaded_at)):
+        return None
+    if isinstance(uploaded_at, str):
+        uploaded_at = datetime.fromisoformat(uploaded_at)
+    elif isinstance(uploaded_at, pd.Timestamp):
+        uploaded_at = uploaded_at.to_pydatetime()
+    if uploaded_at.tzinfo is not None:
+        uploaded_at = uploaded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return uploaded_at
+
+
+def _coverage_age_days(source_id: str, filename: str, operation_date) -> int | None:
+    coverage_date = default_patterns().parse(source_id, filename)['date']
+    return None if coverage_date is None else (operation_date - coverage_date).days
+
+
+class SourceDayState:
+    """
+    Estado de una fuente durante el día abierto: los archivos recibidos y, por regla, los
+    que la cumplen (en orden de llegada), más los tipos de incidencia ya alertados.
+    """
+
+    __slots__ = ('files', 'failed', 'reuploaded', 'empty', 'volume', 'late', 'old', 'alerted')
+
+    def __init__(self):
+        self.files = []
+        self.failed = []
+        self.reuploaded = 0
+        self.empty = []
+        self.volume = []
+        self.late = []
+        self.old = []
+        self.alerted = set()
+
+
+class StreamingDetector:
+    """
+    Detección en tiempo real sobre eventos de subida (un evento = un registro de 'files.json'
+    con su 'source_id').
+
+    Cada evento actualiza el estado del día de su fuente y evalúa al momento las reglas que
+    dependen de cada archivo (duplicado/fallido, vacíos sobre el umbral, volumen, fuera de
+    horario, archivo antiguo). Los archivos faltantes usan timers de tiempo de evento: al
+    pasar el cierre de la ventana de la fuente + 4h (el mismo deadline de la regla de
+    horario) se alerta si llegaron menos archivos de los esperados. El tiempo de evento
+    avanza con el 'uploaded_at' más reciente visto (o con `advance_to` en modo en vivo).
+
+    Cada incidencia se alerta una vez, la primera vez que se cumple su regla, con los
+    archivos vistos hasta ese momento. Al cerrar el día (llega un evento de un día posterior
+    o se llama a `close_day`) se emite el reporte consolidado, idéntico al de la detección
+    batch sobre los mismos archivos (los archivos de cada incidencia, del más reciente al
+    más antiguo, como en las snapshots).
+
+    Args:
+        profiles (CVProfileStore): CVs compilados. Solo se analizan sus fuentes.
+        on_incident: Callback (incidencia, tiempo de evento) para cada alerta temprana.
+        on_day_closed: Callback (fecha 'YYYY-MM-DD', incidencias) con el reporte del día.
+    """
+
+    def __init__(self, profiles: CVProfileStore, on_incident=None, on_day_closed=None):
+        self.profiles = profiles
+        self.on_incident = on_incident or (lambda incident, at: None)
+        self.on_day_closed = on_day_closed or (lambda date_str, incidents: None)
+        self.operation_date = None
+        self.watermark = None
+        self.states = {}
+        self.timers = []
+        self.thresholds = {}
+        self.stats = {'events': 0, 'ignored': 0, 'alerts': 0}
+
+    # --- Día abierto ---
+    def _open_day(self, operation_date):
+        self.operation_date = operation_date
+        self.states = {source_id: SourceDayState() for source_id in self.profiles.source_order}
+        self.timers = []
+        self.thresholds = {}
+        weekday = operation_date.weekday()
+        for source_id in self.states:
+            profile = self.profiles.get(source_id)
+            mean_empty = profile.empty_files_mean[weekday]
+            if mean_empty is not None:
+                empty_limit = round(mean_empty) + 1
+            else:
+                empty_limit = 0 if profile.median_rows is not None and profile.median_rows > 50 else None
+            mean_files = profile.mean_files[weekday]
+            rows_mean = profile.rows_mean[weekday]
+            volume_enabled = (profile.rows_band(weekday) is not None
+                              or rows_mean is not None and profile.stdev_rows is not None and rows_mean >= 100)
+            deadline = profile.deadline(weekday, operation_date)
+            self.thresholds[source_id] = (empty_limit, None if mean_files is None else round(mean_files),
+                                          volume_enabled, deadline)
+            if deadline is not None and mean_files is not None:
+                heapq.heappush(self.timers, (deadline, source_id))
+
+    def close_day(self) -> list:
+        """Cierra el día abierto: emite y retorna su reporte consolidado."""
+        if self.operation_date is None:
+            return []
+        operation_date_str = self.operation_date.strftime('%Y-%m-%d')
+        incidents = []
+        for source_id in self.profiles.source_order:
+            incidents.extend(self._source_incidents(source_id, self.states[source_id]))
+        self.operation_date = None
+        self.states = {}
+        self.timers = []
+        self.on_day_closed(operation_date_str, incidents)
+        return incidents
+
+    # --- Tiempo de evento ---
+    def advance_to(self, now: datetime):
+        """
+        Avanza el tiempo de evento y dispara los timers vencidos (deadline < now). Si el
+        tiempo pasa a un día posterior al abierto, cierra el día.
+        """
+        if self.watermark is None or now > self.watermark:
+            self.watermark = now
+        while self.timers and self.timers[0][0] < self.watermark:
+            deadline, source_id = heapq.heappop(self.timers)
+            state = self.states[source_id]
+            expected_files_count = self.thresholds[source_id][1]
+            if len(state.files) < expected_files_count:
+                self._alert(source_id, state, MISSING, deadline)
+        # En modo en vivo el reloj puede cruzar la medianoche sin eventos nuevos
+        if self.operation_date is not None and self.watermark.date() > self.operation_date:
+            self.close_day()
+
+    # --- Eventos ---
+    def process(self, event: dict):
+        """Procesa un evento de subida; retorna False si se descartó."""
+        uploaded_at = event_time(event.get('uploaded_at'))
+        source_id = str(event.get('source_id'))
+        if uploaded_at is None or source_id not in self.profiles:
+            self.stats['ignored'] += 1
+            return False
+        operation_date = uploaded_at.date()
+        if self.operation_date is not None and operation_date < self.operation_date:
+            print(f"!! ADVERTENCIA: Evento de {source_id} del {operation_date} llegó con el día ya cerrado. Se descarta.")
+            self.stats['ignored'] += 1
+            return False
+        if self.operation_date is None or operation_date > self.operation_date:
+            self.close_day()
+            self._open_day(operation_date)
+        self.advance_to(uploaded_at)
+        self.stats['events'] += 1
+
+        state = self.states[source_id]
+        empty_limit, _, volume_enabled, deadline = self.thresholds[source_id]
+        profile = self.profiles.get(source_id)
+        filename = event.get('filename')
+        rows = event.get('rows')
+        status = event.get('status')
+        state.files.append(filename)
+
+        reuploaded = event.get(SEEN_BEFORE_COLUMN) == True
+        state.reuploaded += reuploaded
+        if event.get('is_duplicated') == True or (isinstance(status, str) and status.lower() == 'stopped') or reuploaded:
+            state.failed.append(filename)
+            self._alert(source_id, state, FAILED, uploaded_at)
+        if rows == 0:
+            state.empty.append(filename)
+            if empty_limit is not None and len(state.empty) > empty_limit:
+                self._alert(source_id, state, EMPTY, uploaded_at)
+        if volume_enabled and rows is not None and not pd.isna(rows):
+            band = profile.rows_band(self.operation_date.weekday())
+            if band is not None:
+                anomalous = rows < band[0] or rows > band[1]
+            else:
+                anomalous = abs(rows - profile.rows_mean[self.operation_date.weekday()]) > 2 * profile.stdev_rows
+            if anomalous:
+                state.volume.append(filename)
+                self._alert(source_id, state, VOLUME, uploaded_at)
+        if deadline is not None and uploaded_at > deadline:
+            state.late.append(filename)
+            self._alert(source_id, state, LATE, uploaded_at)
+        age = _coverage_age_days(source_id, filename, self.operation_date)
+        if age is not None and age > 3:
+            state.old.append(filename)
+            self._alert(source_id, state, OLD, uploaded_at)
+        return True
+
+    def _alert(self, source_id: str, state: SourceDayState, incident_type: str, at: datetime):
+        if incident_type in state.alerted:
+            return
+        state.alerted.add(incident_type)
+        self.stats['alerts'] += 1
+        incident = self._incident(source_id, state, incident_type)
+        if incident is not None:
+            self.on_incident(incident, at)
+
+    # --- Incidencias (mismo formato y textos que `detectors.py`) ---
+    def _incident(self, source_id: str, state: SourceDayState, incident_type: str) -> dict | None:
+        profile = self.profiles.get(source_id)
+        weekday = self.operation_date.weekday()
+        day_abbr = self.operation_date.strftime('%a')
+        newest_first = lambda filenames: filenames[::-1]
+
+        if incident_type == FAILED:
+            if not state.failed:
+                return None
+            count = len(state.failed)
+            details = duplicated_or_failed_details(count, state.reuploaded)
+            return self._make(source_id, FAILED, details, count, newest_first(state.failed))
+        if incident_type == EMPTY:
+            empty_limit = self.thresholds[source_id][0]
+            count = len(state.empty)
+            if not count or empty_limit is None or count <= empty_limit:
+                return None
+            mean_empty = profile.empty_files_mean[weekday]
+            if mean_empty is not None:
+                details = f"Se recibieron {count} archivos vacíos, superando la media histórica de ~{mean_empty:.2f} para los {day_abbr}."
+            else:
+                details = f"Se recibieron {count} archivos vacíos. La mediana de filas para esta fuente es {profile.median_rows}, por lo que no se esperan archivos vacíos."
+            return self._make(source_id, EMPTY, details, count, newest_first(state.empty))
+        if incident_type == MISSING:
+            expected_files_count = self.thresholds[source_id][1]
+            received_files_count = len(state.files)
+            if expected_files_count is None or received_files_count >= expected_files_count:
+                return None
+            details = (f"Se recibieron {received_files_count} archivos, pero se esperaban aproximadamente {expected_files_count} "
+                       f"(la media histórica para los {day_abbr} es {profile.mean_files[weekday]:.2f}).")
+            return self._make(source_id, MISSING, details, expected_files_count - received_files_count,
+                              newest_first(state.files))
+        if incident_type == VOLUME:
+            if not state.volume:
+                return None
+            band = profile.rows_band(weekday)
+            if band is not None:
+                details = (f"Se encontraron {len(state.volume)} archivos con un número de filas fuera de la banda de "
+                           f"percentiles histórica para los {day_abbr} ({band[0]:.0f}–{band[1]:.0f} filas).")
+            else:
+                details = (f"Se encontraron {len(state.volume)} archivos con un número de filas anómalo. "
+                           f"La media esperada para los {day_abbr} es ~{profile.rows_mean[weekday]:.0f} (stdev: {profile.stdev_rows:.0f}).")
+            return self._make(source_id, VOLUME, details, len(state.volume), newest_first(state.volume))
+        if incident_type == LATE:
+            if not state.late:
+                return None
+            details = f"Se recibieron {len(state.late)} archivos más de 4 horas después del cierre de la ventana esperada (~{profile.window_end_label(weekday)} UTC)."
+            return self._make(source_id, LATE, details, len(state.late), newest_first(state.late))
+        if not state.old:
+            return None
+        details = f"Se encontraron {len(state.old)} archivos cuya fecha en el nombre es de hace más de 3 días, indicando una posible carga histórica."
+        return self._make(source_id, OLD, details, len(state.old), newest_first(state.old))
+
+    @staticmethod
+    def _make(source_id: str, incident_type: str, details: str, total: int, files_to_review: list) -> dict:
+        return {
+            "source_id": source_id, "incident_type": incident_type, "incident_details": details,
+            "total_incidentes": total, "files_to_review": files_to_review
+        }
+
+    def _source_incidents(self, source_id: str, state: SourceDayState) -> list:
+        incidents = []
+        for incident_type in INCIDENT_TYPES:
+            incident = self._incident(source_id, state, incident_type)
+            if incident is not None:
+                incidents.append(incident)
+        return incidents
+
+
+# --- Fuentes de eventos ---
+def snapshot_events(df_files: pd.DataFrame):
+    """
+    Convierte los archivos de un día (como los entrega `load_and_filter_daily_files`) en
+    eventos ordenados por 'uploaded_at'. Ante empates se respeta el orden de la snapshot
+    (del más reciente al más antiguo), de modo que la reproducción es determinista.
+    """
+    if df_files is None or df_files.empty:
+        return
+    position = np.arange(len(df_files))
+    uploaded_at = pd.to_datetime(df_files['uploaded_at'], utc=True).dt.tz_localize(None).to_numpy()
+    order = np.lexsort((-position, uploaded_at))
+    records = df_files.iloc[order].astype(object).where(df_files.iloc[order].notna(), None)
+    for record in records.to_dict('records'):
+        record['source_id'] = str(record['source_id'])
+        yield record
+
+
+def tail_jsonl(file_path: str, poll_interval: float = 1.0, on_idle=None, stop=None):
+    """
+    Sigue un archivo JSONL (como `tail -f`) y entrega un evento por línea completa.
+    Una línea a medio escribir se retiene hasta que llega su salto de línea.
+
+    Args:
+        on_idle: Callback sin argumentos que se llama en cada espera (p. ej. para avanzar timers).
+        stop: Callable que retorna True para terminar.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        pending = ''
+        while not (stop and stop()):
+            line = f.readline()
+            if not line:
+                if on_idle:
+                    on_idle()
+                time.sleep(poll_interval)
+                continue
+            pending += line
+            if not pending.endswith('\n'):
+                continue
+            text, pending = pending.strip(), ''
+            if not text:
+                continue
+            try:
+                yield json.loads(text)
+            except json.JSONDecodeError:
+                print(f"!! ADVERTENCIA: Línea inválida en '{file_path}'. Se ignora.")
+
+
+def watch_directory(directory: str, poll_interval: float = 1.0, on_idle=None, stop=None):
+    """
+    Vigila una carpeta con watchdog y entrega los eventos de sus archivos '.jsonl' o '.json'.
+
+    Un archivo puede aparecer vacío o a medio escribir y completarse después (on_created y
+    luego varios on_modified). De un '.jsonl' se lleva el offset en bytes leído hasta ahora,
+    como `tail_jsonl`: cada aviso lee desde ahí y solo las líneas completas. Un '.json' se
+    entrega entero (una lista/objeto) la primera vez que se puede parsear completo.
+    """
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+
+    changed = queue.Queue()
+
+    class _FileHandler(FileSystemEventHandler):
+        def on_created(self, event):
+            if not event.is_directory:
+                changed.put(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                changed.put(event.src_path)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                changed.put(event.dest_path)
+
+    offsets = {}    # '.jsonl' -> bytes ya entregados (hasta el último salto de línea)
+    loaded = set()  # '.json' ya entregados
+    observer = Observer()
+    observer.schedule(_FileHandler(), directory, recursive=False)
+    observer.start()
+    try:
+        while not (stop and stop()):
+            try:
+                path = changed.get(timeout=poll_interval)
+            except queue.Empty:
+                if on_idle:
+                    on_idle()
+                continue
+            if not path.endswith(('.jsonl', '.json')) or os.path.basename(path).startswith('.'):
+                continue
+            if path.endswith('.jsonl'):
+                yield from _read_new_lines(path, offsets)
+            elif path not in loaded:
+                events = _read_json_file(path)
+                if events is not None:
+                    loaded.add(path)
+                    yield from events
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def _read_new_lines(path: str, offsets: dict):
+    """Eventos de las líneas completas de `path` desde su offset, que avanza hasta el último salto de línea."""
+    offset = offsets.get(path, 0)
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < offset:
+                print(f"!! ADVERTENCIA: '{path}' se truncó. Se vuelve a leer desde el inicio.")
+                offset = 0
+            f.seek(offset)
+            chunk = f.read()
+    except OSError as error:
+        print(f"!! ADVERTENCIA: No se pudo leer '{path}' ({error}). Se ignora.")
+        return
+    complete = chunk[:chunk.rfind(b'\n') + 1]
+    offsets[path] = offset + len(complete)
+    for line in complete.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            print(f"!! ADVERTENCIA: Línea inválida en '{path}'. Se ignora.")
+
+
+def _read_json_file(path: str) -> list | None:
+    """Eventos de un '.json' completo, o None si todavía no se puede parsear (a medio escribir)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+    return data if isinstance(data, list) else [data]
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,197 @@
+# src/detection/vectorized.py
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from ..preparation.cv_profiles import CVProfileStore
+from ..preparation.filename_index import SEEN_BEFORE_COLUMN
+from .detectors import coverage_age_days, duplicated_or_failed_details, duplicated_or_failed_mask
+from .partition import SourcePartitionedFrame
+
+# Modos de la regla de archivos vacíos (ver `detect_unexpected_empty_files`)
+EMPTY_MEAN, EMPTY_FALLBACK = 1, 2
+
+
+def build_threshold_table(profiles: CVProfileStore, operation_date_str: str) -> pd.DataFrame:
+    """
+    Tabla de umbrales por fuente para el día de la semana de la operación.
+
+    Parte de la tabla compilada del día (`CVProfileStore.weekday_table`) y deriva, con las
+    mismas condiciones de aplicabilidad que las funciones de `detectors.py`, el límite de
+    archivos vacíos, los archivos esperados, si aplica la regla de volumen y el deadline.
+
+    Args:
+        profiles (CVProfileStore): CVs compilados.
+        operation_date_str (str): Fecha de operación en formato 'YYYY-MM-DD'.
+
+    Returns:
+        pd.DataFrame: Una fila por fuente, indexada por source_id.
+    """
+    operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d')
+    table = profiles.weekday_table(operation_date.weekday())
+
+    # Archivos vacíos: media del día de la semana o, si no hay, fallback por mediana
+    has_empty_mean = table['empty_files_mean'].notna()
+    table['empty_mode'] = np.where(has_empty_mean, EMPTY_MEAN, EMPTY_FALLBACK)
+    table['empty_limit'] = np.where(has_empty_mean, np.round(table['empty_files_mean']) + 1,
+                                    np.where(table['median_rows'] > 50, 0.0, np.inf))
+
+    # Archivos faltantes (round de Python y np.round redondean igual: mitad al par)
+    table['expected_files'] = np.round(table['mean_files'])
+
+    # Variación de volumen: banda de percentiles si existe; si no, solo con rows_mean, stdev_rows
+    # y volumen significativo
+    table['volume_band'] = table['rows_low'].notna() & table['rows_high'].notna()
+    table['volume_enabled'] = table['volume_band'] | (table['stdev_rows'].notna() & (table['rows_mean'] >= 100))
+
+    # Carga fuera de horario: cierre de la ventana + 4h
+    midnight = np.datetime64(operation_date.strftime('%Y-%m-%d'), 'ns')
+    table['deadline'] = midnight + pd.to_timedelta(table['window_end_s'] + 4 * 3600, unit='s').to_numpy()
+    return table
+
+
+def run_vectorized_detection(df_files: pd.DataFrame, profiles: CVProfileStore, operation_date_str: str) -> list:
+    """
+    Motor vectorizado: evalúa las seis reglas sobre todos los archivos del día de una vez.
+
+    Los umbrales de cada fuente se difunden a sus archivos por código de fuente, cada regla
+    produce una máscara sobre el día completo y los conteos por fuente salen de un
+    `np.bincount`. Solo el armado de los objetos de incidencia recorre las fuentes.
+    Emite exactamente las mismas incidencias, en el mismo orden, que `run_detectors_per_source`.
+
+    Args:
+        df_files (pd.DataFrame): Archivos del día de operación (todas las fuentes).
+        profiles (CVProfileStore): CVs compilados (ver `load_cv_profiles`).
+        operation_date_str (str): Fecha de operación en formato 'YYYY-MM-DD'.
+
+    Returns:
+        list: Incidencias en el formato del reporte.
+    """
+    if not len(profiles):
+        return []
+    operation_date = datetime.strptime(operation_date_str, '%Y-%m-%d').date()
+    day_abbr = operation_date.strftime('%a')
+    weekday = operation_date.weekday()
+    thresholds = build_threshold_table(profiles, operation_date_str)
+
+    files_by_source = SourcePartitionedFrame(df_files)
+    frame = files_by_source.frame
+    n_table = len(thresholds)
+
+    # Código de tabla de cada archivo (-1 si su fuente no tiene CV en la lista)
+    codes = thresholds.index.get_indexer(frame['source_id'].astype(str))
+    known = codes >= 0
+    safe_codes = np.where(known, codes, 0)
+
+    def broadcast(column: str) -> np.ndarray:
+        return thresholds[column].to_numpy()[safe_codes]
+
+    def per_source_count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(codes[mask & known], minlength=n_table)
+
+    rows = frame['rows'].to_numpy(dtype=np.float64)
+    filenames = frame['filename'].to_numpy(dtype=object)
+
+    # Una máscara por regla sobre el día completo
+    failed_mask = duplicated_or_failed_mask(frame)
+    if SEEN_BEFORE_COLUMN in frame.columns:
+        reuploaded_mask = frame[SEEN_BEFORE_COLUMN].to_numpy(dtype=bool)
+    else:
+        reuploaded_mask = np.zeros(len(frame), dtype=bool)
+    empty_mask = rows == 0
+    outside_band = (rows < broadcast('rows_low').astype(np.float64)) | (rows > broadcast('rows_high').astype(np.float64))
+    outside_stdev = np.abs(rows - broadcast('rows_mean').astype(np.float64)) > 2 * broadcast('stdev_rows').astype(np.float64)
+    volume_mask = (known & broadcast('volume_enabled').astype(bool)
+                   & np.where(broadcast('volume_band').astype(bool), outside_band, outside_stdev))
+    if len(frame):
+        uploaded_at = pd.to_datetime(frame['uploaded_at']).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+        deadlines = thresholds['deadline'].to_numpy(dtype='datetime64[ns]')[safe_codes]
+        late_mask = known & (uploaded_at > deadlines)
+        old_mask = known & (coverage_age_days(frame, operation_date) > 3)
+    else:
+        late_mask = old_mask = np.zeros(0, dtype=bool)
+
+    received = per_source_count(np.ones(len(frame), dtype=bool))
+    failed_count = per_source_count(failed_mask)
+    reuploaded_count = per_source_count(reuploaded_mask)
+    empty_count = per_source_count(empty_mask)
+    volume_count = per_source_count(volume_mask)
+    late_count = per_source_count(late_mask)
+    old_count = per_source_count(old_mask)
+    empty_incident = (empty_count > 0) & (empty_count > thresholds['empty_limit'].to_numpy())
+    expected_files = thresholds['expected_files'].to_numpy()
+    missing_incident = received < expected_files
+
+    threshold_rows = thresholds.to_dict('records')
+    all_incidents = []
+    for source_id in profiles.source_order:
+        code = thresholds.index.get_loc(source_id)
+        start, stop = files_by_source.offsets.get(source_id, (0, 0))
+        threshold = threshold_rows[code]
+
+        def files(mask: np.ndarray) -> list:
+            return filenames[start:stop][mask[start:stop]].tolist()
+
+        if failed_count[code]:
+            all_incidents.append({
+                "source_id": source_id,
+                "incident_type": "Archivo Duplicado o Fallido",
+                "incident_details": duplicated_or_failed_details(int(failed_count[code]), int(reuploaded_count[code])),
+                "total_incidentes": int(failed_count[code]),
+                "files_to_review": files(failed_mask)
+            })
+
+        if empty_incident[code]:
+            count = int(empty_count[code])
+            if threshold['empty_mode'] == EMPTY_MEAN:
+                details = f"Se recibieron {count} archivos vacíos, superando la media histórica de ~{threshold['empty_files_mean']:.2f} para los {day_abbr}."
+            else:
+                median_rows = profiles.get(source_id).median_rows
+                details = f"Se recibieron {count} archivos vacíos. La mediana de filas para esta fuente es {median_rows}, por lo que no se esperan archivos vacíos."
+            all_incidents.append({
+                "source_id": source_id, "incident_type": "Archivo Vacío Inesperado",
+                "incident_details": details, "total_incidentes": count,
+                "files_to_review": files(empty_mask)
+            })
+
+        if missing_incident[code]:
+            expected_files_count = int(expected_files[code])
+            received_files_count = int(received[code])
+            details = (f"Se recibieron {received_files_count} archivos, pero se esperaban aproximadamente {expected_files_count} "
+                       f"(la media histórica para los {day_abbr} es {threshold['mean_files']:.2f}).")
+            all_incidents.append({
+                "source_id": source_id, "incident_type": "Archivos Faltantes", "incident_details": details,
+                "total_incidentes": expected_files_count - received_files_count,
+                "files_to_review": filenames[start:stop].tolist()
+            })
+
+        if volume_count[code]:
+            if threshold['volume_band']:
+                details = (f"Se encontraron {volume_count[code]} archivos con un número de filas fuera de la banda de "
+                           f"percentiles histórica para los {day_abbr} ({threshold['rows_low']:.0f}–{threshold['rows_high']:.0f} filas).")
+            else:
+                details = (f"Se encontraron {volume_count[code]} archivos con un número de filas anómalo. "
+                           f"La media esperada para los {day_abbr} es ~{threshold['rows_mean']:.0f} (stdev: {threshold['stdev_rows']:.0f}).")
+            all_incidents.append({
+                "source_id": source_id, "incident_type": "Variación de Volumen Inesperada",
+                "incident_details": details, "total_incidentes": int(volume_count[code]),
+                "files_to_review": files(volume_mask)
+            })
+
+        if late_count[code]:
+            details = f"Se recibieron {late_count[code]} archivos más de 4 horas después del cierre de la ventana esperada (~{profiles.get(source_id).window_end_label(weekday)} UTC)."
+            all_incidents.append({
+                "source_id": source_id, "incident_type": "Advertencia: Archivo Cargado Fuera de Horario",
+                "incident_details": details, "total_incidentes": int(late_count[code]),
+                "files_to_review": files(late_mask)
+            })
+
+        if old_count[code]:
+            details = f"Se encontraron {old_count[code]} archivos cuya fecha en el nombre es de hace más de 3 días, indicando una posible carga histórica."
+            all_incidents.append({
+                "source_id": source_id, "incident_type": "Advertencia: Carga de Archivo Antiguo",
+                "incident_details": details, "total_incidentes": int(old_count[code]),
+                "files_to_review": files(old_mask)
+            })
+    return all_incidents
@@ -0,0 +1,157 @@
+# src/preparation/aggregation.py
+
+import numpy as np
+import pandas as pd
+
+GROUP_KEYS = ['uploaded_at_date', 'source_id']
+
+# Métricas acumuladas por celda (grupo, hora), en el orden de la matriz de valores.
+# Las tres primeras son las que se publican por hora; el resto solo se totaliza por grupo.
+HOURLY_METRICS = ['total_files', 'sum_file_size', 'sum_rows']
+COUNTER_METRICS = [
+    'total_files_duplicated_stopped', 'total_files_duplicated', 'total_files_processed',
+    'total_files_other_status', 'total_files_filesize_null', 'total_files_filesize_zero',
+    'total_files_filesize_positive', 'total_filename_duplicated_in_source'
+]
+METRICS = HOURLY_METRICS + COUNTER_METRICS
+
+# Orden de las columnas base en el esquema ancho (igual que create_historical_summary)
+SUMMARY_BASE_COLUMNS = [
+    'total_files', 'total_files_duplicated_stopped', 'total_files_duplicated', 'total_files_processed',
+    'total_files_other_status', 'sum_file_size', 'sum_rows', 'total_files_filesize_null',
+    'total_files_filesize_zero', 'total_files_filesize_positive', 'total_filename_duplicated_in_source'
+]
+HOURLY_PREFIXES = {'total_files': 'total_files_h', 'sum_file_size': 'sum_filesize_h', 'sum_rows': 'sum_rows_h'}
+
+_NS_PER_HOUR = 3_600_000_000_000
+_NS_PER_DAY = 24 * _NS_PER_HOUR
+
+
+def _utc_nanoseconds(uploaded_at: pd.Series) -> np.ndarray:
+    """Devuelve 'uploaded_at' como enteros de nanosegundos UTC."""
+    uploaded_at = pd.to_datetime(uploaded_at)
+    if uploaded_at.dt.tz is not None:
+        uploaded_at = uploaded_at.dt.tz_convert('UTC').dt.tz_localize(None)
+    return uploaded_at.to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def _metric_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Construye la matriz [registros, métricas] con los valores a sumar de cada registro."""
+    # Factorizamos 'status' una vez y comparamos códigos enteros en lugar de strings
+    status_codes, status_uniques = pd.factorize(df['status'])
+    status_code = {status: code for code, status in enumerate(status_uniques)}
+    is_processed = status_codes == status_code.get('processed', -2)
+    is_stopped = status_codes == status_code.get('stopped', -2)
+    file_size = df['file_size']
+    is_duplicated = (df['is_duplicated'] == True).to_numpy(dtype=bool, na_value=False)
+    if 'is_filename_duplicated_in_source' in df.columns:
+        filename_duplicated = df['is_filename_duplicated_in_source']
+    else:
+        filename_duplicated = df.duplicated(subset=['source_id', 'filename'], keep=False)
+
+    values = np.empty((len(df), len(METRICS)), dtype=np.float64)
+    values[:, 0] = df['filename'].notna()
+    values[:, 1] = file_size.fillna(0)
+    values[:, 2] = df['rows'].fillna(0)
+    values[:, 3] = is_duplicated & is_stopped
+    values[:, 4] = is_duplicated
+    values[:, 5] = is_processed
+    values[:, 6] = ~(is_processed | is_stopped)
+    values[:, 7] = file_size.isnull()
+    values[:, 8] = file_size == 0
+    values[:, 9] = file_size > 0
+    values[:, 10] = filename_duplicated
+    return values
+
+
+def aggregate_hourly(df: pd.DataFrame) -> tuple:
+    """
+    Kernel de agregación en una sola pasada.
+
+    Factoriza (día, fuente) una vez, ordena los registros por celda (grupo, hora) y suma
+    todas las métricas de golpe con `np.add.reduceat`, llenando un arreglo denso
+    [grupo, 24, métrica].
+
+    Args:
+        df (pd.DataFrame): Registros con 'uploaded_at', 'source_id', 'filename', 'rows',
+                           'status', 'is_duplicated' y 'file_size'.
+
+    Returns:
+        tuple: (claves, cubo). `claves` es un DataFrame con 'uploaded_at_date' y 'source_id'
+               (ordenado como un groupby) y `cubo` un np.ndarray [grupos, 24, len(METRICS)].
+    """
+    nanoseconds = _utc_nanoseconds(df['uploaded_at'])
+    days = nanoseconds // _NS_PER_DAY
+    hours = (nanoseconds // _NS_PER_HOUR) % 24
+
+    day_codes, day_uniques = pd.factorize(days, sort=True)
+    source_codes, source_uniques = pd.factorize(df['source_id'].to_numpy(), sort=True)
+    pair_codes = day_codes.astype(np.int64) * max(len(source_uniques), 1) + source_codes
+    group_pairs, group_codes = np.unique(pair_codes, return_inverse=True)
+
+    cells = group_codes.astype(np.int64) * 24 + hours
+    order = np.argsort(cells, kind='stable')
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]]) if len(cells) else np.empty(0, dtype=np.int64)
+
+    cube = np.zeros((len(group_pairs) * 24, len(METRICS)), dtype=np.float64)
+    if len(starts):
+        cube[sorted_cells[starts]] = np.add.reduceat(_metric_matrix(df)[order], starts, axis=0)
+    cube = cube.reshape(len(group_pairs), 24, len(METRICS))
+
+    n_sources = max(len(source_uniques), 1)
+    keys = pd.DataFrame({
+        'uploaded_at_date': day_uniques[group_pairs // n_sources].astype('datetime64[D]').astype(object),
+        'source_id': source_uniques[group_pairs % n_sources],
+    })
+    return keys, cube
+
+
+def _cast(values: np.ndarray, metric: str, rows_dtype) -> np.ndarray:
+    if metric == 'sum_file_size':
+        return values
+    if metric == 'sum_rows' and not pd.api.types.is_integer_dtype(rows_dtype):
+        return values
+    return values.astype(np.int64)
+
+
+def summarize_hourly(df: pd.DataFrame, output: str = 'wide') -> pd.DataFrame:
+    """
+    Agrega registros por (día, fuente) y hora de subida con el kernel de una sola pasada.
+
+    Args:
+        df (pd.DataFrame): Registros de archivos sin duplicados exactos.
+        output (str): 'wide' devuelve el esquema de `create_historical_summary`
+                      (totales + columnas total_files_hXX / sum_filesize_hXX / sum_rows_hXX
+                      para las horas presentes). 'long' devuelve una fila por
+                      (uploaded_at_date, source_id, upload_hour) con datos, con todas las métricas.
+
+    Returns:
+        pd.DataFrame: El resumen en el formato pedido.
+    """
+    if output not in ('wide', 'long'):
+        raise ValueError(f"Formato de salida no soportado: '{output}'. Usa 'wide' o 'long'.")
+
+    rows_dtype = df['rows'].dtype
+    keys, cube = aggregate_hourly(df)
+
+    if output == 'long':
+        group_index, hour_index = np.nonzero(cube[:, :, 0])
+        df_long = keys.iloc[group_index].reset_index(drop=True)
+        df_long['upload_hour'] = hour_index.astype(np.int32)
+        for position, metric in enumerate(METRICS):
+            df_long[metric] = _cast(cube[group_index, hour_index, position], metric, rows_dtype)
+        return df_long
+
+    totals = cube.sum(axis=1)
+    df_wide = keys.copy()
+    for metric in SUMMARY_BASE_COLUMNS:
+        df_wide[metric] = _cast(totals[:, METRICS.index(metric)], metric, rows_dtype)
+
+    present_hours = np.flatnonzero(cube[:, :, 0].any(axis=0))  # igual que las columnas de un pivot_table
+    hourly_columns = {}
+    for metric in HOURLY_METRICS:
+        position = METRICS.index(metric)
+        for hour in present_hours:
+            hourly_columns[f"{HOURLY_PREFIXES[metric]}{hour}"] = _cast(cube[:, hour, position], metric, rows_dtype)
+    return pd.concat([df_wide, pd.DataFrame(hourly_columns, index=df_wide.index)], axis=1)
@@ -0,0 +1,407 @@
+# src/preparation/baselines.py
+
+import os
+import copy
+import json
+import bisect
+import hashlib
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from .cv_profiles import WEEKDAYS, CVProfileStore
+
+# Carpeta por defecto de las líneas base persistidas
+DEFAULT_BASELINES_DIR = os.path.join('outputs', 'cache', 'baselines')
+BASELINES_FILENAME = 'baselines.json'
+
+# Versión del formato en disco; cambiarla descarta las líneas base guardadas
+BASELINES_FORMAT_VERSION = 1
+
+# Observaciones (días) que se conservan por fuente y día de la semana: 8 semanas
+DEFAULT_WINDOW_DAYS = 8
+
+# Ventanas de observaciones que se conservan por fuente y día de la semana (la activa y las
+# anteriores), para armar la línea base de días anteriores a los ya absorbidos
+RETAINED_WINDOWS = 2
+
+# Días observados mínimos para que una línea base reemplace o complete al CV
+DEFAULT_MIN_DAYS = 3
+
+# Métricas por (fuente, día de la semana). Las dos primeras se observan una vez por día;
+# 'rows_per_file' y 'upload_hour' acumulan todos los archivos del día.
+METRICS = ['files_per_day', 'empty_files', 'rows_per_file', 'upload_hour']
+
+BASELINE_MODES = ('fallback', 'override')
+
+_NS_PER_HOUR = 3_600_000_000_000
+
+
+class RunningStats:
+    """
+    Estadísticas de Welford (count, media, M2, mínimo, máximo) que admiten sumar y restar
+    bloques completos en O(1) con la fórmula de Chan. Restar permite una ventana móvil
+    sin recorrer la historia; el mínimo y el máximo los recalcula quien mantiene la ventana.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, low: float | None = None,
+                 high: float | None = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = low
+        self.max = high
+
+    def add(self, count: int, mean: float, m2: float, low: float, high: float):
+        """Incorpora un bloque ya resumido (p. ej. los archivos de un día)."""
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def remove(self, count: int, mean: float, m2: float):
+        """Quita un bloque incorporado antes (inversa de `add`; el mínimo y el máximo no se tocan)."""
+        remaining = self.count - count
+        if remaining <= 0:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        rest_mean = (self.mean * self.count - mean * count) / remaining
+        delta = mean - rest_mean
+        self.m2 = max(self.m2 - m2 - delta * delta * remaining * count / self.count, 0.0)
+        self.mean = rest_mean
+        self.count = remaining
+
+    def push(self, value: float):
+        self.add(1, value, 0.0, value, value)
+
+    @property
+    def variance(self) -> float | None:
+        """Varianza muestral (None con menos de dos observaciones)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stdev(self) -> float | None:
+        variance = self.variance
+        return float(np.sqrt(variance)) if variance is not None else None
+
+    def to_list(self) -> list:
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+
+class WeekdayBaseline:
+    """
+    Línea base de una fuente para un día de la semana: las estadísticas acumuladas por
+    métrica de las últimas `window_days` observaciones diarias.
+
+    Cada observación guarda, por métrica, el bloque (count, media, M2, mín, máx) del día;
+    al entrar un día nuevo se suma su bloque y se resta el del día que sale de la ventana:
+    O(1) por día, sin releer la historia. Se conservan `RETAINED_WINDOWS` ventanas de
+    observaciones para poder armar la línea base de un día anterior a las últimas absorbidas
+    (re-ejecuciones y backfills).
+    """
+
+    __slots__ = ('window', 'stats')
+
+    def __init__(self):
+        self.window = []   # [(fecha 'YYYY-MM-DD', {métrica: [count, media, M2, mín, máx]})], ordenada por fecha
+        self.stats = {metric: RunningStats() for metric in METRICS}   # de las últimas `window_days`
+
+    @property
+    def days(self) -> int:
+        return len(self.window)
+
+    def observe(self, date_str: str, blocks: dict, window_days: int) -> bool:
+        """
+        Agrega la observación de un día. Un día ya presente o más antiguo que todas las
+        observaciones conservadas se ignora.
+
+        Returns:
+            bool: True si la observación entró a las conservadas.
+        """
+        dates = [entry[0] for entry in self.window]
+        retained = window_days * RETAINED_WINDOWS
+        if date_str in dates or (len(dates) >= retained and date_str < dates[0]):
+            return False
+        position = bisect.bisect(dates, date_str)
+        self.window.insert(position, (date_str, blocks))
+        # Primera observación de la ventana activa; un día más antiguo que ella no cambia las estadísticas
+        active = len(self.window) - window_days
+        if position >= active:
+            for metric, block in blocks.items():
+                self.stats[metric].add(*block)
+            if active > 0:
+                _, evicted = self.window[active - 1]
+                for metric, block in evicted.items():
+                    stats = self.stats[metric]
+                    stats.remove(*block[:3])
+                    if block[3] == stats.min or block[4] == stats.max:
+                        # La ventana está acotada: recalcular los extremos no depende del largo de la historia
+                        entries = [entry[1][metric] for entry in self.window[active:] if metric in entry[1]]
+                        stats.min = min((entry[3] for entry in entries), default=None)
+                        stats.max = max((entry[4] for entry in entries), default=None)
+        del self.window[:max(len(self.window) - retained, 0)]
+        return True
+
+    def stats_before(self, before: str | None, window_days: int) -> tuple:
+        """
+        (días, {métrica: RunningStats}) de las últimas `window_days` observaciones anteriores a
+        `before` ('YYYY-MM-DD'). Si todas las conservadas son anteriores, son las acumuladas.
+        """
+        if before is None or not self.window or self.window[-1][0] < before:
+            return min(self.days, window_days), self.stats
+        previous = self.window[:bisect.bisect_left([entry[0] for entry in self.window], before)][-window_days:]
+        stats = {metric: RunningStats() for metric in METRICS}
+        for _, blocks in previous:
+            for metric, block in blocks.items():
+                stats[metric].add(*block)
+        return len(previous), stats
+
+    def to_dict(self) -> dict:
+        return {'window': self.window, 'stats': {metric: stats.to_list() for metric, stats in self.stats.items()}}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> 'WeekdayBaseline':
+        baseline = cls()
+        baseline.window = [(date_str, blocks) for date_str, blocks in state['window']]
+        baseline.stats = {metric: RunningStats(*values) for metric, values in state['stats'].items()}
+        return baseline
+
+
+def daily_blocks(df_files: pd.DataFrame, source_ids=()) -> dict:
+    """
+    Resume los archivos de un día por fuente en bloques (count, media, M2, mín, máx).
+
+    Las fuentes de `source_ids` sin archivos ese día también cuentan: observan 0 archivos
+    y 0 vacíos (sin bloques de filas ni de hora de subida).
+
+    Returns:
+        dict: {source_id: {métrica: [count, media, M2, mín, máx]}}.
+    """
+    blocks = {str(source_id): {'files_per_day': [1, 0.0, 0.0, 0.0, 0.0], 'empty_files': [1, 0.0, 0.0, 0.0, 0.0]}
+              for source_id in source_ids}
+    if df_files is None or df_files.empty:
+        return blocks
+
+    uploaded_at = pd.to_datetime(df_files['uploaded_at'], utc=True).dt.tz_localize(None)
+    nanoseconds = uploaded_at.to_numpy(dtype='datetime64[ns]').view('int64')
+    rows = pd.to_numeric(df_files['rows'], errors='coerce').to_numpy(dtype=np.float64)
+    df = pd.DataFrame({
+        'source_id': df_files['source_id'].astype(str).to_numpy(),
+        'rows': rows,
+        'empty': rows == 0,
+        'upload_hour': (nanoseconds % (24 * _NS_PER_HOUR)) / _NS_PER_HOUR,
+    })
+    grouped = df.groupby('source_id', sort=False)
+    files = grouped.size()
+    columns = [files.index.tolist(), files.to_numpy(dtype=np.float64).tolist(),
+               grouped['empty'].sum().to_numpy(dtype=np.float64).tolist()]
+    for metric in ('rows', 'upload_hour'):
+        column = grouped[metric]
+        count = column.count().to_numpy()
+        # Se extraen listas de Python una vez: indexar el resultado del groupby por fuente es lento
+        columns += [count.tolist(), column.mean().tolist(), (column.var(ddof=0).to_numpy() * count).tolist(),
+                    column.min().tolist(), column.max().tolist()]
+
+    for source_id, n_files, n_empty, *per_file in zip(*columns):
+        source_blocks = {'files_per_day': [1, n_files, 0.0, n_files, n_files],
+                         'empty_files': [1, n_empty, 0.0, n_empty, n_empty]}
+        for name, block in (('rows_per_file', per_file[:5]), ('upload_hour', per_file[5:])):
+            if block[0] > 0:
+                source_blocks[name] = block
+        blocks[source_id] = source_blocks
+    return blocks
+
+
+class BaselineStore:
+    """
+    Líneas base por fuente y día de la semana, persistidas en disco y actualizadas por día.
+
+    Reemplazan (o completan) los umbrales extraídos de los CVs por estadísticas observadas:
+    archivos por día, archivos vacíos por día, filas por archivo y hora de subida (UTC).
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_BASELINES_DIR, window_days: int = DEFAULT_WINDOW_DAYS):
+        self.store_dir = store_dir
+        self.window_days = window_days
+        self.absorbed = []
+        self.sources = {}   # {source_id: [WeekdayBaseline o None] * 7}
+
+    def _path(self) -> str:
+        return os.path.join(self.store_dir, BASELINES_FILENAME)
+
+    def load(self) -> 'BaselineStore':
+        """Carga el estado persistido; si no existe, es de otra versión o de otra ventana, queda vacío."""
+        try:
+            with open(self._path(), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self
+        if state.get('version') != BASELINES_FORMAT_VERSION or state.get('window_days') != self.window_days:
+            print("-> [BASELINES] El formato o la ventana de las líneas base cambió. Se reconstruirán desde cero.")
+            return self
+        self.absorbed = state['absorbed']
+        self.sources = {source_id: [WeekdayBaseline.from_dict(item) if item is not None else None for item in weekdays]
+                        for source_id, weekdays in state['sources'].items()}
+        return self
+
+    def save(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        state = {
+            'version': BASELINES_FORMAT_VERSION, 'window_days': self.window_days, 'absorbed': self.absorbed,
+            'sources': {source_id: [item.to_dict() if item is not None else None for item in weekdays]
+                        for source_id, weekdays in self.sources.items()},
+        }
+        tmp_path = f"{self._path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(state))
+        os.replace(tmp_path, self._path())
+
+    def get(self, source_id, weekday: int) -> WeekdayBaseline | None:
+        weekdays = self.sources.get(str(source_id))
+        return weekdays[weekday] if weekdays is not None else None
+
+    def absorb_day(self, operation_date_str: str, df_files: pd.DataFrame, source_ids=()) -> int:
+        """
+        Incorpora los archivos de un día de operación. Un día ya absorbido se ignora.
+
+        Args:
+            operation_date_str (str): Fecha 'YYYY-MM-DD' de los archivos.
+            df_files (pd.DataFrame): Archivos subidos ese día (como los de la detección).
+            source_ids: Fuentes esperadas; las que no enviaron nada observan 0 archivos.
+
+        Returns:
+            int: Número de fuentes cuya ventana recibió la observación.
+        """
+        if operation_date_str in self.absorbed:
+            return 0
+        weekday = datetime.strptime(operation_date_str, '%Y-%m-%d').weekday()
+        updated = 0
+        for source_id, blocks in daily_blocks(df_files, source_ids).items():
+            weekdays = self.sources.setdefault(source_id, [None] * len(WEEKDAYS))
+            if weekdays[weekday] is None:
+                weekdays[weekday] = WeekdayBaseline()
+            updated += weekdays[weekday].observe(operation_date_str, blocks, self.window_days)
+        bisect.insort(self.absorbed, operation_date_str)
+        return updated
+
+    def seed_from_history(self, df_history: pd.DataFrame, source_ids=(), before: str | None = None) -> int:
+        """
+        Siembra las líneas base con archivos históricos: los agrupa por día de subida (UTC)
+        y absorbe cada día con `absorb_day`, del más antiguo al más reciente. Solo se leen
+        los días que caben en la ventana; los más viejos saldrían de ella igual.
+
+        Args:
+            df_history (pd.DataFrame): Registros de archivos de varios días (p. ej. las snapshots
+                                       disponibles, sin duplicados exactos).
+            source_ids: Fuentes esperadas; las que no enviaron nada un día observan 0 archivos.
+            before (str): Fecha 'YYYY-MM-DD' exclusiva; solo se siembran los días anteriores
+                          (el día que se va a detectar no cuenta para su propio umbral).
+
+        Returns:
+            int: Número de días absorbidos.
+        """
+        if df_history is None or df_history.empty:
+            return 0
+        upload_day = pd.to_datetime(df_history['uploaded_at'], utc=True).dt.strftime('%Y-%m-%d')
+        dates = sorted(date_str for date_str in upload_day.unique() if before is None or date_str < before)
+        if not dates:
+            return 0
+        # Cada día de la semana guarda `window_days` observaciones: `window_days` semanas hacia atrás
+        first = (datetime.strptime(dates[-1], '%Y-%m-%d') - timedelta(weeks=self.window_days - 1, days=6))
+        dates = {date_str for date_str in dates if date_str >= first.strftime('%Y-%m-%d')}
+        absorbed = 0
+        for date_str, df_day in df_history.groupby(upload_day.to_numpy(), sort=True):
+            if date_str in dates and date_str not in self.absorbed:
+                self.absorb_day(date_str, df_day, source_ids)
+                absorbed += 1
+        return absorbed
+
+
+def _format_clock(hour: float) -> str:
+    seconds = min(int(round(hour * 3600)), 24 * 3600 - 1)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def apply_baselines(profiles: CVProfileStore, store: BaselineStore, mode: str = 'fallback',
+                    min_days: int = DEFAULT_MIN_DAYS, before: str | None = None) -> CVProfileStore:
+    """
+    Devuelve un store de perfiles cuyos umbrales salen de las líneas base observadas.
+
+    Con 'fallback' solo se completan los valores que el CV no trae; con 'override' las
+    líneas base con al menos `min_days` días observados reemplazan a los del CV. Como los
+    detectores leen los umbrales del perfil, no necesitan cambios ni recorrer la historia:
+        - mean_files / empty_files_mean / rows_mean del día <- media de la línea base;
+        - stdev_rows / mean_rows <- filas por archivo de todos los días de la semana juntos;
+        - ventana de subida <- mínimo y máximo de la hora de subida observada.
+
+    Args:
+        profiles (CVProfileStore): CVs compilados.
+        store (BaselineStore): Líneas base cargadas.
+        mode (str): 'fallback' u 'override'.
+        min_days (int): Días observados mínimos para usar una línea base.
+        before (str): Fecha de operación 'YYYY-MM-DD': solo cuentan los días observados
+                      anteriores a ella, así el día (o un backfill sobre días ya absorbidos)
+                      no entra en su propio umbral y re-ejecutarlo da el mismo reporte.
+
+    Returns:
+        CVProfileStore: Nuevos perfiles (los originales no se modifican); cada perfil
+                        modificado recibe un digest nuevo.
+    """
+    if mode not in BASELINE_MODES:
+        raise ValueError(f"Modo de líneas base no soportado: '{mode}'. Usa {BASELINE_MODES}.")
+
+    def choose(current, value):
+        if value is None:
+            return current
+        return value if mode == 'override' or current is None else current
+
+    adjusted = {}
+    filled = 0
+    for source_id, profile in profiles.profiles.items():
+        weekdays = []
+        for baseline in store.sources.get(source_id, [None] * len(WEEKDAYS)):
+            days, stats = baseline.stats_before(before, store.window_days) if baseline is not None else (0, None)
+            weekdays.append(stats if days >= min_days else None)
+        if not any(weekdays):
+            adjusted[source_id] = profile
+            continue
+        new = copy.copy(profile)
+        for field in ('rows_mean', 'empty_files_mean', 'mean_files', 'upload_window', 'window_start_s', 'window_end_s'):
+            setattr(new, field, list(getattr(profile, field)))
+
+        pooled = RunningStats()
+        for weekday, stats in enumerate(weekdays):
+            if stats is None:
+                continue
+            new.mean_files[weekday] = choose(profile.mean_files[weekday], stats['files_per_day'].mean)
+            new.empty_files_mean[weekday] = choose(profile.empty_files_mean[weekday], stats['empty_files'].mean)
+            rows = stats['rows_per_file']
+            if rows.count:
+                new.rows_mean[weekday] = choose(profile.rows_mean[weekday], rows.mean)
+                pooled.add(*rows.to_list())
+            hours = stats['upload_hour']
+            if hours.count and (mode == 'override' or profile.window_end_s[weekday] is None):
+                new.upload_window[weekday] = f"{_format_clock(hours.min)}–{_format_clock(hours.max)} UTC"
+                new.window_start_s[weekday] = int(round(hours.min * 3600))
+                new.window_end_s[weekday] = int(round(hours.max * 3600))
+        if pooled.count:
+            new.mean_rows = choose(profile.mean_rows, pooled.mean)
+            new.stdev_rows = choose(profile.stdev_rows, pooled.stdev)
+
+        # El digest cambia con los umbrales efectivos (lo usa la caché de detección incremental)
+        effective = [getattr(new, field) for field in ('rows_mean', 'empty_files_mean', 'mean_files', 'window_start_s',
+                                                        'window_end_s', 'mean_rows', 'stdev_rows')]
+        new.digest = hashlib.sha256(f"{profile.digest}|{mode}|{json.dumps(effective)}".encode('utf-8')).hexdigest()
+        adjusted[source_id] = new
+        filled += 1
+
+    print(f"-> [BASELINES] Modo '{mode}': {filled} de {len(profiles)} fuentes con umbrales de líneas base "
+          f"(mínimo {min_days} días observados).")
+    return CVProfileStore(adjusted, list(profiles.source_order))
@@ -0,0 +1,277 @@
+# src/preparation/cv_profiles.py
+
+import os
+import json
+import pickle
+import hashlib
+import numbers
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from .snapshot_cache import snapshot_fingerprint
+
+# Ruta por defecto de los CVs y de su forma compilada (se guarda al lado del JSON)
+DEFAULT_CV_DATA_PATH = os.path.join('outputs', 'cv_data.json')
+COMPILED_SUFFIX = '.profiles.pkl'
+
+# Versión del formato compilado; cambiarla fuerza la recompilación
+PROFILES_FORMAT_VERSION = 3
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+WEEKDAY_INDEX = {day: index for index, day in enumerate(WEEKDAYS)}
+
+# Columnas de la tabla NumPy [fuentes, 7 días, campos] (NaN = dato ausente)
+WEEKDAY_FIELDS = ['rows_mean', 'empty_files_mean', 'mean_files', 'window_start_s', 'window_end_s', 'rows_low', 'rows_high']
+GENERAL_FIELDS = ['mean_rows', 'median_rows', 'stdev_rows', 'pct_empty_files']
+
+
+def _parse_clock(value: str):
+    """'HH:MM:SS' -> segundos desde la medianoche, o None si no tiene ese formato."""
+    try:
+        parsed = datetime.strptime(value, '%H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def parse_upload_window(window_str: str) -> tuple:
+    """
+    Pre-parsea una ventana "08:00:00–09:00:00 UTC" a segundos desde la medianoche.
+
+    Returns:
+        tuple: (inicio, fin); cualquiera de los dos es None si no se pudo interpretar.
+    """
+    if not window_str:
+        return None, None
+    parts = window_str.split('–')
+    start = _parse_clock(parts[0].replace(' UTC', ''))
+    end = _parse_clock(parts[1].replace(' UTC', '')) if len(parts) > 1 else None
+    return start, end
+
+
+class SourceProfile:
+    """
+    CV compilado de una fuente: valores validados y tipados, indexados por día de la semana
+    (0 = Mon ... 6 = Sun). `raw` conserva el CV original para el contexto del recomendador y
+    `digest` es el SHA-256 de ese CV, calculado una sola vez al compilar. `rows_low` / `rows_high`
+    son la banda de filas por archivo (p. ej. p01-p99 de los sketches de cuantiles); el CV no
+    la trae, así que queda en None salvo que se complete aparte.
+    """
+
+    __slots__ = ('source_id', 'raw', 'digest', 'rows_mean', 'empty_files_mean', 'mean_files', 'upload_window',
+                 'window_start_s', 'window_end_s', 'rows_low', 'rows_high', 'mean_rows', 'median_rows', 'stdev_rows',
+                 'pct_empty_files')
+
+    def __init__(self, source_id: str, raw: dict):
+        self.source_id = source_id
+        self.raw = raw
+        self.digest = hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        for field in ('rows_mean', 'empty_files_mean', 'mean_files', 'upload_window', 'window_start_s', 'window_end_s',
+                      'rows_low', 'rows_high'):
+            setattr(self, field, [None] * len(WEEKDAYS))
+        self.mean_rows = self.median_rows = self.stdev_rows = self.pct_empty_files = None
+
+    def __getstate__(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __setstate__(self, state):
+        for field, value in state.items():
+            setattr(self, field, value)
+
+    def deadline(self, weekday: int, operation_date) -> datetime | None:
+        """Cierre de la ventana esperada del día + 4 horas de margen (None si no hay ventana)."""
+        end_s = self.window_end_s[weekday]
+        if end_s is None:
+            return None
+        return datetime.combine(operation_date, datetime.min.time()) + timedelta(seconds=end_s, hours=4)
+
+    def rows_band(self, weekday: int) -> tuple | None:
+        """(mínimo, máximo) esperados de filas por archivo para el día, o None si no hay banda."""
+        low, high = self.rows_low[weekday], self.rows_high[weekday]
+        return None if low is None or high is None else (low, high)
+
+    def window_end_label(self, weekday: int) -> str:
+        end_s = self.window_end_s[weekday]
+        return f"{end_s // 3600:02d}:{end_s % 3600 // 60:02d}"
+
+
+class CVProfileStore:
+    """
+    Perfiles compilados de todas las fuentes.
+
+    `source_order` conserva el orden (y las repeticiones) de 'cv_data.json', que es el orden en
+    que se analizan las fuentes; `profiles` indexa por source_id (si se repite, gana el primero).
+    """
+
+    def __init__(self, profiles: dict, source_order: list):
+        self.profiles = profiles
+        self.source_order = source_order
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def __contains__(self, source_id) -> bool:
+        return str(source_id) in self.profiles
+
+    def get(self, source_id) -> SourceProfile | None:
+        return self.profiles.get(str(source_id))
+
+    def subset(self, source_ids) -> 'CVProfileStore':
+        """Store con solo las fuentes indicadas, conservando el orden (y las repeticiones) original."""
+        keep = {str(source_id) for source_id in source_ids}
+        return CVProfileStore({source_id: profile for source_id, profile in self.profiles.items() if source_id in keep},
+                              [source_id for source_id in self.source_order if source_id in keep])
+
+    def raw_cv(self, source_id) -> dict:
+        """CV original de la fuente ({} si no existe), tal como lo usa el contexto del recomendador."""
+        profile = self.get(source_id)
+        return profile.raw if profile is not None else {}
+
+    def weekday_table(self, weekday: int) -> pd.DataFrame:
+        """
+        Tabla de un día de la semana: una fila por fuente (indexada por source_id) con los campos
+        de WEEKDAY_FIELDS y GENERAL_FIELDS como float64 (NaN = ausente).
+        """
+        values = np.full((len(self.profiles), len(WEEKDAY_FIELDS) + len(GENERAL_FIELDS)), np.nan)
+        for row, profile in enumerate(self.profiles.values()):
+            for column, field in enumerate(WEEKDAY_FIELDS):
+                value = getattr(profile, field)[weekday]
+                if value is not None:
+                    values[row, column] = value
+            for column, field in enumerate(GENERAL_FIELDS, start=len(WEEKDAY_FIELDS)):
+                value = getattr(profile, field)
+                if value is not None:
+                    values[row, column] = value
+        return pd.DataFrame(values, index=pd.Index(list(self.profiles), name='source_id'),
+                            columns=WEEKDAY_FIELDS + GENERAL_FIELDS)
+
+
+def _number(value, source_id: str, label: str, warnings: list):
+    if value is None:
+        return None
+    if isinstance(value, numbers.Real) and not isinstance(value, bool) and not np.isnan(value):
+        return value
+    warnings.append(f"Fuente {source_id}: '{label}' no es numérico ({value!r}). Se ignora.")
+    return None
+
+
+def _weekday_entries(source_cv_info: dict, key: str, source_id: str, warnings: list):
+    """Recorre la lista de estadísticas por día; si un día se repite, gana la primera entrada."""
+    seen = set()
+    for entry in source_cv_info.get(key) or []:
+        if not isinstance(entry, dict):
+            warnings.append(f"Fuente {source_id}: entrada inválida en '{key}'. Se ignora.")
+            continue
+        weekday = WEEKDAY_INDEX.get(entry.get('day'))
+        if weekday is None:
+            warnings.append(f"Fuente {source_id}: día '{entry.get('day')}' desconocido en '{key}'. Se ignora.")
+            continue
+        if weekday not in seen:
+            seen.add(weekday)
+            yield weekday, entry
+
+
+def compile_source_profile(source_cv_info: dict, warnings: list | None = None) -> SourceProfile:
+    """
+    Compila el CV de una fuente (un elemento de 'cv_data.json') a un SourceProfile.
+
+    Args:
+        source_cv_info (dict): CV de la fuente.
+        warnings (list): Si se pasa, acumula los problemas de validación encontrados.
+
+    Returns:
+        SourceProfile: Perfil con los valores por día ya resueltos.
+    """
+    warnings = [] if warnings is None else warnings
+    source_id = str(source_cv_info.get('source_id'))
+    profile = SourceProfile(source_id, source_cv_info)
+
+    for weekday, entry in _weekday_entries(source_cv_info, 'day_of_week_row_stats', source_id, warnings):
+        profile.rows_mean[weekday] = _number(entry.get('rows_mean'), source_id, 'rows_mean', warnings)
+        profile.empty_files_mean[weekday] = _number(entry.get('empty_files_mean'), source_id, 'empty_files_mean', warnings)
+    for weekday, entry in _weekday_entries(source_cv_info, 'file_processing_daily_stats', source_id, warnings):
+        profile.mean_files[weekday] = _number(entry.get('mean_files'), source_id, 'mean_files', warnings)
+    for weekday, entry in _weekday_entries(source_cv_info, 'upload_schedule_daily_stats', source_id, warnings):
+        window_str = entry.get('upload_window_expected_utc')
+        if not window_str:
+            continue
+        start_s, end_s = parse_upload_window(window_str)
+        if end_s is None:
+            warnings.append(f"Fuente {source_id}: ventana de subida '{window_str}' no reconocida. Se ignora.")
+        profile.upload_window[weekday] = window_str
+        profile.window_start_s[weekday] = start_s
+        profile.window_end_s[weekday] = end_s
+
+    general_stats = source_cv_info.get('general_volume_stats') or {}
+    for field in GENERAL_FIELDS:
+        setattr(profile, field, _number(general_stats.get(field), source_id, field, warnings))
+    return profile
+
+
+def compile_cv_profiles(cv_data: list) -> tuple:
+    """
+    Compila la lista completa de CVs.
+
+    Returns:
+        tuple: (CVProfileStore, lista de advertencias de validación).
+    """
+    warnings = []
+    profiles = {}
+    source_order = []
+    for source_cv_info in cv_data:
+        if not isinstance(source_cv_info, dict):
+            warnings.append(f"Se encontró un CV que no es un objeto JSON ({type(source_cv_info).__name__}). Se ignora.")
+            continue
+        if source_cv_info.get('source_id') is None:
+            warnings.append("Se encontró un CV sin 'source_id'.")
+        source_id = str(source_cv_info.get('source_id'))
+        source_order.append(source_id)
+        if source_id not in profiles:
+            profiles[source_id] = compile_source_profile(source_cv_info, warnings)
+    return CVProfileStore(profiles, source_order), warnings
+
+
+def load_cv_profiles(cv_data_path: str = DEFAULT_CV_DATA_PATH, compiled_path: str | None = None) -> CVProfileStore:
+    """
+    Carga los perfiles compilados de 'cv_data.json'.
+
+    La forma compilada se guarda al lado del JSON ('cv_data.profiles.pkl') junto con la huella
+    del JSON; solo se recompila cuando el JSON cambia (o cambia PROFILES_FORMAT_VERSION).
+
+    Args:
+        cv_data_path (str): Ruta de 'cv_data.json'.
+        compiled_path (str): Ruta de la forma compilada; por defecto, al lado del JSON.
+
+    Returns:
+        CVProfileStore: Los perfiles de todas las fuentes.
+
+    Raises:
+        FileNotFoundError: Si 'cv_data.json' no existe.
+    """
+    compiled_path = compiled_path or os.path.splitext(cv_data_path)[0] + COMPILED_SUFFIX
+    previous = None
+    try:
+        with open(compiled_path, 'rb') as f:
+            compiled = pickle.load(f)
+        if compiled.get('version') == PROFILES_FORMAT_VERSION:
+            previous = compiled
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError):
+        pass
+
+    fingerprint = snapshot_fingerprint(cv_data_path, previous=previous['fingerprint'] if previous else None)
+    if previous is not None and previous['fingerprint']['sha256'] == fingerprint['sha256']:
+        return previous['store']
+
+    with open(cv_data_path, 'r') as f:
+        cv_data = json.load(f)
+    store, warnings = compile_cv_profiles(cv_data)
+    for warning in warnings:
+        print(f"!! ADVERTENCIA: {warning}")
+
+    tmp_path = f"{compiled_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': PROFILES_FORMAT_VERSION, 'fingerprint': fingerprint, 'store': store}, f)
+    os.replace(tmp_path, compiled_path)
+    print(f"✓ CVs compilados: {len(store)} perfiles guardados en '{compiled_path}'.")
+    return store
@@ -1,17 +1,134 @@
 # src/preparation/data_loader.py
 
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
 import json
+from concurrent.futures import ProcessPoolExecutor
 
-def load_and_filter_daily_files(execution_date_str: str, base_data_path: str = 'data') -> pd.DataFrame:
+from .json_stream import read_files_json_columnar
+from .snapshot_cache import DEFAULT_CACHE_DIR, load_snapshot_columns
+from .aggregation import summarize_hourly
+from .schema import concat_file_records
+
+def _utc_iso_key(uploaded_at: str) -> str:
+    """
+    Normaliza un 'uploaded_at' ISO a un texto comparable lexicográficamente en UTC
+    (sin sufijo de zona). Los valores ya en UTC solo se recortan, sin parsear.
+    """
+    if uploaded_at.endswith('+00:00'):
+        return uploaded_at[:-6]
+    if uploaded_at.endswith('Z'):
+        return uploaded_at[:-1]
+    parsed = datetime.fromisoformat(uploaded_at)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+class _UploadPredicate:
+    """
+    Filtro por registro aplicado antes de construir el DataFrame: rango de subida
+    [inicio, fin) comparado sobre el prefijo ISO y, opcionalmente, la marca de agua
+    por fuente de la última snapshot. Registra la subida más reciente aceptada por fuente.
+    """
+
+    def __init__(self, upload_range: tuple, watermark: dict | None = None):
+        self.start = _utc_iso_key(upload_range[0]) if upload_range[0] else None
+        self.end = _utc_iso_key(upload_range[1]) if upload_range[1] else None
+        self.watermark = watermark
+        self.latest = {}
+
+    def __call__(self, source_id: str, uploaded_at: str | None) -> bool:
+        if not uploaded_at:
+            return False
+        key = _utc_iso_key(uploaded_at)
+        if self.start is not None and key < self.start:
+            return False
+        if self.end is not None and key >= self.end:
+            return False
+        if self.watermark is not None and key <= self.watermark.get(source_id, ''):
+            return False
+        if key > self.latest.get(source_id, ''):
+            self.latest[source_id] = key
+        return True
+
+    def filter_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Aplica el mismo filtro de forma vectorizada sobre registros ya tipados (caché columnar)."""
+        uploaded_at = df['uploaded_at']
+        mask = pd.Series(True, index=df.index)
+        if self.start is not None:
+            mask &= uploaded_at >= pd.Timestamp(self.start, tz='UTC')
+        if self.end is not None:
+            mask &= uploaded_at < pd.Timestamp(self.end, tz='UTC')
+        if self.watermark:
+            source_watermark = df['source_id'].map({k: pd.Timestamp(v, tz='UTC') for k, v in self.watermark.items()})
+            mask &= ~(uploaded_at <= source_watermark)
+        df = df[mask].reset_index(drop=True)
+        # Mismas categorías que si el filtro se hubiera aplicado al construir el DataFrame
+        for column in df.select_dtypes('category').columns:
+            df[column] = df[column].cat.remove_unused_categories()
+        for source_id, latest in df.groupby('source_id', observed=True)['uploaded_at'].max().items():
+            key = latest.tz_convert(None).isoformat()
+            if key > self.latest.get(source_id, ''):
+                self.latest[source_id] = key
+        return df
+
+
+def load_snapshot_watermark(watermark_path: str) -> dict:
+    """
+    Carga la marca de agua por fuente ({source_id: último 'uploaded_at' visto, UTC}).
+    Retorna un diccionario vacío si el archivo aún no existe.
+    """
+    try:
+        with open(watermark_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        print(f"!! ADVERTENCIA: La marca de agua '{watermark_path}' no es un JSON válido. Se ignora.")
+        return {}
+
+
+def save_snapshot_watermark(watermark_path: str, watermark: dict):
+    """Guarda la marca de agua de forma atómica (escritura a temporal + rename)."""
+    os.makedirs(os.path.dirname(watermark_path) or '.', exist_ok=True)
+    tmp_path = f"{watermark_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(watermark, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, watermark_path)
+
+
+def load_and_filter_daily_files(execution_date_str: str, base_data_path: str = 'data', streaming: bool = False,
+                                upload_range: tuple | None = None, watermark_path: str | None = None,
+                                use_cache: bool = False, cache_dir: str = DEFAULT_CACHE_DIR,
+                                compact: bool = True) -> pd.DataFrame:
     """
     Carga, transforma y filtra los archivos del día desde el files.json correspondiente.
 
+    El filtro por fecha de subida se aplica registro a registro comparando el prefijo
+    ISO de 'uploaded_at', antes de construir el DataFrame y de convertir fechas, de modo
+    que el costo posterior depende del volumen del día y no del tamaño de la ventana.
+
     Args:
         execution_date_str (str): La fecha de ejecución en formato 'YYYY-MM-DD'.
         base_data_path (str): La ruta a la carpeta principal de datos.
+        streaming (bool): Si es True, lee el JSON de forma incremental y construye el
+                          DataFrame desde buffers por columna, sin cargar todo el archivo
+                          ni la lista de diccionarios en memoria.
+        upload_range (tuple, opcional): Rango de subida (inicio, fin) en UTC, inicio inclusivo
+                                        y fin exclusivo, como 'YYYY-MM-DD' o ISO completo.
+                                        Cualquiera de los extremos puede ser None. Por defecto,
+                                        el día de ejecución completo.
+        watermark_path (str, opcional): Ruta a la marca de agua por fuente. Si se indica, solo
+                                        se devuelven registros posteriores a la última subida
+                                        vista para su fuente, y la marca se actualiza al final.
+        use_cache (bool): Si es True, lee la snapshot desde la caché columnar (Feather),
+                          generándola la primera vez. Tiene prioridad sobre `streaming`.
+        cache_dir (str): Carpeta de la caché columnar.
+        compact (bool): Si es True (por defecto), el DataFrame se construye con el esquema
+                        compacto de `schema.FILE_RECORD_SCHEMA` (categóricos, Int32 y boolean nullables).
+                        La caché columnar siempre guarda el esquema compacto.
 
     Returns:
         pd.DataFrame: Un DataFrame con los archivos subidos en la fecha de ejecución.
@@ -20,13 +137,28 @@ def load_and_filter_daily_files(execution_date_str: str, base_data_path: str = '
     """
     print(f"--- Iniciando carga de 'files.json' para la fecha: {execution_date_str} ---")
 
-    # 1. Construir la ruta al archivo
+    # 1. Construir la ruta al archivo y el filtro de subida
     file_path = os.path.join(base_data_path, f"{execution_date_str}_20_00_UTC", 'files.json')
 
-    # 2. Leer y parsear el archivo JSON
+    if upload_range is None:
+        next_day = datetime.strptime(execution_date_str, '%Y-%m-%d') + timedelta(days=1)
+        upload_range = (execution_date_str, next_day.strftime('%Y-%m-%d'))
+    watermark = load_snapshot_watermark(watermark_path) if watermark_path else None
+    predicate = _UploadPredicate(upload_range, watermark)
+
+    # 2. Leer el JSON y aplanarlo directamente en buffers por columna
+    # El JSON es un diccionario {source_id: [lista_de_archivos]}; cada registro recibe su
+    # source_id y los que quedan fuera del rango de subida se descartan aquí mismo.
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        if use_cache:
+            # Snapshot ya tipada en formato columnar: el filtro se aplica vectorizado
+            df = load_snapshot_columns(file_path, cache_dir=cache_dir)
+            total_records = len(df)
+            df = predicate.filter_frame(df)
+        else:
+            # Con streaming=True el archivo se lee por bloques, sin cargar el documento completo
+            df, total_records = read_files_json_columnar(file_path, predicate=predicate, streaming=streaming,
+                                                         compact=compact)
     except FileNotFoundError:
         print(f"!! ERROR: No se encontró el archivo: {file_path}")
         return pd.DataFrame() # Devolver un DataFrame vacío si el archivo no existe
@@ -34,45 +166,99 @@ def load_and_filter_daily_files(execution_date_str: str, base_data_path: str = '
         print(f"!! ERROR: El archivo {file_path} no es un JSON válido.")
         return pd.DataFrame()
 
-    # 3. Transformar la estructura de Diccionario a Lista (aplanamiento)
-    # El JSON es un diccionario {source_id: [lista_de_archivos]}. 
-    # Necesitamos convertirlo a una lista de diccionarios, añadiendo el source_id a cada uno.
-    all_files_list = []
-    for source_id, files in data.items():
-        for file_record in files:
-            file_record['source_id'] = source_id # Añadimos el ID de la fuente a cada registro
-            all_files_list.append(file_record)
-    
-    if not all_files_list:
+    if total_records == 0:
         print("-> El archivo JSON está vacío. No hay archivos para procesar.")
         return pd.DataFrame()
 
-    # 4. Convertir la lista a un DataFrame
-    df = pd.DataFrame(all_files_list)
-    print(f"✓ Se transformaron {len(df)} registros totales desde el JSON.")
+    print(f"✓ Se leyeron {total_records} registros totales desde el JSON.")
 
-    # 5. Filtrar el DataFrame por la fecha de ejecución
-    # Convertimos 'uploaded_at' a tipo datetime para poder comparar fechas
-    df['uploaded_at'] = pd.to_datetime(df['uploaded_at'])
-    
-    # Obtenemos la fecha de ejecución como un objeto 'date'
-    execution_date = datetime.strptime(execution_date_str, '%Y-%m-%d').date()
+    # 5. Convertimos 'uploaded_at' a datetime solo para los registros que pasaron el filtro
+    df['uploaded_at'] = pd.to_datetime(df['uploaded_at'], utc=True)
 
-    # Filtramos manteniendo solo las filas cuya fecha en 'uploaded_at' coincide
-    df_filtered = df[df['uploaded_at'].dt.date == execution_date].copy()
-    
-    print(f"✓ Se filtraron {len(df_filtered)} archivos que corresponden a la fecha {execution_date_str}.")
+    if watermark is not None:
+        watermark.update(predicate.latest)
+        save_snapshot_watermark(watermark_path, watermark)
+        print(f"✓ Marca de agua actualizada para {len(predicate.latest)} fuentes en '{watermark_path}'.")
+
+    print(f"✓ Se filtraron {len(df)} archivos que corresponden a la fecha {execution_date_str}.")
     print("--- Proceso de carga y filtrado finalizado. ---")
 
-    return df_filtered
+    return df
+
+def summarize_file_records(df_consolidated: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega registros de archivos (ya sin duplicados exactos) por día de subida y fuente:
+    totales por estado y tamaño, y conteos/sumas por hora de subida. Delegado en
+    `summarize_hourly`, que hace una sola pasada en lugar de un groupby y tres pivot_table.
+
+    Si el DataFrame ya trae la columna 'is_filename_duplicated_in_source' (p. ej. calculada
+    contra un histórico persistido), se respeta; si no, se calcula sobre el propio DataFrame.
+
+    Args:
+        df_consolidated (pd.DataFrame): Registros con las columnas de FILE_RECORD_COLUMNS.
+
+    Returns:
+        pd.DataFrame: Una fila por (uploaded_at_date, source_id) con las métricas agregadas.
+    """
+    print("Agregando métricas por día, fuente y hora (kernel de una pasada)...")
+    df_consolidated['uploaded_at'] = pd.to_datetime(df_consolidated['uploaded_at'])
+    return summarize_hourly(df_consolidated, output='wide')
+
+def _load_snapshot_chunk(task: tuple) -> tuple:
+    """
+    Tarea de un worker: parsea y aplana una snapshot en un bloque columnar tipado.
+    Los errores se devuelven (no se imprimen) para que el proceso padre los reporte en orden.
+    """
+    file_path, use_cache, cache_dir, compact = task
+    try:
+        if use_cache:
+            return file_path, load_snapshot_columns(file_path, cache_dir=cache_dir)
+        # Cada tarea tiene una sola snapshot en memoria: json.load es más rápido que el streaming
+        df, _ = read_files_json_columnar(file_path, streaming=False, compact=compact)
+        return file_path, df
+    except (json.JSONDecodeError, FileNotFoundError):
+        return file_path, None
+
+def load_snapshot_frames(file_paths: list, workers: int = 1, chunk_size: int = 1,
+                         use_cache: bool = False, cache_dir: str = DEFAULT_CACHE_DIR,
+                         compact: bool = True) -> list:
+    """
+    Carga varias snapshots como bloques columnares, en paralelo si `workers` > 1.
+
+    Args:
+        file_paths (list): Rutas de las snapshots, en el orden deseado.
+        workers (int): Número de procesos del pool. Con 1 se carga en serie.
+        chunk_size (int): Snapshots enviadas a cada worker por tarea.
+        use_cache (bool): Si es True, cada worker lee desde la caché columnar.
+        cache_dir (str): Carpeta de la caché columnar.
+        compact (bool): Si es True, cada bloque usa el esquema compacto de registros.
 
-def create_historical_summary(base_data_path: str = 'data') -> pd.DataFrame:
+    Returns:
+        list: Tuplas (ruta, DataFrame o None si la snapshot no se pudo leer), en el mismo
+              orden que `file_paths`, independientemente de qué worker terminó primero.
+    """
+    tasks = [(file_path, use_cache, cache_dir, compact) for file_path in file_paths]
+    if workers <= 1 or len(tasks) <= 1:
+        return [_load_snapshot_chunk(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_load_snapshot_chunk, tasks, chunksize=max(chunk_size, 1)))
+
+def create_historical_summary(base_data_path: str = 'data', use_cache: bool = False,
+                              cache_dir: str = DEFAULT_CACHE_DIR, workers: int = 1,
+                              chunk_size: int = 1, compact: bool = True) -> pd.DataFrame:
     """
     Crea un DataFrame histórico agregado por día y fuente a partir de todos los
     archivos 'files.json' y 'files_last_weekday.json' disponibles.
 
     Args:
         base_data_path (str): La ruta a la carpeta principal de datos.
+        use_cache (bool): Si es True, lee cada snapshot desde la caché columnar en
+                          lugar de volver a parsear el JSON.
+        cache_dir (str): Carpeta de la caché columnar.
+        workers (int): Si es mayor que 1, cada snapshot se parsea en un pool de procesos
+                       y el proceso padre concatena los bloques una sola vez.
+        chunk_size (int): Snapshots por tarea enviada a cada worker.
+        compact (bool): Si es True, los registros se cargan con el esquema compacto.
 
     Returns:
         pd.DataFrame: Un DataFrame con estadísticas agregadas por día y fuente.
@@ -81,7 +267,7 @@ def create_historical_summary(base_data_path: str = 'data') -> pd.DataFrame:
     
     # ETAPA 1: RECOLECCIÓN TOTAL
     # --------------------------
-    all_files_list = []
+    frames = []
     
     # Identificar todas las carpetas de fechas en el directorio de datos
     try:
@@ -92,33 +278,30 @@ def create_historical_summary(base_data_path: str = 'data') -> pd.DataFrame:
 
     print(f"Se encontraron {len(date_folders)} carpetas de fechas para procesar.")
 
+    snapshot_paths = []
     for folder in date_folders:
         for filename in ['files.json', 'files_last_weekday.json']:
             file_path = os.path.join(base_data_path, folder, filename)
             
             if not os.path.exists(file_path):
                 continue # Si el archivo no existe, simplemente lo saltamos
-
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                
-                # Aplanamos el JSON, añadiendo el source_id (misma lógica que antes)
-                for source_id, files in data.items():
-                    for file_record in files:
-                        file_record['source_id'] = source_id
-                        all_files_list.append(file_record)
-            except (json.JSONDecodeError, FileNotFoundError):
-                print(f"!! ADVERTENCIA: No se pudo procesar el archivo {file_path}. Saltando.")
-                continue
+            snapshot_paths.append(file_path)
+
+    # Cada snapshot se aplana en un bloque columnar tipado (en paralelo si workers > 1);
+    # las advertencias se reportan en el orden de las carpetas
+    for file_path, df in load_snapshot_frames(snapshot_paths, workers, chunk_size, use_cache, cache_dir, compact):
+        if df is None:
+            print(f"!! ADVERTENCIA: No se pudo procesar el archivo {file_path}. Saltando.")
+            continue
+        frames.append(df)
     
-    if not all_files_list:
+    if not any(len(df) for df in frames):
         print("!! ERROR: No se encontraron datos en ninguna de las fuentes. Finalizando.")
         return pd.DataFrame()
         
     # ETAPA 2: CONSOLIDACIÓN Y LIMPIEZA
     # ---------------------------------
-    df_consolidated = pd.DataFrame(all_files_list)
+    df_consolidated = concat_file_records(frames)
     print(f"Se cargaron {len(df_consolidated)} registros en total.")
     
     # Eliminar duplicados donde la fila entera es idéntica
@@ -127,89 +310,7 @@ def create_historical_summary(base_data_path: str = 'data') -> pd.DataFrame:
     
     # ETAPA 3: INGENIERÍA DE CARACTERÍSTICAS Y AGREGACIÓN
     # ----------------------------------------------------
-    print("Iniciando ingeniería de características para la agregación...")
-
-    # Convertir a datetime y extraer componentes de fecha/hora
-    df_consolidated['uploaded_at'] = pd.to_datetime(df_consolidated['uploaded_at'])
-    df_consolidated['uploaded_at_date'] = df_consolidated['uploaded_at'].dt.date
-    df_consolidated['upload_hour'] = df_consolidated['uploaded_at'].dt.hour
-
-    # Crear columnas booleanas para facilitar los cálculos condicionales
-    df_consolidated['is_duplicated_stopped'] = (df_consolidated['is_duplicated'] == True) & (df_consolidated['status'] == 'stopped')
-    df_consolidated['is_processed'] = df_consolidated['status'] == 'processed'
-    df_consolidated['is_other_status'] = ~df_consolidated['status'].isin(['processed', 'stopped'])
-    df_consolidated['is_filesize_null'] = df_consolidated['file_size'].isnull()
-    df_consolidated['is_filesize_zero'] = df_consolidated['file_size'] == 0
-    df_consolidated['is_filesize_positive'] = df_consolidated['file_size'] > 0
-    df_consolidated['is_filename_duplicated_in_source'] = df_consolidated.duplicated(subset=['source_id', 'filename'], keep=False)
-
-    print("Agrupando y calculando métricas principales...")
-    
-    # Agregación principal
-    agg_dict = {
-        'filename': ('filename', 'count'),
-        'is_duplicated_stopped': ('is_duplicated_stopped', 'sum'),
-        'is_duplicated': ('is_duplicated', 'sum'),
-        'is_processed': ('is_processed', 'sum'),
-        'is_other_status': ('is_other_status', 'sum'),
-        'file_size': ('file_size', 'sum'),
-        'rows': ('rows', 'sum'),
-        'is_filesize_null': ('is_filesize_null', 'sum'),
-        'is_filesize_zero': ('is_filesize_zero', 'sum'),
-        'is_filesize_positive': ('is_filesize_positive', 'sum'),
-        'is_filename_duplicated_in_source': ('is_filename_duplicated_in_source', 'sum')
-    }
-
-    df_summary = df_consolidated.groupby(['uploaded_at_date', 'source_id']).agg(**agg_dict)
-
-    # Renombrar columnas para mayor claridad
-    df_summary.rename(columns={
-        'filename': 'total_files',
-        'is_duplicated_stopped': 'total_files_duplicated_stopped',
-        'is_duplicated': 'total_files_duplicated',
-        'is_processed': 'total_files_processed',
-        'is_other_status': 'total_files_other_status',
-        'file_size': 'sum_file_size',
-        'rows': 'sum_rows',
-        'is_filesize_null': 'total_files_filesize_null',
-        'is_filesize_zero': 'total_files_filesize_zero',
-        'is_filesize_positive': 'total_files_filesize_positive',
-        'is_filename_duplicated_in_source': 'total_filename_duplicated_in_source'
-    }, inplace=True)
-
-    # Agregación por hora (usando pivot_table)
-    print("Calculando métricas por hora...")
-    
-    # Conteo de archivos por hora
-    pivot_counts = df_consolidated.pivot_table(
-        index=['uploaded_at_date', 'source_id'],
-        columns='upload_hour',
-        values='filename',
-        aggfunc='count',
-        fill_value=0
-    ).add_prefix('total_files_h')
-
-    # Suma de file_size por hora
-    pivot_size = df_consolidated.pivot_table(
-        index=['uploaded_at_date', 'source_id'],
-        columns='upload_hour',
-        values='file_size',
-        aggfunc='sum',
-        fill_value=0
-    ).add_prefix('sum_filesize_h')
-
-    # Suma de rows por hora
-    pivot_rows = df_consolidated.pivot_table(
-        index=['uploaded_at_date', 'source_id'],
-        columns='upload_hour',
-        values='rows',
-        aggfunc='sum',
-        fill_value=0
-    ).add_prefix('sum_rows_h')
-
-    # Unir los resultados del pivot con el resumen principal
-    print("Uniendo todas las métricas...")
-    df_final_summary = df_summary.join(pivot_counts).join(pivot_size).join(pivot_rows).reset_index()
+    df_final_summary = summarize_file_records(df_consolidated)
 
     print("--- Resumen histórico creado exitosamente. ---")
     return df_final_summary
@@ -0,0 +1,267 @@
+# src/preparation/filename_index.py
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Carpeta por defecto del índice persistido
+DEFAULT_INDEX_DIR = os.path.join('outputs', 'cache', 'filename_index')
+
+# Versión del formato en disco; cambiarla descarta el índice guardado
+INDEX_FORMAT_VERSION = 2
+
+MANIFEST_FILENAME = 'manifest.json'
+KEYS_FILENAME = 'keys.npy'
+FIRST_DAYS_FILENAME = 'first_days.npy'
+BLOOM_FILENAME = 'bloom.npy'
+DELTA_KEYS_FILENAME = 'delta_keys.npy'
+DELTA_FIRST_DAYS_FILENAME = 'delta_first_days.npy'
+
+# Columna que marca, en los archivos del día, los nombres ya recibidos por la fuente en un día anterior
+SEEN_BEFORE_COLUMN = 'is_filename_seen_before'
+
+# Filtro de Bloom: tasa de falsos positivos objetivo y capacidad mínima (en nombres)
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+BLOOM_MIN_CAPACITY = 1 << 16
+
+# Segmento delta: los nombres nuevos van a un arreglo ordenado chico que se guarda en cada
+# corrida; se fusiona con el principal cuando supera 1/`DELTA_COMPACT_RATIO` de él (o el mínimo)
+DELTA_COMPACT_RATIO = 8
+DELTA_MIN_KEYS = 1 << 16
+
+_SEPARATOR = '\x1f'
+_NO_DAY = np.iinfo(np.int32).max
+
+
+def filename_keys(source_ids, filenames) -> np.ndarray:
+    """Hash de 64 bits de cada par (source_id, filename), calculado de forma vectorizada."""
+    pairs = pd.Series(source_ids, dtype=object).astype(str).to_numpy(dtype=object) + _SEPARATOR \
+        + pd.Series(filenames, dtype=object).fillna('').astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(pairs.astype(object), categorize=False).astype(np.uint64)
+
+
+def upload_days(uploaded_at) -> np.ndarray:
+    """Día de subida (días desde 1970-01-01, UTC) de cada archivo."""
+    uploaded_at = pd.to_datetime(pd.Series(uploaded_at), utc=True).dt.tz_localize(None)
+    return uploaded_at.to_numpy(dtype='datetime64[D]').astype(np.int64).astype(np.int32)
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre claves de 64 bits (doble hashing a partir de la misma clave).
+
+    Responde "seguro que no está" sin tocar el conjunto exacto; un positivo puede ser falso
+    (con probabilidad ~`BLOOM_FALSE_POSITIVE_RATE` a su capacidad) y se confirma aparte.
+    """
+
+    __slots__ = ('bits', 'n_bits', 'n_hashes', 'capacity')
+
+    def __init__(self, capacity: int, bits: np.ndarray | None = None):
+        self.capacity = max(int(capacity), BLOOM_MIN_CAPACITY)
+        n_bits = int(np.ceil(-self.capacity * np.log(BLOOM_FALSE_POSITIVE_RATE) / np.log(2) ** 2))
+        self.n_bits = (n_bits + 7) // 8 * 8
+        self.n_hashes = max(int(round(self.n_bits / self.capacity * np.log(2))), 1)
+        self.bits = bits if bits is not None else np.zeros(self.n_bits // 8, dtype=np.uint8)
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        low = keys & np.uint64(0xFFFFFFFF)
+        high = (keys >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.n_bits)
+
+    def add(self, keys: np.ndarray):
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.int64),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    def might_contain(self, keys: np.ndarray) -> np.ndarray:
+        positions = self._positions(keys)
+        bytes_ = self.bits[(positions >> np.uint64(3)).astype(np.int64)]
+        return ((bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1).astype(bool)
+
+
+class FilenameIndex:
+    """
+    Índice persistente de los nombres de archivo recibidos por cada fuente.
+
+    Guarda el hash de cada par (source_id, filename) como un arreglo ordenado de uint64 y,
+    alineado, el primer día en que se recibió. Responde, para todos los archivos de un día
+    a la vez, si la fuente ya había recibido ese nombre en un día anterior: el filtro de
+    Bloom descarta en O(1) los nombres nuevos (la gran mayoría) y solo los positivos se
+    confirman con una búsqueda binaria vectorizada sobre las claves.
+
+    Las claves están en dos segmentos ordenados: el principal y un delta chico donde se
+    insertan los nombres nuevos. Cada corrida reescribe solo el delta (y el manifiesto); el
+    principal y el filtro de Bloom se reescriben al fusionarlos, cuando el delta crece lo
+    suficiente, así que el costo de guardar queda amortizado por nombre nuevo.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, bloom: bool = True):
+        self.index_dir = index_dir
+        self.use_bloom = bloom
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.first_days = np.empty(0, dtype=np.int32)
+        self.delta_keys = np.empty(0, dtype=np.uint64)
+        self.delta_first_days = np.empty(0, dtype=np.int32)
+        self.bloom = BloomFilter(0) if bloom else None
+        self.absorbed = []
+        # El segmento principal (o el filtro de Bloom) cambió desde la última vez que se guardó
+        self._main_dirty = True
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.delta_keys)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.index_dir, filename)
+
+    def load(self) -> 'FilenameIndex':
+        """Carga el índice persistido; si no existe o es de otra versión, queda vacío."""
+        try:
+            with open(self._path(MANIFEST_FILENAME), 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self
+        if manifest.get('version') != INDEX_FORMAT_VERSION:
+            print("-> [ÍNDICE] El formato del índice de nombres cambió. Se reconstruirá desde cero.")
+            return self
+        self.absorbed = manifest.get('absorbed', [])
+        self.keys = np.load(self._path(KEYS_FILENAME))
+        self.first_days = np.load(self._path(FIRST_DAYS_FILENAME))
+        self.delta_keys = np.load(self._path(DELTA_KEYS_FILENAME))
+        self.delta_first_days = np.load(self._path(DELTA_FIRST_DAYS_FILENAME))
+        self._main_dirty = False
+        if self.use_bloom:
+            capacity = manifest.get('bloom_capacity')
+            if capacity and os.path.exists(self._path(BLOOM_FILENAME)):
+                # El filtro guardado cubre el segmento principal; el delta se le agrega al cargar
+                self.bloom = BloomFilter(capacity, np.load(self._path(BLOOM_FILENAME)))
+                if len(self.delta_keys):
+                    self.bloom.add(self.delta_keys)
+            else:
+                self._rebuild_bloom()
+        return self
+
+    def save(self):
+        """
+        Persiste el índice; el manifiesto se escribe al final para que sea el commit. El
+        segmento principal y el filtro de Bloom solo se reescriben si cambiaron.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self._main_dirty:
+            np.save(self._path(KEYS_FILENAME), self.keys)
+            np.save(self._path(FIRST_DAYS_FILENAME), self.first_days)
+            if self.bloom is not None:
+                np.save(self._path(BLOOM_FILENAME), self.bloom.bits)
+        np.save(self._path(DELTA_KEYS_FILENAME), self.delta_keys)
+        np.save(self._path(DELTA_FIRST_DAYS_FILENAME), self.delta_first_days)
+        manifest = {'version': INDEX_FORMAT_VERSION, 'absorbed': self.absorbed, 'n_keys': len(self.keys),
+                    'n_delta': len(self.delta_keys)}
+        if self.bloom is not None:
+            manifest['bloom_capacity'] = self.bloom.capacity
+        tmp_path = self._path(f"{MANIFEST_FILENAME}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._path(MANIFEST_FILENAME))
+        self._main_dirty = False
+
+    def _rebuild_bloom(self):
+        # Se dimensiona con holgura para no reconstruirlo en cada corrida
+        self.bloom = BloomFilter(2 * len(self))
+        for keys in (self.keys, self.delta_keys):
+            if len(keys):
+                self.bloom.add(keys)
+        self._main_dirty = True
+
+    def _compact(self):
+        """Fusiona el delta con el segmento principal (ambos ordenados y sin claves en común)."""
+        positions = np.searchsorted(self.keys, self.delta_keys)
+        self.keys = np.insert(self.keys, positions, self.delta_keys)
+        self.first_days = np.insert(self.first_days, positions, self.delta_first_days)
+        self.delta_keys = np.empty(0, dtype=np.uint64)
+        self.delta_first_days = np.empty(0, dtype=np.int32)
+        self._main_dirty = True
+
+    @staticmethod
+    def _find(segment_keys: np.ndarray, keys: np.ndarray) -> tuple:
+        """Posición de cada clave en un segmento ordenado y si efectivamente está."""
+        if not len(segment_keys):
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(segment_keys, keys), len(segment_keys) - 1)
+        return positions, segment_keys[positions] == keys
+
+    def first_seen(self, keys: np.ndarray) -> np.ndarray:
+        """Primer día (días desde 1970-01-01) de cada clave; `_NO_DAY` si nunca se vio."""
+        result = np.full(len(keys), _NO_DAY, dtype=np.int32)
+        if not len(self) or not len(keys):
+            return result
+        candidates = self.bloom.might_contain(keys) if self.bloom is not None else np.ones(len(keys), dtype=bool)
+        candidate_keys = keys[candidates]
+        days = np.full(len(candidate_keys), _NO_DAY, dtype=np.int32)
+        for segment_keys, segment_days in ((self.keys, self.first_days), (self.delta_keys, self.delta_first_days)):
+            positions, found = self._find(segment_keys, candidate_keys)
+            days[found] = segment_days[positions[found]]
+        result[candidates] = days
+        return result
+
+    def seen_before(self, df_files: pd.DataFrame) -> np.ndarray:
+        """
+        Para cada archivo, si su fuente ya había recibido ese nombre en un día anterior al de
+        su subida. Correr dos veces el mismo día no marca sus propios archivos.
+
+        Returns:
+            np.ndarray: Máscara booleana alineada con `df_files`.
+        """
+        if df_files is None or df_files.empty:
+            return np.zeros(0, dtype=bool)
+        keys = filename_keys(df_files['source_id'], df_files['filename'])
+        return self.first_seen(keys) < upload_days(df_files['uploaded_at'])
+
+    def absorb(self, df_files: pd.DataFrame, label: str | None = None) -> int:
+        """
+        Agrega los nombres de un lote de archivos (con su día de subida). Si un nombre ya
+        estaba, conserva el día más antiguo.
+
+        Args:
+            df_files (pd.DataFrame): Archivos con 'source_id', 'filename' y 'uploaded_at'.
+            label (str): Identificador del lote (p. ej. la fecha de operación) para el manifiesto.
+
+        Returns:
+            int: Número de nombres nuevos en el índice.
+        """
+        if label is not None and label not in self.absorbed:
+            self.absorbed = sorted(self.absorbed + [label])
+        if df_files is None or df_files.empty:
+            return 0
+        keys = filename_keys(df_files['source_id'], df_files['filename'])
+        days = upload_days(df_files['uploaded_at'])
+        # Primer día de cada clave dentro del lote
+        order = np.lexsort((days, keys))
+        keys, days = keys[order], days[order]
+        first = np.r_[True, keys[1:] != keys[:-1]]
+        keys, days = keys[first], days[first]
+
+        known = self.first_seen(keys)
+        is_new = known == _NO_DAY
+        # Claves ya conocidas que ahora aparecen con un día anterior
+        earlier = ~is_new & (days < known)
+        if earlier.any():
+            positions, found = self._find(self.keys, keys[earlier])
+            self.first_days[positions[found]] = days[earlier][found]
+            self._main_dirty |= bool(found.any())
+            positions, found = self._find(self.delta_keys, keys[earlier])
+            self.delta_first_days[positions[found]] = days[earlier][found]
+
+        if is_new.any():
+            # Las claves del lote ya vienen ordenadas: se insertan en el delta sin tocar el principal
+            positions = np.searchsorted(self.delta_keys, keys[is_new])
+            self.delta_keys = np.insert(self.delta_keys, positions, keys[is_new])
+            self.delta_first_days = np.insert(self.delta_first_days, positions, days[is_new])
+            if len(self.delta_keys) > max(len(self.keys) // DELTA_COMPACT_RATIO, DELTA_MIN_KEYS):
+                self._compact()
+            if self.bloom is not None:
+                if len(self) > self.bloom.capacity:
+                    self._rebuild_bloom()
+                else:
+                    self.bloom.add(keys[is_new])
+        return int(is_new.sum())
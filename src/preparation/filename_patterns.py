@@ -0,0 +1,310 @@
+# src/preparation/filename_patterns.py
+
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Columnas tipadas que se extraen del nombre de cada archivo
+FILENAME_DATE_COLUMN = 'filename_date'        # datetime64 (NaT si el nombre no trae una fecha válida)
+FILENAME_ENTITY_COLUMN = 'filename_entity'    # categoría (NaN si el template no tiene entidad)
+FILENAME_BATCH_COLUMN = 'filename_batch'      # Int64 (NA si el template no tiene lote)
+FILENAME_FIELD_COLUMNS = [FILENAME_DATE_COLUMN, FILENAME_ENTITY_COLUMN, FILENAME_BATCH_COLUMN]
+
+# Placeholders con nombre propio que se vuelven columnas; el resto solo tiene que coincidir
+_CAPTURED_FIELDS = {'date': FILENAME_DATE_COLUMN, 'entity': FILENAME_ENTITY_COLUMN, 'batch': FILENAME_BATCH_COLUMN}
+
+# Tipos de placeholder: `{nombre:tipo}` (sin tipo, `token`)
+FIELD_KINDS = {
+    'token': r'[A-Za-z0-9]+',
+    'digits': r'\d+',
+    'any': r'.*?',
+    'randomid': r'[A-Za-z0-9_-]{15}',   # prefijo aleatorio de los exports de settlement/payments
+    'yyyymmdd': r'\d{8}',
+    'yyyy-mm-dd': r'\d{4}-\d{2}-\d{2}',
+    'yyyy_mm_dd': r'\d{4}_\d{2}_\d{2}',
+    'yyyymmddhhmmss': r'\d{14}',
+    'ddmmyyyyhhmmss': r'\d{14}',
+}
+DATE_KINDS = {'yyyymmdd', 'yyyy-mm-dd', 'yyyy_mm_dd', 'yyyymmddhhmmss', 'ddmmyyyyhhmmss'}
+
+# Estructura de nombres de cada fuente ({source_id: [templates]}), transcrita de la sección
+# "Filename Patterns" de su CV y guardada junto a los CVs. Se prueban en orden; la fecha es la
+# de cobertura (en los rangos, la de fin). Si ninguno coincide se usa `GENERIC_TEMPLATE`.
+CV_FOLDER_PATH = os.path.join('data', 'datasource_cvs')
+FILENAME_TEMPLATES_PATH = os.path.join(CV_FOLDER_PATH, 'filename_templates.json')
+
+# Fracción de archivos de una fuente que, si cae al template genérico, se reporta en el log
+GENERIC_FALLTHROUGH_WARN_SHARE = 0.5
+
+# Fuentes sin template (o nombres que no lo respetan): la primera secuencia de 8 dígitos,
+# leída como YYYYMMDD (la regla histórica del detector de archivos antiguos)
+GENERIC_TEMPLATE = '*{date:yyyymmdd}*'
+
+_PLACEHOLDER = re.compile(r'\{(\w+)(?::([\w-]+))?\}')
+_MATCHED_GROUP = '_matched'
+
+
+class FilenameTemplate:
+    """
+    Template de nombres compilado a una expresión regular: los placeholders `date`, `entity`
+    y `batch` son grupos con nombre (las columnas a extraer) y el resto grupos sin captura.
+    Un template que empieza o termina en `*` busca en cualquier parte del nombre; si no,
+    tiene que cubrirlo completo.
+    """
+
+    __slots__ = ('template', 'regex', 'date_kind', 'fields')
+
+    def __init__(self, template: str):
+        self.template = template
+        self.date_kind = None
+        self.fields = []
+        body = template.strip('*')
+        parts, position = [], 0
+        for match in _PLACEHOLDER.finditer(body):
+            parts.append(re.escape(body[position:match.start()]))
+            name, kind = match.group(1), match.group(2) or 'token'
+            if kind not in FIELD_KINDS:
+                raise ValueError(f"Tipo de placeholder desconocido '{kind}' en el template '{template}'.")
+            if name in _CAPTURED_FIELDS:
+                if name in self.fields:
+                    raise ValueError(f"El placeholder '{name}' aparece dos veces en el template '{template}'.")
+                if name == 'date' and kind not in DATE_KINDS:
+                    raise ValueError(f"El placeholder 'date' necesita un tipo de fecha en el template '{template}'.")
+                self.fields.append(name)
+                self.date_kind = kind if name == 'date' else self.date_kind
+                parts.append(f"(?P<{name}>{FIELD_KINDS[kind]})")
+            else:
+                parts.append(f"(?:{FIELD_KINDS[kind]})")
+            position = match.end()
+        parts.append(re.escape(body[position:]))
+        pattern = ''.join(parts)
+        if not template.startswith('*'):
+            pattern = '^' + pattern
+        if not template.endswith('*'):
+            pattern = pattern + '$'
+        # Grupo vacío que solo indica si el nombre coincidió (los campos pueden quedar vacíos)
+        self.regex = re.compile(f"{pattern}(?P<{_MATCHED_GROUP}>)")
+
+    def __repr__(self) -> str:
+        return f"FilenameTemplate({self.template!r})"
+
+    def match(self, filename: str) -> dict | None:
+        """Campos de un solo nombre (el camino por evento del modo streaming), o None si no coincide."""
+        match = self.regex.search(filename or '')
+        if match is None:
+            return None
+        return {name: match.group(name) for name in self.fields}
+
+
+def normalize_dates(values: pd.Series, kind: str) -> pd.Series:
+    """Fechas extraídas con el formato `kind` -> texto 'YYYYMMDD' (NaN se conserva)."""
+    if kind in ('yyyy-mm-dd', 'yyyy_mm_dd'):
+        return values.str.replace(r'[-_]', '', regex=True)
+    if kind == 'yyyymmddhhmmss':
+        return values.str[:8]
+    if kind == 'ddmmyyyyhhmmss':
+        return values.str[4:8] + values.str[2:4] + values.str[:2]
+    return values
+
+
+def _parse_date(value: str | None, kind: str):
+    if not value:
+        return None
+    # Misma normalización y mismo parser que la extracción vectorizada (fechas fuera de rango -> None)
+    if kind == 'ddmmyyyyhhmmss':
+        digits = value[4:8] + value[2:4] + value[:2]
+    else:
+        digits = value.replace('-', '').replace('_', '')[:8]
+    parsed = pd.to_datetime(digits, format='%Y%m%d', errors='coerce')
+    return None if pd.isna(parsed) else parsed.date()
+
+
+def load_filename_templates(path: str = FILENAME_TEMPLATES_PATH) -> dict:
+    """
+    Lee los templates de nombres y los contrasta con los CVs de la misma carpeta
+    ('<source_id>_native.md'): avisa de templates sin CV y de CVs sin template.
+
+    Returns:
+        dict: {source_id: [templates]}; vacío si el archivo no existe (todo usa el genérico).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            templates = json.load(f)
+    except FileNotFoundError:
+        print(f"!! ERROR: No se encontró '{path}'. Todos los nombres usarán el template genérico.")
+        return {}
+    for source_id, source_templates in templates.items():
+        if not isinstance(source_templates, list) or not all(isinstance(t, str) for t in source_templates):
+            raise ValueError(f"Los templates de la fuente {source_id} en '{path}' deben ser una lista de textos.")
+
+    cv_folder = os.path.dirname(path)
+    cv_sources = {name[:-len('_native.md')] for name in os.listdir(cv_folder) if name.endswith('_native.md')}
+    if cv_sources:
+        without_cv = sorted(set(templates) - cv_sources)
+        without_templates = sorted(cv_sources - set(templates))
+        if without_cv:
+            print(f"!! ADVERTENCIA: Hay templates de nombres para fuentes sin CV en '{cv_folder}': {without_cv}.")
+        if without_templates:
+            print(f"!! ADVERTENCIA: Fuentes con CV pero sin templates de nombres en '{path}' "
+                  f"(usarán el template genérico): {without_templates}.")
+    return templates
+
+
+class FilenamePatterns:
+    """
+    Templates compilados de todas las fuentes. Se compilan una vez y extraen fecha, entidad y
+    lote de todos los nombres de un día de una sola pasada: cada template corre un único
+    `str.extract` sobre los nombres de sus fuentes que todavía no coincidieron con otro.
+    """
+
+    def __init__(self, templates: dict | None = None):
+        templates = load_filename_templates() if templates is None else templates
+        # Huella de los templates (la caché de detección la incluye en la versión de los detectores)
+        self.digest = hashlib.sha256(json.dumps(templates, sort_keys=True).encode('utf-8')).hexdigest()
+        compiled = {}
+        self.by_source = {}
+        for source_id, source_templates in templates.items():
+            self.by_source[str(source_id)] = [compiled.setdefault(template, FilenameTemplate(template))
+                                              for template in source_templates]
+        self.generic = FilenameTemplate(GENERIC_TEMPLATE)
+
+    def templates_for(self, source_id) -> list:
+        return self.by_source.get(str(source_id), [])
+
+    def parse(self, source_id, filename: str) -> dict:
+        """
+        Campos de un solo archivo.
+
+        Returns:
+            dict: {'date': date | None, 'entity': str | None, 'batch': int | None}.
+        """
+        for template in self.templates_for(source_id) + [self.generic]:
+            fields = template.match(filename)
+            if fields is not None:
+                batch = fields.get('batch')
+                return {'date': _parse_date(fields.get('date'), template.date_kind),
+                        'entity': fields.get('entity') or None,
+                        'batch': int(batch) if batch else None}
+        return {'date': None, 'entity': None, 'batch': None}
+
+    def extract(self, df_files: pd.DataFrame, report_fallthrough: bool = False) -> pd.DataFrame:
+        """
+        Extrae las columnas tipadas de todos los archivos.
+
+        Args:
+            df_files (pd.DataFrame): Archivos con 'source_id' y 'filename'.
+            report_fallthrough (bool): Si es True, avisa de las fuentes cuyos nombres en su
+                                       mayoría no coinciden con sus templates (caen al genérico).
+
+        Returns:
+            pd.DataFrame: `FILENAME_FIELD_COLUMNS`, alineado con el índice de `df_files`.
+        """
+        n = len(df_files)
+        filenames = df_files['filename'].astype(object).fillna('').reset_index(drop=True)
+        source_ids = df_files['source_id'].astype(str).to_numpy()
+        dates = pd.Series(np.nan, index=filenames.index, dtype=object)
+        entities = pd.Series(np.nan, index=filenames.index, dtype=object)
+        batches = pd.Series(np.nan, index=filenames.index, dtype=object)
+        pending = np.ones(n, dtype=bool)
+
+        # Filas de cada template (un template compartido por varias fuentes corre una sola vez)
+        rows_by_template = {}
+        for source_id, templates in self.by_source.items():
+            for template in templates:
+                rows_by_template.setdefault(template, []).append(source_id)
+        passes = [(template, np.isin(source_ids, sources)) for template, sources in rows_by_template.items()]
+        passes.append((self.generic, np.ones(n, dtype=bool)))
+
+        for template, of_template in passes:
+            if template is self.generic and report_fallthrough:
+                self._report_fallthrough(source_ids, pending)
+            rows = np.flatnonzero(pending & of_template)
+            if not len(rows):
+                continue
+            extracted = filenames.iloc[rows].str.extract(template.regex)
+            matched = extracted[_MATCHED_GROUP].notna().to_numpy()
+            if not matched.any():
+                continue
+            extracted, rows = extracted[matched], rows[matched]
+            if 'date' in template.fields:
+                dates.iloc[rows] = normalize_dates(extracted['date'], template.date_kind).to_numpy()
+            if 'entity' in template.fields:
+                entities.iloc[rows] = extracted['entity'].replace('', np.nan).to_numpy()
+            if 'batch' in template.fields:
+                batches.iloc[rows] = extracted['batch'].to_numpy()
+            pending[rows] = False
+
+        fields = pd.DataFrame({
+            # Una fecha imposible (p. ej. un CNPJ leído por el template genérico) queda en NaT
+            FILENAME_DATE_COLUMN: pd.to_datetime(dates, format='%Y%m%d', errors='coerce'),
+            FILENAME_ENTITY_COLUMN: entities.astype('category'),
+            FILENAME_BATCH_COLUMN: pd.to_numeric(batches, errors='coerce').astype('Int64'),
+        })
+        fields.index = df_files.index
+        return fields
+
+    def _report_fallthrough(self, source_ids: np.ndarray, pending: np.ndarray):
+        fallthrough = pd.Series(pending).groupby(source_ids, sort=True).agg(['sum', 'size'])
+        fallthrough = fallthrough[fallthrough['sum'] > GENERIC_FALLTHROUGH_WARN_SHARE * fallthrough['size']]
+        for source_id, (n_generic, n_files) in fallthrough.iterrows():
+            if not self.templates_for(source_id):
+                print(f"!! ADVERTENCIA: La fuente {source_id} no tiene templates de nombres; sus {n_files} "
+                      f"archivos usan el template genérico.")
+            else:
+                print(f"!! ADVERTENCIA: {n_generic} de {n_files} archivos de la fuente {source_id} no coinciden con "
+                      f"sus templates de nombres y usan el template genérico. Revisa '{FILENAME_TEMPLATES_PATH}'.")
+
+
+@lru_cache(maxsize=1)
+def default_patterns() -> FilenamePatterns:
+    """Templates de `FILENAME_TEMPLATES_PATH`, leídos y compilados una sola vez por proceso."""
+    return FilenamePatterns()
+
+
+def annotate_filename_fields(df_files: pd.DataFrame, patterns: FilenamePatterns | None = None) -> pd.DataFrame:
+    """
+    Agrega (en el lugar) las columnas tipadas del nombre a los archivos del día, para que los
+    detectores y las estadísticas por entidad las reutilicen en lugar de re-parsear nombres.
+
+    Returns:
+        pd.DataFrame: El mismo `df_files`.
+    """
+    if df_files is None or df_files.empty:
+        return df_files
+    fields = (patterns or default_patterns()).extract(df_files, report_fallthrough=True)
+    for column in FILENAME_FIELD_COLUMNS:
+        df_files[column] = fields[column]
+    return df_files
+
+
+def filename_fields(df_files: pd.DataFrame) -> pd.DataFrame:
+    """Las columnas del nombre de `df_files`: las ya anotadas o, si faltan, extraídas ahora."""
+    if all(column in df_files.columns for column in FILENAME_FIELD_COLUMNS):
+        return df_files[FILENAME_FIELD_COLUMNS]
+    return default_patterns().extract(df_files)
+
+
+def entity_daily_summary(df_files: pd.DataFrame) -> pd.DataFrame:
+    """
+    Archivos, filas y archivos vacíos por (fuente, entidad del nombre) en un lote de archivos.
+
+    Returns:
+        pd.DataFrame: Columnas 'source_id', 'filename_entity', 'files', 'rows' y 'empty_files'.
+    """
+    columns = ['source_id', FILENAME_ENTITY_COLUMN, 'files', 'rows', 'empty_files']
+    if df_files is None or df_files.empty:
+        return pd.DataFrame(columns=columns)
+    rows = pd.to_numeric(df_files['rows'], errors='coerce')
+    frame = pd.DataFrame({
+        'source_id': df_files['source_id'].astype(str).to_numpy(),
+        FILENAME_ENTITY_COLUMN: filename_fields(df_files)[FILENAME_ENTITY_COLUMN].astype(object).to_numpy(),
+        'rows': rows.to_numpy(),
+        'empty_files': (rows == 0).to_numpy(),
+    })
+    summary = frame.groupby(['source_id', FILENAME_ENTITY_COLUMN], dropna=False, sort=True).agg(
+        files=('rows', 'size'), rows=('rows', 'sum'), empty_files=('empty_files', 'sum'))
+    return summary.reset_index()[columns]
@@ -0,0 +1,255 @@
+# src/preparation/historical_store.py
+
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .json_stream import FILE_RECORD_COLUMNS
+from .snapshot_cache import DEFAULT_CACHE_DIR, list_snapshot_files, snapshot_fingerprint
+from .data_loader import load_snapshot_frames, summarize_file_records
+from .aggregation import GROUP_KEYS, SUMMARY_BASE_COLUMNS
+from .schema import concat_file_records
+
+# Carpeta por defecto del agregado histórico persistido
+DEFAULT_STORE_DIR = os.path.join('outputs', 'cache', 'historical_summary')
+
+# Versión del formato en disco; cambiarla fuerza una reconstrucción completa
+STORE_FORMAT_VERSION = 2
+
+MANIFEST_FILENAME = 'manifest.json'
+SUMMARY_FILENAME = 'summary.feather'
+RECORD_HASHES_FILENAME = 'record_hashes.npy'
+FILENAMES_FILENAME = 'filenames.feather'
+
+HOURLY_PREFIXES = ['total_files_h', 'sum_filesize_h', 'sum_rows_h']
+FLOAT_COLUMN_PREFIXES = ('sum_file_size', 'sum_filesize_h')
+
+_HOUR_COLUMN = re.compile(r'^(total_files_h|sum_filesize_h|sum_rows_h)(\d+)$')
+
+
+def record_hashes(df_records: pd.DataFrame) -> np.ndarray:
+    """Hash de 64 bits de la fila completa; dos registros idénticos producen el mismo valor."""
+    return pd.util.hash_pandas_object(df_records[FILE_RECORD_COLUMNS], index=False).to_numpy()
+
+
+def _order_summary_columns(df_summary: pd.DataFrame) -> pd.DataFrame:
+    """Ordena columnas como el resumen original: claves, métricas base y métricas por hora."""
+    hourly = {prefix: [] for prefix in HOURLY_PREFIXES}
+    for column in df_summary.columns:
+        match = _HOUR_COLUMN.match(str(column))
+        if match:
+            hourly[match.group(1)].append((int(match.group(2)), column))
+    ordered = GROUP_KEYS + SUMMARY_BASE_COLUMNS
+    for prefix in HOURLY_PREFIXES:
+        ordered += [column for _, column in sorted(hourly[prefix])]
+    df_summary = df_summary[ordered]
+    for column in ordered[len(GROUP_KEYS):]:
+        if not column.startswith(FLOAT_COLUMN_PREFIXES):
+            df_summary[column] = df_summary[column].astype('int64')
+    return df_summary
+
+
+def merge_summaries(df_old: pd.DataFrame | None, df_new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Suma dos resúmenes por (uploaded_at_date, source_id). Las horas que solo existen en
+    uno de los dos se rellenan con 0.
+    """
+    if df_old is None or df_old.empty:
+        return _order_summary_columns(df_new.copy())
+    if df_new.empty:
+        return df_old
+    combined = pd.concat([df_old, df_new], ignore_index=True)
+    merged = combined.groupby(GROUP_KEYS, sort=True).sum(min_count=0).reset_index()
+    return _order_summary_columns(merged.fillna(0))
+
+
+class HistoricalSummaryStore:
+    """
+    Agregado histórico por (día, fuente) persistido en disco y actualizado por incrementos.
+
+    Guarda, además del resumen, lo mínimo para mantener la deduplicación correcta entre
+    snapshots viejas y nuevas: el hash de cada registro distinto ya absorbido y, por
+    (source_id, filename), cuántos registros distintos lo usan y el día del primero.
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.absorbed = {}
+        self.summary = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.filenames = pd.DataFrame({
+            'source_id': pd.Series(dtype=object), 'filename': pd.Series(dtype=object),
+            'n_records': pd.Series(dtype='int64'), 'first_date': pd.Series(dtype=object),
+        })
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.store_dir, filename)
+
+    def load(self) -> 'HistoricalSummaryStore':
+        """Carga el estado persistido; si no existe o es de otra versión, el store queda vacío."""
+        try:
+            with open(self._path(MANIFEST_FILENAME), 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self
+        if manifest.get('version') != STORE_FORMAT_VERSION:
+            print("-> [HISTÓRICO] El formato del store cambió. Se reconstruirá desde cero.")
+            return self
+        self.absorbed = manifest.get('absorbed', {})
+        if os.path.exists(self._path(SUMMARY_FILENAME)):
+            self.summary = feather.read_table(self._path(SUMMARY_FILENAME)).to_pandas()
+        self.hashes = np.load(self._path(RECORD_HASHES_FILENAME))
+        self.filenames = feather.read_table(self._path(FILENAMES_FILENAME)).to_pandas()
+        return self
+
+    def save(self):
+        """Persiste el estado completo; el manifiesto se escribe al final para que sea el commit."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        if self.summary is not None:
+            feather.write_feather(pa.Table.from_pandas(self.summary, preserve_index=False), self._path(SUMMARY_FILENAME))
+        np.save(self._path(RECORD_HASHES_FILENAME), self.hashes)
+        feather.write_feather(pa.Table.from_pandas(self.filenames, preserve_index=False), self._path(FILENAMES_FILENAME))
+        tmp_path = self._path(f"{MANIFEST_FILENAME}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': STORE_FORMAT_VERSION, 'absorbed': self.absorbed}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._path(MANIFEST_FILENAME))
+
+    def absorb(self, df_records: pd.DataFrame) -> int:
+        """
+        Incorpora registros nuevos al agregado.
+
+        Descarta los duplicados exactos (dentro del lote y contra todo lo ya absorbido),
+        marca 'is_filename_duplicated_in_source' contra el índice persistido de nombres y
+        corrige los días anteriores cuyo único registro con ese nombre pasa a estar duplicado.
+
+        Returns:
+            int: Número de registros distintos que se agregaron.
+        """
+        if df_records.empty:
+            return 0
+        df_records = df_records[FILE_RECORD_COLUMNS].copy()
+        df_records['uploaded_at'] = pd.to_datetime(df_records['uploaded_at'], utc=True)
+        hashes = record_hashes(df_records)
+
+        # 1. Duplicados exactos: primero dentro del lote, luego contra el histórico
+        _, first_positions = np.unique(hashes, return_index=True)
+        keep = np.zeros(len(df_records), dtype=bool)
+        keep[np.sort(first_positions)] = True
+        keep &= ~np.isin(hashes, self.hashes)
+        df_new = df_records[keep].reset_index(drop=True)
+        if df_new.empty:
+            return 0
+        self.hashes = np.union1d(self.hashes, hashes[keep])
+
+        # 2. Nombres repetidos en la fuente, contando registros viejos y nuevos
+        df_new['uploaded_at_date'] = df_new['uploaded_at'].dt.date
+        batch_counts = (df_new.groupby(['source_id', 'filename'], sort=False, observed=True)
+                        .agg(batch_records=('filename', 'size'), batch_first_date=('uploaded_at_date', 'first'))
+                        .reset_index())
+        counts = batch_counts.merge(self.filenames, on=['source_id', 'filename'], how='left')
+        counts['n_records'] = counts['n_records'].fillna(0).astype('int64')
+        counts['total_records'] = counts['n_records'] + counts['batch_records']
+
+        duplicated_keys = counts.loc[counts['total_records'] > 1, ['source_id', 'filename']]
+        df_new['is_filename_duplicated_in_source'] = (
+            df_new.set_index(['source_id', 'filename']).index.isin(pd.MultiIndex.from_frame(duplicated_keys))
+        )
+
+        # Registros previos que estaban solos y ahora tienen compañía: su día suma uno
+        newly_duplicated = counts[(counts['n_records'] == 1) & (counts['total_records'] > 1)]
+        corrections = newly_duplicated.groupby(['first_date', 'source_id'], observed=True).size()
+        corrections.index = corrections.index.set_names(GROUP_KEYS)
+
+        counts['first_date'] = counts['first_date'].where(counts['n_records'] > 0, counts['batch_first_date'])
+        updated = counts[['source_id', 'filename', 'total_records', 'first_date']].rename(columns={'total_records': 'n_records'})
+        # Sin frames vacíos en el concat: pandas deja de ignorarlos al resolver los dtypes
+        frames = [frame for frame in (self.filenames, updated) if not frame.empty]
+        self.filenames = (pd.concat(frames, ignore_index=True)
+                          .drop_duplicates(subset=['source_id', 'filename'], keep='last')
+                          .reset_index(drop=True))
+
+        # 3. Agregado del lote y mezcla con el acumulado
+        df_batch_summary = summarize_file_records(df_new.drop(columns=['uploaded_at_date']))
+        summary = merge_summaries(self.summary, df_batch_summary)
+        if not corrections.empty:
+            summary = summary.set_index(GROUP_KEYS)
+            column = 'total_filename_duplicated_in_source'
+            summary[column] = summary[column].add(corrections, fill_value=0).astype('int64')
+            summary = summary.reset_index()
+        self.summary = summary
+        return len(df_new)
+
+
+def update_historical_summary(base_data_path: str = 'data', store_dir: str = DEFAULT_STORE_DIR,
+                              use_cache: bool = False, cache_dir: str = DEFAULT_CACHE_DIR,
+                              workers: int = 1, chunk_size: int = 1) -> pd.DataFrame:
+    """
+    Versión incremental de `create_historical_summary`: solo lee las snapshots que el
+    store aún no absorbió y suma su contribución al agregado persistido.
+
+    Si una snapshot ya absorbida cambió de contenido, el store se reconstruye desde cero
+    para no arrastrar registros que ya no existen.
+
+    Args:
+        base_data_path (str): La ruta a la carpeta principal de datos.
+        store_dir (str): Carpeta del agregado persistido.
+        use_cache (bool): Si es True, las snapshots nuevas se leen desde la caché columnar.
+        cache_dir (str): Carpeta de la caché columnar.
+        workers (int): Procesos para parsear las snapshots nuevas (útil al rellenar historia).
+        chunk_size (int): Snapshots por tarea enviada a cada worker.
+
+    Returns:
+        pd.DataFrame: El mismo esquema que `create_historical_summary`.
+    """
+    print("\n--- Actualizando el resumen histórico incremental ---")
+    try:
+        snapshot_files = list_snapshot_files(base_data_path)
+    except FileNotFoundError:
+        print(f"!! ERROR: El directorio base '{base_data_path}' no fue encontrado.")
+        return pd.DataFrame()
+
+    store = HistoricalSummaryStore(store_dir).load()
+
+    pending = []
+    for file_path in snapshot_files:
+        key = os.path.abspath(file_path)
+        previous = store.absorbed.get(key)
+        fingerprint = snapshot_fingerprint(file_path, previous=previous)
+        if previous is not None and previous.get('sha256') != fingerprint['sha256']:
+            print(f"-> [HISTÓRICO] La snapshot '{file_path}' cambió. Reconstruyendo el store.")
+            store = HistoricalSummaryStore(store_dir)
+            return _absorb_files(store, [(p, snapshot_fingerprint(p)) for p in snapshot_files], use_cache, cache_dir,
+                                 workers, chunk_size)
+        if previous is None:
+            pending.append((file_path, fingerprint))
+
+    return _absorb_files(store, pending, use_cache, cache_dir, workers, chunk_size)
+
+
+def _absorb_files(store: HistoricalSummaryStore, pending: list, use_cache: bool, cache_dir: str,
+                  workers: int, chunk_size: int) -> pd.DataFrame:
+    print(f"Se encontraron {len(pending)} snapshots nuevas para absorber.")
+    fingerprints = dict(pending)
+    frames = []
+    loaded = load_snapshot_frames(list(fingerprints), workers, chunk_size, use_cache, cache_dir)
+    for file_path, df in loaded:
+        if df is None:
+            print(f"!! ADVERTENCIA: No se pudo procesar el archivo {file_path}. Saltando.")
+            continue
+        frames.append(df)
+        store.absorbed[fingerprints[file_path]['path']] = fingerprints[file_path]
+
+    if frames:
+        added = store.absorb(concat_file_records(frames))
+        print(f"✓ Se agregaron {added} registros distintos al histórico.")
+    store.save()
+
+    if store.summary is None:
+        print("!! ERROR: No se encontraron datos en ninguna de las fuentes. Finalizando.")
+        return pd.DataFrame()
+    print("--- Resumen histórico actualizado exitosamente. ---")
+    return store.summary.copy()
@@ -0,0 +1,173 @@
+# src/preparation/json_stream.py
+
+import pandas as pd
+import numpy as np
+from array import array
+import re
+import json
+
+from .schema import build_file_records_frame
+
+# Orden de columnas del DataFrame de archivos (el mismo que produce la ruta con json.load)
+FILE_RECORD_COLUMNS = ['filename', 'rows', 'status', 'is_duplicated', 'file_size', 'uploaded_at', 'status_message', 'source_id']
+
+# Tamaño de bloque (en caracteres) para la lectura incremental del JSON
+STREAM_CHUNK_SIZE = 1 << 16
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JsonStreamReader:
+    """
+    Lector incremental mínimo sobre un archivo JSON: mantiene un buffer de texto
+    acotado y decodifica un valor a la vez con `raw_decode`.
+    """
+
+    def __init__(self, f, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Descartamos lo ya consumido para que el buffer no crezca con el archivo
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Devuelve el siguiente carácter significativo sin consumirlo ('' al final)."""
+        while True:
+            self._pos = _JSON_WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Se esperaba '{char}'", found, self._pos)
+        self._pos += 1
+
+    def consume_if(self, char: str) -> bool:
+        if self.peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def decode_value(self):
+        """Decodifica el siguiente objeto o string completo, leyendo más bloques si hace falta."""
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_source_records(f, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Recorre un 'files.json' con estructura {source_id: [registros]} sin cargarlo completo.
+
+    Yields:
+        tuple: (source_id, registro) para cada archivo, en el orden del JSON.
+    """
+    reader = _JsonStreamReader(f, chunk_size)
+    reader.expect('{')
+    if reader.consume_if('}'):
+        return
+    while True:
+        source_id = reader.decode_value()
+        reader.expect(':')
+        reader.expect('[')
+        if not reader.consume_if(']'):
+            while True:
+                yield source_id, reader.decode_value()
+                if reader.consume_if(']'):
+                    break
+                reader.expect(',')
+        if reader.consume_if('}'):
+            return
+        reader.expect(',')
+
+
+def _iter_loaded_records(f):
+    """Misma interfaz que `_iter_source_records`, pero parseando el archivo completo con json.load."""
+    for source_id, files in json.load(f).items():
+        for record in files:
+            yield source_id, record
+
+
+def read_files_json_columnar(file_path: str, predicate=None, chunk_size: int = STREAM_CHUNK_SIZE,
+                             streaming: bool = True, compact: bool = True, filename_encoding: str = 'object') -> tuple:
+    """
+    Lee un 'files.json' volcando cada registro directamente en buffers tipados por
+    columna. En modo streaming nunca materializa la lista completa de diccionarios.
+
+    Args:
+        file_path (str): Ruta al JSON {source_id: [registros]}.
+        predicate (callable, opcional): f(source_id, uploaded_at) -> bool; los registros
+                                        rechazados se descartan antes de tocar los buffers.
+        chunk_size (int): Caracteres leídos por bloque.
+        streaming (bool): Si es False, el JSON se parsea de una vez con json.load (más
+                          rápido, pero con todo el documento en memoria).
+        compact (bool): Si es True, aplica el esquema compacto de `schema.FILE_RECORD_SCHEMA`
+                        al construir el DataFrame; si es False, usa los tipos amplios.
+        filename_encoding (str): Codificación de 'filename' con el esquema compacto.
+
+    Returns:
+        tuple: (DataFrame, total de registros leídos). 'uploaded_at' queda aún como texto.
+    """
+    source_ids, filenames, statuses, uploaded_ats, status_messages = [], [], [], [], []
+    rows = array('q')
+    rows_null = array('b')
+    file_sizes = array('d')
+    is_duplicated = array('b')   # 1 / 0, o -1 si el registro trae null
+    total_records = 0
+
+    with open(file_path, 'r') as f:
+        records = _iter_source_records(f, chunk_size) if streaming else _iter_loaded_records(f)
+        for source_id, record in records:
+            total_records += 1
+            if predicate is not None and not predicate(source_id, record.get('uploaded_at')):
+                continue
+            source_ids.append(source_id)
+            filenames.append(record.get('filename'))
+            # Un null en 'rows' o 'is_duplicated' se conserva como NA (no es 0 ni False)
+            row_count = record.get('rows')
+            rows.append(0 if row_count is None else row_count)
+            rows_null.append(row_count is None)
+            statuses.append(record.get('status'))
+            duplicated = record.get('is_duplicated')
+            is_duplicated.append(-1 if duplicated is None else bool(duplicated))
+            file_size = record.get('file_size')
+            file_sizes.append(np.nan if file_size is None else file_size)
+            uploaded_ats.append(record.get('uploaded_at'))
+            status_messages.append(record.get('status_message'))
+
+    duplicated_flags = np.frombuffer(is_duplicated, dtype=np.int8)
+    columns = {
+        'filename': filenames,
+        'rows': pd.arrays.IntegerArray(np.frombuffer(rows, dtype=np.int64),
+                                       np.frombuffer(rows_null, dtype=np.int8).astype(bool)),
+        'status': statuses,
+        'is_duplicated': pd.arrays.BooleanArray(duplicated_flags == 1, duplicated_flags == -1),
+        'file_size': np.frombuffer(file_sizes, dtype=np.float64),
+        'uploaded_at': uploaded_ats,
+        'status_message': status_messages,
+        'source_id': source_ids,
+    }
+    return build_file_records_frame(columns, FILE_RECORD_COLUMNS, compact, filename_encoding), total_records
@@ -0,0 +1,363 @@
+# src/preparation/quantile_sketches.py
+
+import os
+import copy
+import pickle
+import hashlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+from .cv_profiles import WEEKDAYS, CVProfileStore
+
+# Archivo por defecto de los sketches persistidos
+DEFAULT_SKETCHES_PATH = os.path.join('outputs', 'cache', 'quantile_sketches.pkl')
+
+# Versión del formato en disco; cambiarla descarta los sketches guardados
+SKETCHES_FORMAT_VERSION = 2
+
+# Tamaño del compactor superior del KLL: más grande = más preciso y más memoria
+# (~770 valores retenidos por sketch, sin importar cuántos se hayan visto)
+DEFAULT_K = 256
+
+# Días recientes que se guardan por separado; los anteriores se pliegan en un sketch acumulado
+RETAINED_DAYS = 56
+
+# Métricas por (fuente, día de la semana)
+METRICS = ['rows', 'file_size', 'upload_minute']
+
+# Banda de filas que reemplaza a la regla media ± 2·stdev y archivos mínimos para usarla
+DEFAULT_BAND = (0.01, 0.99)
+DEFAULT_MIN_COUNT = 100
+
+_NS_PER_MINUTE = 60_000_000_000
+_SHRINK = 2 / 3
+
+
+class KLLSketch:
+    """
+    Sketch de cuantiles KLL (Karnin, Lang y Liberty): memoria acotada y mezclable.
+
+    Cada nivel `h` guarda valores que representan 2**h observaciones. Cuando un nivel se
+    llena, se ordena y sube uno de cada dos valores al nivel siguiente (alternando pares e
+    impares para no sesgar). La capacidad decrece geométricamente hacia los niveles bajos,
+    así que lo retenido queda acotado por ~k / (1 - 2/3) más dos valores por nivel. Mientras
+    no se compacta nada, los cuantiles son exactos.
+    """
+
+    __slots__ = ('k', 'levels', 'count', 'min', 'max', 'flips')
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.flips = 0
+
+    def __getstate__(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __setstate__(self, state):
+        for field, value in state.items():
+            setattr(self, field, value)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * _SHRINK ** depth)), 2)
+
+    @property
+    def retained(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _compress(self):
+        while self.retained > sum(self._capacity(level) for level in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) < self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                paired = len(items) - len(items) % 2
+                promoted = items[self.flips % 2:paired:2]
+                self.flips += 1
+                self.levels[level] = items[paired:]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                break
+
+    def update(self, values):
+        """Agrega un lote de valores (los NaN se ignoran)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        """Incorpora otro sketch (de otro día, shard o proceso) sin volver a ver los datos."""
+        if not other.count:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+
+    def quantiles(self, qs) -> np.ndarray:
+        """
+        Cuantiles aproximados (inversa de la CDF: el menor valor con rango >= q). Con 0 y 1
+        devuelve el mínimo y el máximo exactos. Sin datos, devuelve NaN.
+        """
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if not self.count:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.float64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        result = items[np.minimum(positions, len(items) - 1)]
+        result[qs <= 0] = self.min
+        result[qs >= 1] = self.max
+        return result
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+
+def daily_metric_values(df_files: pd.DataFrame) -> dict:
+    """
+    Valores de cada métrica por fuente para un lote de archivos.
+
+    Returns:
+        dict: {source_id: {métrica: np.ndarray}}.
+    """
+    if df_files is None or df_files.empty:
+        return {}
+    uploaded_at = pd.to_datetime(df_files['uploaded_at'], utc=True).dt.tz_localize(None)
+    nanoseconds = uploaded_at.to_numpy(dtype='datetime64[ns]').view('int64')
+    columns = {
+        'rows': pd.to_numeric(df_files['rows'], errors='coerce').to_numpy(dtype=np.float64),
+        'file_size': pd.to_numeric(df_files['file_size'], errors='coerce').to_numpy(dtype=np.float64),
+        'upload_minute': (nanoseconds % (24 * 60 * _NS_PER_MINUTE)) / _NS_PER_MINUTE,
+    }
+    codes, sources = pd.factorize(df_files['source_id'].astype(str))
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(sources) + 1))
+    values = {}
+    for code, source_id in enumerate(sources):
+        rows = order[bounds[code]:bounds[code + 1]]
+        values[source_id] = {metric: column[rows] for metric, column in columns.items()}
+    return values
+
+
+class QuantileSketchStore:
+    """
+    Sketches KLL por fuente, día de la semana y métrica (filas, tamaño y minuto de subida),
+    persistidos en disco. Los últimos `RETAINED_DAYS` días se guardan por separado para poder
+    pedir la banda con solo los días anteriores a una fecha (re-ejecuciones y backfills no
+    usan el propio día ni los posteriores); los más viejos se pliegan en un sketch acumulado.
+    Así la memoria por fuente queda acotada sin importar el largo de la historia, y dos stores
+    (de días o shards distintos) se combinan con `merge`.
+    """
+
+    def __init__(self, path: str = DEFAULT_SKETCHES_PATH, k: int = DEFAULT_K):
+        self.path = path
+        self.k = k
+        self.absorbed = []
+        self.days = {}            # {fecha: {source_id: {métrica: KLLSketch}}}, solo los días recientes
+        self.sealed = {}          # {source_id: [{métrica: KLLSketch} o None] * 7}, días ya plegados
+        self.sealed_through = None
+
+    def load(self) -> 'QuantileSketchStore':
+        """Carga el estado persistido; si no existe, es de otra versión o de otro k, queda vacío."""
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return self
+        if state.get('version') != SKETCHES_FORMAT_VERSION or state.get('k') != self.k:
+            print("-> [CUANTILES] El formato de los sketches cambió. Se reconstruirán desde cero.")
+            return self
+        self.absorbed = state['absorbed']
+        self.days = state['days']
+        self.sealed = state['sealed']
+        self.sealed_through = state['sealed_through']
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': SKETCHES_FORMAT_VERSION, 'k': self.k, 'absorbed': self.absorbed,
+                         'days': self.days, 'sealed': self.sealed, 'sealed_through': self.sealed_through},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def get(self, source_id, weekday: int, metric: str, before: str | None = None) -> KLLSketch | None:
+        """
+        Sketch de una métrica con los días observados (solo los anteriores a `before`, si se da).
+        Devuelve None si no hay datos o si `before` cae en los días ya plegados, donde el día
+        no se puede separar del resto.
+        """
+        source_id = str(source_id)
+        parts = []
+        if self.sealed_through is not None:
+            if before is not None and before <= self.sealed_through:
+                return None
+            weekdays = self.sealed.get(source_id)
+            if weekdays is not None and weekdays[weekday] is not None and metric in weekdays[weekday]:
+                parts.append(weekdays[weekday][metric])
+        for date_str, sources in self.days.items():
+            if (before is None or date_str < before) and _weekday(date_str) == weekday:
+                sketch = sources.get(source_id, {}).get(metric)
+                if sketch is not None:
+                    parts.append(sketch)
+        if not parts:
+            return None
+        merged = KLLSketch(self.k)
+        for sketch in parts:
+            merged.merge(sketch)
+        return merged
+
+    def quantiles(self, source_id, weekday: int, metric: str, qs, before: str | None = None) -> np.ndarray:
+        """Cuantiles de una métrica (NaN si la fuente no tiene datos para ese día de la semana)."""
+        sketch = self.get(source_id, weekday, metric, before=before)
+        return sketch.quantiles(qs) if sketch is not None else np.full(len(np.atleast_1d(qs)), np.nan)
+
+    def _day_sketch(self, date_str: str, source_id: str, metric: str) -> KLLSketch:
+        return self.days.setdefault(date_str, {}).setdefault(source_id, {}).setdefault(metric, KLLSketch(self.k))
+
+    def _sealed_sketch(self, source_id: str, weekday: int, metric: str) -> KLLSketch:
+        weekdays = self.sealed.setdefault(source_id, [None] * len(WEEKDAYS))
+        if weekdays[weekday] is None:
+            weekdays[weekday] = {}
+        return weekdays[weekday].setdefault(metric, KLLSketch(self.k))
+
+    def _seal(self):
+        """Pliega en el sketch acumulado los días anteriores a los últimos `RETAINED_DAYS`."""
+        if not self.absorbed:
+            return
+        cutoff = (datetime.strptime(self.absorbed[-1], '%Y-%m-%d')
+                  - timedelta(days=RETAINED_DAYS)).strftime('%Y-%m-%d')
+        for date_str in sorted(date_str for date_str in self.days if date_str < cutoff):
+            weekday = _weekday(date_str)
+            for source_id, metrics in self.days.pop(date_str).items():
+                for metric, sketch in metrics.items():
+                    self._sealed_sketch(source_id, weekday, metric).merge(sketch)
+        sealed = [date_str for date_str in self.absorbed if date_str < cutoff]
+        if sealed:
+            self.sealed_through = sealed[-1]
+
+    def absorb_day(self, operation_date_str: str, df_files: pd.DataFrame) -> int:
+        """
+        Incorpora los archivos de un día de operación (un día ya absorbido se ignora).
+
+        Returns:
+            int: Número de archivos incorporados.
+        """
+        if operation_date_str in self.absorbed:
+            return 0
+        for source_id, metrics in daily_metric_values(df_files).items():
+            for metric, values in metrics.items():
+                self._day_sketch(operation_date_str, source_id, metric).update(values)
+        self.absorbed = sorted(self.absorbed + [operation_date_str])
+        self._seal()
+        return 0 if df_files is None else len(df_files)
+
+    def seed_from_history(self, df_history: pd.DataFrame, before: str | None = None) -> int:
+        """
+        Siembra los sketches con archivos históricos: los agrupa por día de subida (UTC) y
+        absorbe cada día con `absorb_day`, del más antiguo al más reciente.
+
+        Args:
+            df_history (pd.DataFrame): Registros de archivos de varios días (p. ej. las snapshots
+                                       disponibles, sin duplicados exactos).
+            before (str): Fecha 'YYYY-MM-DD' exclusiva; solo se siembran los días anteriores.
+
+        Returns:
+            int: Número de días absorbidos.
+        """
+        if df_history is None or df_history.empty:
+            return 0
+        upload_day = pd.to_datetime(df_history['uploaded_at'], utc=True).dt.strftime('%Y-%m-%d')
+        absorbed = 0
+        for date_str, df_day in df_history.groupby(upload_day.to_numpy(), sort=True):
+            if (before is None or date_str < before) and date_str not in self.absorbed:
+                self.absorb_day(date_str, df_day)
+                absorbed += 1
+        return absorbed
+
+    def merge(self, other: 'QuantileSketchStore'):
+        """
+        Combina otro store sin volver a leer archivos. Los dos deben cubrir pares (fuente, día)
+        distintos (shards disjuntos o días distintos); si no, esos archivos cuentan dos veces.
+        """
+        if other.k != self.k:
+            raise ValueError(f"No se pueden combinar sketches con k distinto ({self.k} y {other.k}).")
+        for source_id, weekdays in other.sealed.items():
+            for weekday, metrics in enumerate(weekdays):
+                for metric, sketch in (metrics or {}).items():
+                    self._sealed_sketch(source_id, weekday, metric).merge(sketch)
+        for date_str, sources in other.days.items():
+            for source_id, metrics in sources.items():
+                for metric, sketch in metrics.items():
+                    self._day_sketch(date_str, source_id, metric).merge(sketch)
+        if other.sealed_through is not None:
+            self.sealed_through = max(self.sealed_through or other.sealed_through, other.sealed_through)
+        self.absorbed = sorted(set(self.absorbed) | set(other.absorbed))
+        self._seal()
+
+
+@lru_cache(maxsize=None)
+def _weekday(date_str: str) -> int:
+    return datetime.strptime(date_str, '%Y-%m-%d').weekday()
+
+
+def apply_quantile_bands(profiles: CVProfileStore, store: QuantileSketchStore, band: tuple = DEFAULT_BAND,
+                         min_count: int = DEFAULT_MIN_COUNT, before: str | None = None) -> CVProfileStore:
+    """
+    Devuelve un store de perfiles con la banda de filas por archivo (p01-p99 por defecto)
+    tomada de los sketches. La regla de volumen usa esa banda en lugar de media ± 2·stdev
+    para los días de la semana con al menos `min_count` archivos observados. Con `before`
+    ('YYYY-MM-DD') solo cuentan los días anteriores: el día que se va a detectar (o uno
+    posterior ya absorbido) no entra en su propia banda.
+
+    Returns:
+        CVProfileStore: Nuevos perfiles (los originales no se modifican); cada perfil
+                        modificado recibe un digest nuevo.
+    """
+    if before is not None and store.sealed_through is not None and before <= store.sealed_through:
+        print(f"!! ADVERTENCIA: Los sketches ya plegaron los días hasta {store.sealed_through}; para {before} "
+              f"no hay banda sin el propio día y se usa media ± 2·stdev.")
+    adjusted = {}
+    filled = 0
+    for source_id, profile in profiles.profiles.items():
+        bands = [None] * len(WEEKDAYS)
+        for weekday in range(len(WEEKDAYS)):
+            sketch = store.get(source_id, weekday, 'rows', before=before)
+            if sketch is not None and sketch.count >= min_count:
+                bands[weekday] = [float(value) for value in sketch.quantiles(band)]
+        if not any(bands):
+            adjusted[source_id] = profile
+            continue
+        new = copy.copy(profile)
+        new.rows_low = [item[0] if item else None for item in bands]
+        new.rows_high = [item[1] if item else None for item in bands]
+        # El digest cambia con la banda efectiva (lo usa la caché de detección incremental)
+        new.digest = hashlib.sha256(f"{profile.digest}|{bands}".encode('utf-8')).hexdigest()
+        adjusted[source_id] = new
+        filled += 1
+
+    print(f"-> [CUANTILES] Banda p{band[0] * 100:02.0f}-p{band[1] * 100:02.0f} de filas para {filled} de "
+          f"{len(profiles)} fuentes (mínimo {min_count} archivos por día de la semana).")
+    return CVProfileStore(adjusted, list(profiles.source_order))
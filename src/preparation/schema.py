@@ -0,0 +1,114 @@
+# src/preparation/schema.py
+
+import sys
+import numpy as np
+import pandas as pd
+
+# Esquema compacto de los registros de archivos. Se aplica al construir el DataFrame
+# (desde buffers por columna), nunca como conversión posterior sobre objetos Python.
+#   - source_id / status / status_message: categóricos (pocos valores distintos)
+#   - is_duplicated: booleano nullable (NA cuando el origen trae null)
+#   - rows: Int32 nullable (NA cuando el origen trae null; Int64 si algún valor no cabe)
+#   - file_size: float64 (MB; NaN cuando el origen trae null). No se baja a float32: la
+#     pérdida de precisión cambia las sumas del resumen histórico en el sexto decimal.
+FILE_RECORD_SCHEMA = {
+    'filename': 'object',
+    'rows': 'Int32',
+    'status': 'category',
+    'is_duplicated': 'boolean',
+    'file_size': 'float64',
+    'status_message': 'category',
+    'source_id': 'category',
+}
+
+# Codificaciones soportadas para 'filename': 'object' (tal cual), 'intern' (sys.intern,
+# comparte los strings repetidos) o 'category' (diccionario + códigos).
+FILENAME_ENCODINGS = ('object', 'intern', 'category')
+
+_INT32_MAX = np.iinfo(np.int32).max
+_INT32_MIN = np.iinfo(np.int32).min
+
+
+def _compact_rows(rows) -> pd.api.extensions.ExtensionArray:
+    rows = pd.array(rows, dtype='Int64')
+    valid = rows[~rows.isna()]
+    if len(valid) and (valid.max() > _INT32_MAX or valid.min() < _INT32_MIN):
+        return rows
+    return rows.astype('Int32')
+
+
+def _wide(values, dtype, na_dtype):
+    """Columna nullable -> NumPy `dtype`; si trae nulls, `na_dtype` (NaN o None), como pandas desde registros."""
+    if not isinstance(values, pd.api.extensions.ExtensionArray):
+        return values
+    if not values.isna().any():
+        return values.to_numpy(dtype=dtype)
+    return values.to_numpy(dtype=na_dtype, na_value=np.nan if na_dtype is np.float64 else None)
+
+
+def _categorical(values) -> pd.Categorical:
+    # Con object explícito, una columna toda en null no termina con categorías float64
+    return pd.Categorical(np.asarray(values, dtype=object))
+
+
+def _encode_filenames(filenames, filename_encoding: str):
+    if filename_encoding == 'intern':
+        return np.array([sys.intern(name) if isinstance(name, str) else name for name in filenames], dtype=object)
+    if filename_encoding == 'category':
+        return _categorical(filenames)
+    return filenames
+
+
+def build_file_records_frame(columns: dict, column_order: list, compact: bool = True,
+                             filename_encoding: str = 'object') -> pd.DataFrame:
+    """
+    Construye el DataFrame de registros de archivos aplicando el esquema compacto
+    directamente sobre los buffers por columna.
+
+    Args:
+        columns (dict): Buffers por columna (listas o arreglos NumPy; 'rows' e 'is_duplicated'
+                        pueden llegar como arreglos nullables de pandas con sus nulls).
+        column_order (list): Orden de columnas del DataFrame resultante.
+        compact (bool): Si es False, se construye con los tipos amplios (object/int64/float64).
+        filename_encoding (str): 'object', 'intern' o 'category' (ver FILENAME_ENCODINGS).
+
+    Returns:
+        pd.DataFrame: Registros con el esquema declarado en FILE_RECORD_SCHEMA.
+    """
+    if not compact:
+        wide = dict(columns)
+        wide['rows'] = _wide(columns['rows'], np.int64, np.float64)
+        wide['is_duplicated'] = _wide(columns['is_duplicated'], bool, object)
+        return pd.DataFrame(wide, columns=column_order)
+    if filename_encoding not in FILENAME_ENCODINGS:
+        raise ValueError(f"Codificación de 'filename' no soportada: '{filename_encoding}'.")
+
+    typed = dict(columns)
+    typed['filename'] = _encode_filenames(columns['filename'], filename_encoding)
+    typed['rows'] = _compact_rows(columns['rows'])
+    typed['status'] = _categorical(columns['status'])
+    typed['is_duplicated'] = pd.array(columns['is_duplicated'], dtype='boolean')
+    typed['file_size'] = np.asarray(columns['file_size'], dtype=np.float64)
+    typed['status_message'] = _categorical(columns['status_message'])
+    typed['source_id'] = _categorical(columns['source_id'])
+    return pd.DataFrame(typed, columns=column_order)
+
+
+def concat_file_records(frames: list) -> pd.DataFrame:
+    """
+    Concatena bloques de registros conservando el esquema. pandas degrada a object las
+    categóricas con categorías distintas, así que antes de concatenar se recodifican
+    todas a la unión de categorías (solo se remapean códigos).
+    """
+    frames = [df for df in frames if df is not None]
+    if not frames:
+        return pd.DataFrame()
+    for column in frames[0].columns:
+        parts = [df[column] for df in frames]
+        if not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            continue
+        categories = parts[0].cat.categories
+        for part in parts[1:]:
+            categories = categories.union(part.cat.categories)
+        frames = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,190 @@
+# src/preparation/snapshot_cache.py
+
+import os
+import json
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .json_stream import FILE_RECORD_COLUMNS, read_files_json_columnar
+
+# Carpeta por defecto de la caché columnar (fuera de 'data' para no confundirla con una snapshot)
+DEFAULT_CACHE_DIR = os.path.join('outputs', 'cache', 'snapshots')
+INDEX_FILENAME = 'index.json'
+
+# Versión del formato en disco; cambiarla invalida todas las entradas existentes
+CACHE_FORMAT_VERSION = 3
+
+# Nombres de snapshot que se cachean dentro de cada carpeta de fecha
+SNAPSHOT_FILENAMES = ['files.json', 'files_last_weekday.json']
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def _content_hash(file_path: str) -> str:
+    """Calcula el SHA-256 del contenido del archivo leyendo por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_index(cache_dir: str) -> dict:
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILENAME), 'r') as f:
+            index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if index.get('version') != CACHE_FORMAT_VERSION:
+        return {}
+    return index.get('entries', {})
+
+
+def _save_index(cache_dir: str, entries: dict):
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    # Temporal por proceso: varios workers pueden actualizar la caché a la vez
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': CACHE_FORMAT_VERSION, 'entries': entries}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+
+def snapshot_fingerprint(file_path: str, previous: dict | None = None) -> dict:
+    """
+    Devuelve la huella de una snapshot: ruta absoluta, tamaño, mtime y hash del contenido.
+
+    Si `previous` coincide en tamaño y mtime se reutiliza su hash, de modo que una
+    snapshot sin cambios no se vuelve a leer completa solo para validarla.
+    """
+    stat = os.stat(file_path)
+    fingerprint = {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        fingerprint['sha256'] = previous['sha256']
+    else:
+        fingerprint['sha256'] = _content_hash(file_path)
+    return fingerprint
+
+
+def _write_cache_file(file_path: str, cache_path: str) -> int:
+    """Convierte un JSON de snapshot a Feather sin compresión (apto para memory-map)."""
+    df, _ = read_files_json_columnar(file_path)
+    df['uploaded_at'] = pd.to_datetime(df['uploaded_at'], utc=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+    return len(df)
+
+
+def load_snapshot_columns(file_path: str, columns: list | None = None, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    Carga una snapshot ('files.json' / 'files_last_weekday.json') desde la caché columnar.
+
+    La primera lectura convierte el JSON a Feather; las siguientes leen solo las columnas
+    pedidas con memory-map. Si la huella del JSON cambió, la entrada se regenera.
+
+    Args:
+        file_path (str): Ruta al JSON de la snapshot.
+        columns (list, opcional): Columnas a leer. Por defecto, todas.
+        cache_dir (str): Carpeta de la caché.
+
+    Returns:
+        pd.DataFrame: Registros con las columnas de FILE_RECORD_COLUMNS y 'uploaded_at'
+                      ya convertido a datetime UTC.
+
+    Raises:
+        FileNotFoundError: Si el JSON no existe.
+        json.JSONDecodeError: Si el JSON no es válido.
+    """
+    entries = _load_index(cache_dir)
+    key = os.path.abspath(file_path)
+    entry = entries.get(key)
+    fingerprint = snapshot_fingerprint(file_path, previous=entry)
+
+    cache_path = os.path.join(cache_dir, f"{fingerprint['sha256'][:32]}.feather")
+    is_fresh = (entry is not None and entry.get('sha256') == fingerprint['sha256']
+                and os.path.exists(cache_path))
+
+    if not is_fresh:
+        os.makedirs(cache_dir, exist_ok=True)
+        if entry is not None:
+            print(f"-> [CACHÉ] Entrada obsoleta para '{file_path}'. Regenerando.")
+        n_records = _write_cache_file(file_path, cache_path)
+        # Releemos el índice justo antes de escribir para no pisar entradas de otros procesos
+        entries = _load_index(cache_dir)
+        entries[key] = {**fingerprint, 'cache_file': os.path.basename(cache_path), 'records': n_records}
+        _save_index(cache_dir, entries)
+    elif entry.get('mtime_ns') != fingerprint['mtime_ns']:
+        # Mismo contenido con otro mtime (p. ej. una copia): actualizamos la huella
+        entries[key] = {**entry, **fingerprint}
+        _save_index(cache_dir, entries)
+
+    table = feather.read_table(cache_path, columns=columns or FILE_RECORD_COLUMNS, memory_map=True)
+    return table.to_pandas()
+
+
+def list_snapshot_files(base_data_path: str = 'data') -> list:
+    """Lista, ordenadas, todas las snapshots JSON presentes en las carpetas de fecha."""
+    snapshot_files = []
+    for folder in sorted(os.listdir(base_data_path)):
+        folder_path = os.path.join(base_data_path, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for filename in SNAPSHOT_FILENAMES:
+            file_path = os.path.join(folder_path, filename)
+            if os.path.exists(file_path):
+                snapshot_files.append(file_path)
+    return snapshot_files
+
+
+def warm_cache(base_data_path: str = 'data', cache_dir: str = DEFAULT_CACHE_DIR) -> int:
+    """
+    Convierte a Feather todas las snapshots que aún no estén en la caché (o estén obsoletas).
+
+    Returns:
+        int: Número de snapshots válidas en la caché al terminar.
+    """
+    warmed = 0
+    for file_path in list_snapshot_files(base_data_path):
+        try:
+            load_snapshot_columns(file_path, columns=['source_id'], cache_dir=cache_dir)
+            warmed += 1
+        except json.JSONDecodeError:
+            print(f"!! ADVERTENCIA: No se pudo procesar el archivo {file_path}. Saltando.")
+    return warmed
+
+
+def prune_cache(cache_dir: str = DEFAULT_CACHE_DIR) -> int:
+    """
+    Elimina entradas cuyo JSON ya no existe o cambió, y archivos Feather huérfanos.
+
+    Returns:
+        int: Número de archivos de caché eliminados.
+    """
+    entries = _load_index(cache_dir)
+    kept = {}
+    for key, entry in entries.items():
+        if not os.path.exists(key):
+            continue
+        stat = os.stat(key)
+        if stat.st_size != entry.get('size') or stat.st_mtime_ns != entry.get('mtime_ns'):
+            if _content_hash(key) != entry.get('sha256'):
+                continue
+        kept[key] = entry
+
+    live_files = {entry['cache_file'] for entry in kept.values()}
+    removed = 0
+    if os.path.isdir(cache_dir):
+        for filename in os.listdir(cache_dir):
+            if filename.endswith('.feather') and filename not in live_files:
+                os.remove(os.path.join(cache_dir, filename))
+                removed += 1
+    _save_index(cache_dir, kept)
+    return removed
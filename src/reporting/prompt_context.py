@@ -0,0 +1,206 @@
+# src/reporting/prompt_context.py
+
+import re
+from collections import Counter
+
+from ..preparation.filename_patterns import default_patterns
+from .recommendations import batch_prompt_context, incident_prompt_context
+
+DEFAULT_PROMPT_TOKEN_BUDGET = 600   # tokens estimados por mensaje (incidencia/s + CV)
+CHARS_PER_TOKEN = 4                 # aproximación de caracteres por token del modelo
+FILES_SAMPLE_SIZE = 3
+TOP_ENTITIES = 5
+
+# Secciones del CV (y sus campos) relevantes para cada tipo de incidencia; las secciones por
+# día se reducen al día de la operación. Un tipo que no está aquí recibe el CV completo.
+CV_FIELDS_BY_INCIDENT_TYPE = {
+    'Archivos Faltantes': {
+        'file_processing_daily_stats': ['mean_files', 'median_files'],
+        'day_of_week_row_stats': ['rows_mean'],
+    },
+    'Variación de Volumen Inesperada': {
+        'general_volume_stats': ['mean_rows', 'median_rows', 'stdev_rows'],
+        'day_of_week_row_stats': ['rows_mean', 'rows_median'],
+    },
+    'Archivo Vacío Inesperado': {
+        'general_volume_stats': ['median_rows', 'pct_empty_files'],
+        'day_of_week_row_stats': ['empty_files_mean'],
+    },
+    'Advertencia: Archivo Cargado Fuera de Horario': {
+        'upload_schedule_daily_stats': ['upload_window_expected_utc'],
+    },
+    'Advertencia: Carga de Archivo Antiguo': {
+        'upload_schedule_daily_stats': ['upload_window_expected_utc'],
+        'file_processing_daily_stats': ['mean_files'],
+    },
+    'Archivo Duplicado o Fallido': {
+        'file_processing_daily_stats': ['mean_files', 'median_files'],
+    },
+}
+
+# Palabras clave (en minúsculas) de los `insights_for_incidences` que aplican a cada tipo
+INSIGHT_KEYWORDS_BY_INCIDENT_TYPE = {
+    'Archivos Faltantes': ('file count', 'files per day', 'continuity', 'gap', 'missing', 'recurring'),
+    'Variación de Volumen Inesperada': ('row', 'volume'),
+    'Archivo Vacío Inesperado': ('empty',),
+    'Advertencia: Archivo Cargado Fuera de Horario': ('upload', 'utc', 'window'),
+    'Advertencia: Carga de Archivo Antiguo': ('lag', 'date', 'historical'),
+    'Archivo Duplicado o Fallido': ('duplicat', 'multi-part', 'new entity', 'file count'),
+}
+
+_INSIGHTS_SECTION = 'insights_for_incidences'
+_DAY_IN_DETAILS = re.compile(r'para los (Mon|Tue|Wed|Thu|Fri|Sat|Sun)\b')
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens estimados de un texto (caracteres / CHARS_PER_TOKEN, redondeado hacia arriba)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def incident_day(incident: dict) -> str | None:
+    """Día de la semana ('Mon', ...) que citan los detalles de la incidencia, si lo citan."""
+    match = _DAY_IN_DETAILS.search(incident.get('incident_details') or '')
+    return match.group(1) if match else None
+
+
+def summarize_files(source_id, filenames: list, sample_size: int = FILES_SAMPLE_SIZE,
+                    top_entities: int = TOP_ENTITIES) -> dict:
+    """
+    Resumen de `files_to_review`: cantidad, una muestra y los patrones comunes de los nombres
+    (entidades y fechas de cobertura según el template de la fuente).
+    """
+    summary = {'count': len(filenames)}
+    if not filenames:
+        return summary
+    summary['sample'] = filenames[:sample_size]
+    patterns = default_patterns()
+    parsed = [patterns.parse(source_id, filename) for filename in filenames]
+    entities = Counter(fields['entity'].strip('_') for fields in parsed if fields['entity'])
+    if entities:
+        summary['entities'] = dict(entities.most_common(top_entities))
+        if len(entities) > top_entities:
+            summary['other_entities'] = len(entities) - top_entities
+    dates = sorted({fields['date'] for fields in parsed if fields['date'] is not None})
+    if dates:
+        summary['filename_dates'] = [dates[0].isoformat()] if len(dates) == 1 \
+            else [dates[0].isoformat(), dates[-1].isoformat()]
+    return summary
+
+
+def project_cv(source_cv_info: dict, incident_types: list, day: str | None = None) -> dict:
+    """
+    CV reducido a las secciones y campos relevantes para los tipos de incidencia dados. Las
+    secciones por día quedan solo con `day` (o como {día: valores} si no se conoce el día).
+    """
+    if not source_cv_info:
+        return {}
+    if any(incident_type not in CV_FIELDS_BY_INCIDENT_TYPE for incident_type in incident_types):
+        sections = {section: None for section, value in source_cv_info.items()
+                    if section != _INSIGHTS_SECTION and isinstance(value, (dict, list))}
+        keywords = None
+    else:
+        sections = {}
+        for incident_type in incident_types:
+            for section, fields in CV_FIELDS_BY_INCIDENT_TYPE[incident_type].items():
+                sections.setdefault(section, [])
+                sections[section] += [field for field in fields if field not in sections[section]]
+        keywords = tuple(keyword for incident_type in incident_types
+                         for keyword in INSIGHT_KEYWORDS_BY_INCIDENT_TYPE[incident_type])
+
+    projected = {}
+    for section, fields in sections.items():
+        value = source_cv_info.get(section)
+        if isinstance(value, dict):
+            projected[section] = {field: value.get(field) for field in fields} if fields else value
+        elif isinstance(value, list):
+            by_day = {row.get('day'): {field: row.get(field) for field in (fields or row) if field != 'day'}
+                      for row in value if isinstance(row, dict)}
+            projected[section] = {'day': day, **by_day[day]} if day in by_day else by_day
+    insights = list(source_cv_info.get(_INSIGHTS_SECTION) or [])
+    if keywords is not None:
+        insights = [insight for insight in insights if any(keyword in insight.lower() for keyword in keywords)]
+    if insights:
+        projected[_INSIGHTS_SECTION] = insights
+    return projected
+
+
+def _compact_incident(incident: dict) -> dict:
+    """La incidencia con `files_to_review` reemplazado por su resumen."""
+    compact = {key: value for key, value in incident.items() if key != 'files_to_review'}
+    if 'files_to_review' in incident:
+        compact['files_to_review'] = summarize_files(incident.get('source_id'), incident['files_to_review'] or [])
+    return compact
+
+
+def _shrink(incidents: list, cv: dict) -> bool:
+    """
+    Un paso de recorte para entrar en el presupuesto, de lo menos a lo más informativo:
+    muestra de archivos a uno, entidades a las 2 principales, insights (del último al primero),
+    y por último muestra y entidades fuera. Devuelve False si ya no queda nada que recortar.
+    """
+    summaries = [incident['files_to_review'] for incident in incidents if 'files_to_review' in incident]
+    if any(len(summary.get('sample', [])) > 1 for summary in summaries):
+        for summary in summaries:
+            if 'sample' in summary:
+                summary['sample'] = summary['sample'][:1]
+        return True
+    if any(len(summary.get('entities', {})) > 2 for summary in summaries):
+        for summary in summaries:
+            entities = summary.get('entities')
+            if entities and len(entities) > 2:
+                summary['other_entities'] = summary.get('other_entities', 0) + len(entities) - 2
+                summary['entities'] = dict(list(entities.items())[:2])
+        return True
+    if cv.get(_INSIGHTS_SECTION):
+        cv[_INSIGHTS_SECTION].pop()
+        if not cv[_INSIGHTS_SECTION]:
+            del cv[_INSIGHTS_SECTION]
+        return True
+    shrunk = False
+    for summary in summaries:
+        for key in ('sample', 'entities', 'other_entities'):
+            shrunk = summary.pop(key, None) is not None or shrunk
+    return shrunk
+
+
+def _fit(render, incidents: list, cv: dict, budget: int | None) -> str:
+    text = render(incidents, cv)
+    while budget is not None and estimate_tokens(text) > budget and _shrink(incidents, cv):
+        text = render(incidents, cv)
+    return text
+
+
+def compact_incident_context(incident: dict, source_cv_info: dict, day: str | None = None,
+                             budget: int | None = DEFAULT_PROMPT_TOKEN_BUDGET) -> str:
+    """
+    Mensaje compacto para el recomendador por incidencia: `files_to_review` resumido, el CV
+    reducido a lo que importa para su tipo y el día de la operación, JSON sin espacios y, si
+    supera `budget` tokens estimados, recortado de lo menos a lo más informativo.
+
+    Args:
+        incident (dict): La incidencia tal como sale del reporte.
+        source_cv_info (dict): El CV crudo de la fuente.
+        day (str): Día de la operación ('Mon', ...); si no se da, el que citan los detalles.
+        budget (int): Máximo de tokens estimados del mensaje (None = sin límite). Lo esencial
+                      (incidencia, cantidad de archivos y estadísticas del CV) no se recorta.
+
+    Returns:
+        str: El mensaje, con el mismo formato que `incident_prompt_context`.
+    """
+    cv = project_cv(source_cv_info, [incident.get('incident_type')], day or incident_day(incident))
+    return _fit(lambda incidents, cv: incident_prompt_context(incidents[0], cv, indent=None),
+                [_compact_incident(incident)], cv, budget)
+
+
+def compact_batch_context(incidents: list, source_cv_info: dict, day: str | None = None,
+                          budget: int | None = DEFAULT_PROMPT_TOKEN_BUDGET) -> str:
+    """
+    Versión por fuente de `compact_incident_context`: las incidencias resumidas y numeradas, y
+    el CV reducido a la unión de lo que importa para sus tipos. El presupuesto es por mensaje
+    y crece con el número de incidencias (`budget` por cada una).
+    """
+    day = day or next((incident_day(incident) for incident in incidents if incident_day(incident)), None)
+    cv = project_cv(source_cv_info, list(dict.fromkeys(incident.get('incident_type') for incident in incidents)), day)
+    return _fit(lambda incidents, cv: batch_prompt_context(incidents, cv, indent=None),
+                [_compact_incident(incident) for incident in incidents], cv,
+                budget * len(incidents) if budget is not None else None)
@@ -0,0 +1,143 @@
+# src/reporting/recommendation_cache.py
+
+import os
+import re
+import json
+import time
+import hashlib
+
+# Archivo por defecto de la caché de recomendaciones
+DEFAULT_RECOMMENDATION_CACHE_PATH = os.path.join('outputs', 'cache', 'recommendations.json')
+
+# Prompt del recomendador: cualquier cambio en este archivo invalida todas las entradas
+RECOMMENDER_PROMPT_PATH = os.path.join('src', 'agents', 'recommender', 'prompt.py')
+
+# Versión del formato en disco; cambiarla descarta la caché guardada
+RECOMMENDATION_CACHE_FORMAT_VERSION = 1
+
+DEFAULT_TTL_DAYS = 14
+DEFAULT_MAX_ENTRIES = 2000
+
+_SECONDS_PER_DAY = 86_400
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def magnitude_bucket(value: float) -> int:
+    """Cubeta logarítmica de una magnitud: 0 -> 0, 1 -> 1, 2-3 -> 2, 4-7 -> 3, 8-15 -> 4, ..."""
+    value = abs(float(value))
+    return 0 if value < 1 else int(value).bit_length()
+
+
+def normalize_details(details: str) -> str:
+    """Texto de la incidencia con cada número reemplazado por su cubeta (p. ej. '12 archivos' -> '#4 archivos')."""
+    return _NUMBER.sub(lambda match: f"#{magnitude_bucket(float(match.group()))}", details or '')
+
+
+def recommender_prompt_digest(*extra_sources: str, prompt_path: str = RECOMMENDER_PROMPT_PATH) -> str:
+    """
+    Huella del prompt del recomendador: el contenido de `prompt.py` más cualquier otro texto
+    que decida lo que ve el modelo (p. ej. el código que arma el contexto de cada llamada).
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(prompt_path, 'rb') as f:
+            digest.update(f.read())
+    except FileNotFoundError:
+        print(f"!! ADVERTENCIA: No se encontró el prompt del recomendador en '{prompt_path}'.")
+    for source in extra_sources:
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def incident_fingerprint(incident: dict, profile_digest: str, prompt_digest: str) -> str:
+    """
+    Huella normalizada de una incidencia: tipo, fuente, magnitudes en cubetas logarítmicas,
+    digest del CV de la fuente y del prompt. Dos días con la misma incidencia "del mismo
+    tamaño" comparten recomendación; un cambio en el CV o en el prompt la invalida.
+    """
+    key = {
+        'incident_type': incident.get('incident_type'),
+        'source_id': str(incident.get('source_id')),
+        'total_bucket': magnitude_bucket(incident.get('total_incidentes') or 0),
+        'details': normalize_details(incident.get('incident_details')),
+        'profile': profile_digest,
+        'prompt': prompt_digest,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class RecommendationCache:
+    """
+    Caché persistente de recomendaciones por huella de incidencia, con vencimiento (TTL) y
+    desalojo LRU cuando supera `max_entries`. Cada entrada guarda la recomendación, cuándo se
+    generó y cuándo se usó por última vez.
+    """
+
+    def __init__(self, path: str = DEFAULT_RECOMMENDATION_CACHE_PATH, ttl_days: float = DEFAULT_TTL_DAYS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_s = ttl_days * _SECONDS_PER_DAY
+        self.max_entries = max_entries
+        self.entries = {}
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'stored': 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> 'RecommendationCache':
+        """Carga la caché persistida; si no existe o es de otra versión, queda vacía."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self
+        if cached.get('version') != RECOMMENDATION_CACHE_FORMAT_VERSION:
+            return self
+        self.entries = cached.get('entries', {})
+        return self
+
+    def save(self):
+        self._evict()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': RECOMMENDATION_CACHE_FORMAT_VERSION, 'entries': self.entries},
+                               ensure_ascii=False))
+        os.replace(tmp_path, self.path)
+
+    def get(self, fingerprint: str, now: float | None = None) -> dict | None:
+        """
+        Entrada vigente de la huella ({'recommendation', 'created_at', 'last_used_at'}) o None.
+        Un acierto actualiza su último uso (orden LRU).
+        """
+        now = time.time() if now is None else now
+        entry = self.entries.get(fingerprint)
+        if entry is not None and now - entry['created_at'] > self.ttl_s:
+            del self.entries[fingerprint]
+            self.stats['expired'] += 1
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        entry['last_used_at'] = now
+        self.stats['hits'] += 1
+        return entry
+
+    def put(self, fingerprint: str, recommendation: str, now: float | None = None):
+        now = time.time() if now is None else now
+        self.entries[fingerprint] = {'recommendation': recommendation, 'created_at': now, 'last_used_at': now}
+        self.stats['stored'] += 1
+
+    def _evict(self, now: float | None = None):
+        """Descarta las entradas vencidas y, si sobran, las de uso más antiguo."""
+        now = time.time() if now is None else now
+        expired = [key for key, entry in self.entries.items() if now - entry['created_at'] > self.ttl_s]
+        for key in expired:
+            del self.entries[key]
+        self.stats['expired'] += len(expired)
+        overflow = len(self.entries) - self.max_entries
+        if overflow > 0:
+            by_use = sorted(self.entries, key=lambda key: self.entries[key]['last_used_at'])
+            for key in by_use[:overflow]:
+                del self.entries[key]
+            self.stats['evicted'] += overflow
@@ -0,0 +1,173 @@
+# src/reporting/recommendations.py
+
+import re
+import json
+import time
+import random
+import asyncio
+
+# Valores por defecto de la etapa de recomendaciones
+DEFAULT_CONCURRENCY = 8      # llamadas al LLM en vuelo a la vez
+DEFAULT_RATE = 4.0           # llamadas por segundo (token bucket); None o 0 = sin límite
+DEFAULT_TIMEOUT = 60.0       # segundos por llamada
+DEFAULT_RETRIES = 3          # reintentos después del primer intento
+DEFAULT_BACKOFF = 1.0        # base (segundos) del backoff exponencial con jitter
+MAX_BACKOFF = 30.0
+
+FALLBACK_RECOMMENDATION = "No se pudo generar una recomendación."
+
+_JSON_ARRAY = re.compile(r'\[.*\]', re.DOTALL)
+
+
+class TokenBucket:
+    """
+    Limitador de tasa: se reponen `rate` fichas por segundo hasta `capacity` y cada llamada
+    consume una. Permite ráfagas cortas de hasta `capacity` llamadas sin superar la tasa media.
+    """
+
+    def __init__(self, rate: float, capacity: int | None = None):
+        self.rate = float(rate)
+        self.capacity = capacity if capacity is not None else max(int(rate), 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # El lock ordena a los que esperan: las fichas se entregan en orden de llegada
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF, rng: random.Random | None = None) -> float:
+    """Espera antes del reintento `attempt` (1, 2, ...): jitter completo sobre base·2^(attempt-1)."""
+    ceiling = min(MAX_BACKOFF, base * 2 ** (attempt - 1))
+    return (rng or random).uniform(0, ceiling)
+
+
+async def _call_with_retries(call, semaphore: asyncio.Semaphore, limiter: TokenBucket | None, timeout: float | None,
+                             retries: int, backoff: float, stats: dict, rng: random.Random):
+    for attempt in range(retries + 1):
+        if attempt:
+            stats['retries'] += 1
+            # El backoff se espera fuera del semáforo: no ocupa un lugar de las llamadas en vuelo
+            await asyncio.sleep(backoff_delay(attempt, backoff, rng))
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+            stats['calls'] += 1
+            try:
+                return await asyncio.wait_for(call(attempt), timeout)
+            except asyncio.TimeoutError:
+                stats['timeouts'] += 1
+                error = f"sin respuesta en {timeout:.0f}s"
+            except Exception as e:
+                stats['errors'] += 1
+                error = f"{type(e).__name__}: {e}"
+    stats['failed'] += 1
+    print(f"!! ADVERTENCIA: Recomendación no generada tras {retries + 1} intentos ({error}).")
+    return None
+
+
+async def run_bounded(calls: list, concurrency: int = DEFAULT_CONCURRENCY, rate: float | None = DEFAULT_RATE,
+                      timeout: float | None = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                      backoff: float = DEFAULT_BACKOFF, seed: int | None = None) -> tuple:
+    """
+    Ejecuta llamadas asíncronas al LLM con concurrencia acotada, límite de tasa, timeout por
+    llamada y reintentos con backoff exponencial con jitter.
+
+    Args:
+        calls (list): Funciones `call(attempt) -> awaitable` (una por recomendación); `attempt`
+                      empieza en 0 y permite abrir una sesión nueva en cada reintento.
+        concurrency (int): Máximo de llamadas en vuelo.
+        rate (float): Llamadas por segundo (cada reintento también consume una ficha).
+        timeout (float): Segundos por intento (None = sin timeout).
+        retries (int): Reintentos ante timeout o error.
+        backoff (float): Base del backoff en segundos.
+        seed (int): Semilla del jitter (para reproducir una corrida).
+
+    Returns:
+        tuple: (resultados en el mismo orden que `calls`, con None donde todos los intentos
+                fallaron; estadísticas de la corrida).
+    """
+    stats = {'calls': 0, 'retries': 0, 'timeouts': 0, 'errors': 0, 'failed': 0, 'elapsed_s': 0.0}
+    results = [None] * len(calls)
+    if not calls:
+        return results, stats
+    semaphore = asyncio.Semaphore(max(int(concurrency), 1))
+    limiter = TokenBucket(rate) if rate else None
+    rng = random.Random(seed)
+
+    async def worker(position: int, call):
+        results[position] = await _call_with_retries(call, semaphore, limiter, timeout, retries, backoff, stats, rng)
+
+    start = time.perf_counter()
+    # Cada worker captura sus propios errores: una llamada fallida no cancela al resto del grupo
+    async with asyncio.TaskGroup() as group:
+        for position, call in enumerate(calls):
+            group.create_task(worker(position, call))
+    stats['elapsed_s'] = time.perf_counter() - start
+    return results, stats
+
+
+def _dumps(value, indent: int | None) -> str:
+    # indent=None: JSON compacto (sin espacios ni escapes \uXXXX, que cuestan tokens)
+    if indent is None:
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    return json.dumps(value, indent=indent)
+
+
+def incident_prompt_context(incident: dict, source_cv_info: dict, indent: int | None = 2) -> str:
+    """Mensaje para el recomendador por incidencia: la incidencia y el CV de su fuente."""
+    return (f"**INCIDENCIA DETECTADA:**\n```json\n{_dumps(incident, indent)}\n```\n\n"
+            f"**CONTEXTO DEL CV DE LA FUENTE:**\n```json\n{_dumps(source_cv_info, indent)}\n```")
+
+
+def batch_prompt_context(incidents: list, source_cv_info: dict, indent: int | None = 2) -> str:
+    """Mensaje para el recomendador por fuente: sus incidencias numeradas desde 1 y el CV una sola vez."""
+    lines = ["**INCIDENCIAS DETECTADAS:**"]
+    for number, incident in enumerate(incidents, start=1):
+        lines.append(f"{number}. ```json\n{_dumps(incident, indent)}\n```")
+    lines.append(f"\n**CONTEXTO DEL CV DE LA FUENTE:**\n```json\n{_dumps(source_cv_info, indent)}\n```")
+    return "\n".join(lines)
+
+
+def parse_batch_recommendations(text: str | None, n_incidents: int) -> list:
+    """
+    Interpreta la respuesta del recomendador por fuente: un arreglo JSON de objetos
+    {"id": n, "recomendacion": "..."} (o de textos, en orden). Tolera bloques ```json y texto
+    alrededor del arreglo.
+
+    Returns:
+        list: Una recomendación por incidencia, en orden; None donde la respuesta no trae una
+              entrada válida (o si no se pudo interpretar).
+    """
+    recommendations = [None] * n_incidents
+    match = _JSON_ARRAY.search(text or '')
+    if match is None:
+        return recommendations
+    try:
+        items = json.loads(match.group())
+    except json.JSONDecodeError:
+        return recommendations
+    if not isinstance(items, list):
+        return recommendations
+    for position, item in enumerate(items):
+        if isinstance(item, str):
+            number, recommendation = position + 1, item
+        elif isinstance(item, dict):
+            number, recommendation = item.get('id'), item.get('recomendacion') or item.get('recommendation')
+        else:
+            continue
+        if isinstance(number, str) and number.strip().isdigit():
+            number = int(number)
+        if isinstance(number, int) and 1 <= number <= n_incidents and isinstance(recommendation, str) \
+                and recommendation.strip() and recommendations[number - 1] is None:
+            recommendations[number - 1] = recommendation.strip()
+    return recommendations